@@ -4,5 +4,6 @@ Agentic RAG System - Public API
 
 from app.Agent.orchestrator import hr_agent_graph
 from app.Agent.models import AgentState
+from app.Agent.streaming import stream_agent_answer
 
-__all__ = ["hr_agent_graph", "AgentState"]
\ No newline at end of file
+__all__ = ["hr_agent_graph", "AgentState", "stream_agent_answer"]
\ No newline at end of file
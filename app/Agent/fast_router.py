@@ -0,0 +1,267 @@
+"""
+Fast-path router - classifies simple messages without an LLM call
+Single Responsibility: Only decides whether a message can skip decomposition
+
+Keyword rules catch the obvious cases ("help", "how many vacation days do
+I have?"). Otherwise the message embedding is compared with one centroid
+per query type, built from labelled examples. A message is routed only
+when it looks like a single question and the decision is confident;
+everything else goes to the LLM decomposer as before.
+"""
+
+import asyncio
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.Agent.models import SubQuery
+from app.core.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+QUERY_TYPES = ("policy", "personal_data", "general")
+
+KEYWORD_RULES = {
+    "general": [
+        re.compile(r"^(hi|hello|hey|help|thanks|thank you|good (morning|afternoon|evening))\b[\s!.?]*$"),
+        re.compile(r"\b(what can you do|who are you|what are you|how do(es)? (this|the|you) (bot|assistant|chatbot)?\s?work)\b"),
+    ],
+    "personal_data": [
+        re.compile(r"\bhow (many|much)\b.*\b(days?|leaves?|vacation|pto|hours)\b.*\b(do i have|have i|i have|i've|left|remaining)\b"),
+        re.compile(r"\bmy (\w+ )?(leave|leaves|vacation|sick|emergency|pto)( days| leave)? ?(balance|requests?|history|status|left|remaining)\b"),
+        re.compile(r"\b(show|check|view|see|list) (me )?my\b"),
+        re.compile(r"\b(leave|vacation|sick|pto) balance\b"),
+    ],
+    "policy": [
+        re.compile(r"\b(policy|policies|procedures?|guidelines?|handbook|dress code|code of conduct)\b"),
+        re.compile(r"\b(am i|are employees|is an employee|are we) (entitled|eligible|allowed|required)\b"),
+        re.compile(r"\bhow (do|can|should) (i|employees|we) (apply|request|submit|file|report|claim)\b"),
+    ],
+}
+
+# Labelled examples whose embeddings form the per-type centroids
+CENTROID_EXAMPLES = {
+    "policy": [
+        "What is the leave policy?",
+        "How do I apply for emergency leave?",
+        "What is the company's remote work policy?",
+        "Can I carry over unused vacation days to next year?",
+        "What documents do I need for sick leave longer than three days?",
+        "What are the working hours?",
+        "Is there a probation period for new employees?",
+        "How much notice do I have to give before resigning?",
+        "What holidays does the company observe?",
+        "Are overtime hours compensated?",
+        "What is the maternity leave entitlement?",
+        "What happens if I am late to work?",
+    ],
+    "personal_data": [
+        "How many vacation days do I have left?",
+        "What is my sick leave balance?",
+        "Show me my leave history",
+        "How many emergency leaves have I taken this year?",
+        "Was my last vacation request approved?",
+        "How many days off do I still have?",
+        "What is the status of my leave request?",
+        "When did I last take sick leave?",
+        "List my pending leave requests",
+        "How much annual leave have I used?",
+    ],
+    "general": [
+        "Hello",
+        "Help",
+        "What can you do?",
+        "Who are you?",
+        "Thanks for your help",
+        "Good morning",
+        "How does this chatbot work?",
+        "Who should I contact in HR?",
+        "Can you help me with an HR question?",
+        "What kind of questions can I ask?",
+    ],
+}
+
+# Several questions in one message need the LLM to split them
+_QUESTION_MARKS = re.compile(r"\?")
+_COMPOUND = re.compile(
+    r"\b(and|also|plus|as well as)\b.*\b(what|how|when|where|why|who|which|can|do|does|is|are|show|tell|list|check)\b|;"
+)
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass
+class RouteDecision:
+    """Outcome of the fast path for one message"""
+    query_type: str | None
+    confidence: float
+    method: str  # "rule", "centroid", "compound" or "uncertain"
+
+    @property
+    def routed(self) -> bool:
+        return self.query_type is not None
+
+
+def looks_compound(text: str) -> bool:
+    return len(_QUESTION_MARKS.findall(text)) > 1 or bool(_COMPOUND.search(text))
+
+
+def match_rules(text: str) -> set[str]:
+    """Query types whose keyword rules match the normalized message"""
+    return {
+        query_type
+        for query_type, patterns in KEYWORD_RULES.items()
+        if any(pattern.search(text) for pattern in patterns)
+    }
+
+
+class FastRouter:
+    """
+    Local pre-router in front of QueryDecomposer
+
+    Args:
+        embedding_factory: Returns the Embeddings used for the centroid
+            classifier; None disables it (keyword rules only)
+        min_margin: Cosine gap between the best and second-best centroid
+            needed to route without the LLM
+        examples: Labelled examples per query type for the centroids
+    """
+
+    def __init__(
+        self,
+        embedding_factory: Callable[[], Embeddings] | None = None,
+        min_margin: float = 0.08,
+        examples: dict[str, list[str]] | None = None
+    ):
+        self.embedding_factory = embedding_factory
+        self.min_margin = min_margin
+        self.examples = examples or CENTROID_EXAMPLES
+        self._centroids: np.ndarray | None = None
+        self._centroid_embedding: Embeddings | None = None
+        self._lock = threading.Lock()
+        self._centroid_flights = SingleFlight("router-centroids")
+        self._counts = {"rule": 0, "centroid": 0, "compound": 0, "uncertain": 0}
+        self._seconds = 0.0
+
+    @staticmethod
+    def normalize(message: str) -> str:
+        return _WHITESPACE.sub(" ", message.casefold()).strip()
+
+    def _build_centroids(self, vectors_by_type: list) -> np.ndarray:
+        centroids = []
+        for vectors in vectors_by_type:
+            matrix = np.asarray(vectors, dtype=np.float32)
+            matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+            centroid = matrix.mean(axis=0)
+            centroids.append(centroid / np.linalg.norm(centroid))
+        return np.stack(centroids)
+
+    def _example_lists(self) -> list[list[str]]:
+        return [self.examples[query_type] for query_type in QUERY_TYPES]
+
+    def _centroids_for(self, embedding: Embeddings) -> np.ndarray:
+        with self._lock:
+            # Rebuilt if the served embedding changes (e.g. a model switch)
+            if self._centroids is None or self._centroid_embedding is not embedding:
+                self._centroids = self._build_centroids(
+                    [embedding.embed_documents(texts) for texts in self._example_lists()]
+                )
+                self._centroid_embedding = embedding
+            return self._centroids
+
+    async def _acentroids_for(self, embedding: Embeddings) -> np.ndarray:
+        if self._centroids is not None and self._centroid_embedding is embedding:
+            return self._centroids
+        # Concurrent first messages share one build instead of each embedding the examples
+        return await self._centroid_flights.ado(id(embedding), lambda: self._abuild_centroids(embedding))
+
+    async def _abuild_centroids(self, embedding: Embeddings) -> np.ndarray:
+        vectors = [await embedding.aembed_documents(texts) for texts in self._example_lists()]
+        centroids = self._build_centroids(vectors)
+        with self._lock:
+            self._centroids, self._centroid_embedding = centroids, embedding
+        return centroids
+
+    def _decide_by_centroid(self, vector, centroids: np.ndarray) -> RouteDecision:
+        query = np.asarray(vector, dtype=np.float32)
+        scores = centroids @ (query / (np.linalg.norm(query) or 1.0))
+        order = np.argsort(-scores)
+        margin = float(scores[order[0]] - scores[order[1]])
+        if margin >= self.min_margin:
+            return RouteDecision(QUERY_TYPES[order[0]], margin, "centroid")
+        return RouteDecision(None, margin, "uncertain")
+
+    def _decide_locally(self, text: str) -> RouteDecision | None:
+        """Decision from the message text alone, or None if the embedding is needed"""
+        if looks_compound(text):
+            return RouteDecision(None, 0.0, "compound")
+        matched = match_rules(text)
+        if len(matched) == 1:
+            return RouteDecision(matched.pop(), 1.0, "rule")
+        # Rules of several types match: mixed or ambiguous, leave it to the LLM
+        if matched or self.embedding_factory is None:
+            return RouteDecision(None, 0.0, "uncertain")
+        return None
+
+    def _record(self, decision: RouteDecision, started: float) -> RouteDecision:
+        with self._lock:
+            self._counts[decision.method] += 1
+            self._seconds += time.perf_counter() - started
+        return decision
+
+    def classify(self, message: str) -> RouteDecision:
+        started = time.perf_counter()
+        text = self.normalize(message)
+        decision = self._decide_locally(text)
+        if decision is None:
+            try:
+                embedding = self.embedding_factory()
+                decision = self._decide_by_centroid(embedding.embed_query(message), self._centroids_for(embedding))
+            except Exception as e:
+                logger.warning(f"Fast router embedding failed, using the LLM: {e}")
+                decision = RouteDecision(None, 0.0, "uncertain")
+        return self._record(decision, started)
+
+    async def aclassify(self, message: str) -> RouteDecision:
+        """Async variant of classify"""
+        started = time.perf_counter()
+        text = self.normalize(message)
+        decision = self._decide_locally(text)
+        if decision is None:
+            try:
+                # The factory may load the retriever; keep that off the event loop
+                embedding = await asyncio.to_thread(self.embedding_factory)
+                vector = await embedding.aembed_query(message)
+                decision = self._decide_by_centroid(vector, await self._acentroids_for(embedding))
+            except Exception as e:
+                logger.warning(f"Fast router embedding failed, using the LLM: {e}")
+                decision = RouteDecision(None, 0.0, "uncertain")
+        return self._record(decision, started)
+
+    @staticmethod
+    def _to_sub_queries(message: str, decision: RouteDecision) -> list[SubQuery] | None:
+        if not decision.routed:
+            return None
+        logger.info(f"Fast path: [{decision.query_type}] via {decision.method} ({decision.confidence:.2f})")
+        return [SubQuery(question=message.strip(), query_type=decision.query_type)]
+
+    def route(self, message: str) -> list[SubQuery] | None:
+        """Sub-queries for a confidently classified single question, else None"""
+        return self._to_sub_queries(message, self.classify(message))
+
+    async def aroute(self, message: str) -> list[SubQuery] | None:
+        """Async variant of route"""
+        return self._to_sub_queries(message, await self.aclassify(message))
+
+    def stats(self) -> dict:
+        total = sum(self._counts.values())
+        routed = self._counts["rule"] + self._counts["centroid"]
+        return {
+            **self._counts,
+            "fast_path_rate": round(routed / total, 4) if total else 0.0,
+            "avg_ms": round(self._seconds / total * 1000, 3) if total else 0.0
+        }
@@ -3,7 +3,9 @@ Base handler interface - Dependency Inversion Principle
 All query handlers must implement this interface
 """
 
+import asyncio
 from abc import ABC, abstractmethod
+from typing import AsyncIterator
 
 
 class BaseQueryHandler(ABC):
@@ -34,4 +36,38 @@ class BaseQueryHandler(ABC):
         Returns:
             True if this handler can process the query type
         """
-        pass
\ No newline at end of file
+        pass
+    
+    async def ahandle(self, question: str, user_id: int | None = None) -> str:
+        """
+        Async variant of handle
+        
+        Default implementation runs handle() in a worker thread so blocking
+        I/O never stalls the event loop. Handlers with native async clients
+        override this.
+        
+        Args:
+            question: The user's question
+            user_id: Optional user ID for personalized queries
+            
+        Returns:
+            Formatted answer string
+        """
+        return await asyncio.to_thread(self.handle, question, user_id)
+    
+    async def astream(self, question: str, user_id: int | None = None) -> AsyncIterator[str]:
+        """
+        Stream the answer in chunks
+        
+        Default implementation awaits ahandle() and yields the full answer
+        once. Handlers backed by an LLM override this to yield tokens as
+        they are generated.
+        
+        Args:
+            question: The user's question
+            user_id: Optional user ID for personalized queries
+            
+        Yields:
+            Consecutive pieces of the formatted answer
+        """
+        yield await self.ahandle(question, user_id)
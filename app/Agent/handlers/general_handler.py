@@ -40,6 +40,10 @@ class GeneralQueryHandler(BaseQueryHandler):
         else:
             return f"**{question}**\n\nI'm here to help with HR policies and your personal HR data. What would you like to know?"
     
+    async def ahandle(self, question: str, user_id: int | None = None) -> str:
+        """Canned responses only: no I/O, so no worker thread needed"""
+        return self.handle(question, user_id)
+    
     @staticmethod
     def _get_help_response(question: str) -> str:
         return f"""**{question}**
@@ -4,11 +4,34 @@ Only handles policy-related queries using vector database
 """
 
 import logging
+from typing import AsyncIterator
 from app.Agent.handlers.base_handler import BaseQueryHandler
-from app.services.retriever import query_hr_documents
+from app.core.config import settings
+from app.core.singleflight import SingleFlight
+from app.services.embedding_cache import normalize_query
+from app.services.retriever import (
+    query_hr_documents,
+    query_hr_documents_batch,
+    aquery_hr_documents,
+    aquery_hr_documents_batch,
+    retriever_runtime
+)
 
 logger = logging.getLogger(__name__)
 
+# Policy answers depend only on the question, so concurrent identical
+# questions from different users share one retrieval and generation
+policy_flights = SingleFlight("policy") if settings.SINGLE_FLIGHT_ENABLED else None
+
+
+def _originals(questions: list[str]) -> tuple[list[str], dict[str, str]]:
+    """Coalescing key per question, and the first question asked for each key"""
+    keys = [normalize_query(q) for q in questions]
+    originals = {}
+    for key, question in zip(keys, questions):
+        originals.setdefault(key, question)
+    return keys, originals
+
 
 class PolicyQueryHandler(BaseQueryHandler):
     """Handles policy questions using RAG (Chroma DB)"""
@@ -16,6 +39,34 @@ class PolicyQueryHandler(BaseQueryHandler):
     def can_handle(self, query_type: str) -> bool:
         return query_type == "policy"
     
+    @staticmethod
+    def _query(question: str) -> dict:
+        if policy_flights is None:
+            return query_hr_documents(question)
+        return policy_flights.do(normalize_query(question), lambda: query_hr_documents(question))
+    
+    @staticmethod
+    def _query_batch(questions: list[str]) -> list[dict]:
+        if policy_flights is None:
+            return query_hr_documents_batch(questions)
+        keys, originals = _originals(questions)
+        return policy_flights.do_many(keys, lambda missing: query_hr_documents_batch([originals[k] for k in missing]))
+    
+    @staticmethod
+    async def _aquery(question: str) -> dict:
+        if policy_flights is None:
+            return await aquery_hr_documents(question)
+        return await policy_flights.ado(normalize_query(question), lambda: aquery_hr_documents(question))
+    
+    @staticmethod
+    async def _aquery_batch(questions: list[str]) -> list[dict]:
+        if policy_flights is None:
+            return await aquery_hr_documents_batch(questions)
+        keys, originals = _originals(questions)
+        return await policy_flights.ado_many(
+            keys, lambda missing: aquery_hr_documents_batch([originals[k] for k in missing])
+        )
+    
     def handle(self, question: str, user_id: int | None = None) -> str:
         """
         Handle policy questions using vector database
@@ -30,8 +81,77 @@ class PolicyQueryHandler(BaseQueryHandler):
         logger.info(f"Handling policy query: {question}")
         
         try:
-            rag_result = query_hr_documents(question)
+            rag_result = self._query(question)
             return f"**{question}**\n\n{rag_result['answer']}"
         except Exception as e:
             logger.error(f"Error in policy query: {str(e)}")
-            return f"**{question}**\n\nSorry, I encountered an error retrieving policy information."
\ No newline at end of file
+            return f"**{question}**\n\nSorry, I encountered an error retrieving policy information."
+    
+    def handle_batch(self, questions: list[str]) -> list[str]:
+        """
+        Handle several policy questions with one embedding request and one vector search
+        
+        Args:
+            questions: Policy-related questions
+            
+        Returns:
+            One formatted answer per question, in order
+        """
+        logger.info(f"Handling {len(questions)} policy queries as a batch")
+        
+        try:
+            rag_results = self._query_batch(questions)
+            return [f"**{q}**\n\n{r['answer']}" for q, r in zip(questions, rag_results)]
+        except Exception as e:
+            logger.error(f"Error in batched policy query, retrying one by one: {str(e)}")
+            return [self.handle(q) for q in questions]
+    
+    async def ahandle(self, question: str, user_id: int | None = None) -> str:
+        """Async variant of handle: async embedding and LLM calls"""
+        logger.info(f"Handling policy query: {question}")
+        
+        try:
+            rag_result = await self._aquery(question)
+            return f"**{question}**\n\n{rag_result['answer']}"
+        except Exception as e:
+            logger.error(f"Error in policy query: {str(e)}")
+            return f"**{question}**\n\nSorry, I encountered an error retrieving policy information."
+    
+    async def ahandle_batch(self, questions: list[str]) -> list[str]:
+        """Async variant of handle_batch"""
+        logger.info(f"Handling {len(questions)} policy queries as a batch")
+        
+        try:
+            rag_results = await self._aquery_batch(questions)
+            return [f"**{q}**\n\n{r['answer']}" for q, r in zip(questions, rag_results)]
+        except Exception as e:
+            logger.error(f"Error in batched policy query, retrying one by one: {str(e)}")
+            return [await self.ahandle(q) for q in questions]
+    
+    async def astream(self, question: str, user_id: int | None = None) -> AsyncIterator[str]:
+        """
+        Stream a policy answer token by token
+        
+        Args:
+            question: Policy-related question
+            user_id: Not used for policy queries
+            
+        Yields:
+            The question header, then LLM tokens as they arrive
+        """
+        logger.info(f"Streaming policy query: {question}")
+        header = f"**{question}**\n\n"
+        if policy_flights is None:
+            tokens = retriever_runtime.astream_query(question)
+        else:
+            # Later identical questions replay the tokens so far, then follow live
+            tokens = policy_flights.astream(normalize_query(question), lambda: retriever_runtime.astream_query(question))
+        
+        try:
+            # Header goes out with the first token, i.e. once retrieval is done
+            async for token in tokens:
+                yield header + token
+                header = ""
+        except Exception as e:
+            logger.error(f"Error in streamed policy query: {str(e)}")
+            yield header + "Sorry, I encountered an error retrieving policy information."
@@ -2,7 +2,7 @@
 Pydantic models for the Agentic RAG system
 """
 
-from typing import Annotated, Literal, List
+from typing import Annotated, Literal, List, Dict
 from pydantic import BaseModel, Field
 from langgraph.graph.message import add_messages
 
@@ -27,12 +27,18 @@ class QueryDecomposition(BaseModel):
     )
 
 
+def merge_answers(left: Dict[int, str] | None, right: Dict[int, str] | None) -> Dict[int, str]:
+    """Reducer for answers written by parallel sub-query branches"""
+    return {**(left or {}), **(right or {})}
+
+
 class AgentState(BaseModel):
     """State object passed through the LangGraph workflow"""
     messages: Annotated[list, add_messages]
     sub_queries: List[SubQuery] | None = None
     is_multiple: bool = False
-    current_query_index: int = 0
     query_results: List[str] | None = None
+    # Sub-query index -> formatted answer, filled in by the parallel branches
+    answers: Annotated[Dict[int, str], merge_answers] = Field(default_factory=dict)
     user_id: int | None = None
     query_type: str | None = None  
\ No newline at end of file
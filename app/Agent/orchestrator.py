@@ -3,91 +3,176 @@ LangGraph orchestrator - coordinates the overall workflow
 Single Responsibility: Only manages workflow logic
 """
 
+import asyncio
 import logging
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langgraph.config import get_stream_writer
 from langgraph.graph import StateGraph, START, END
+from langgraph.types import Send
 
 from app.Agent.models import AgentState
-from app.Agent.query_decomposer import decompose_query_node
+from app.Agent.query_decomposer import decompose_query_node, adecompose_query_node
 from app.Agent.handlers import handler_factory
+from app.Agent.handlers.policy_handler import PolicyQueryHandler
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Configurable flag: "answer" branches stream progress and tokens as custom events
+STREAM_TOKENS = "stream_tokens"
+
 
 # ============================================
 # LangGraph Nodes
 # ============================================
 
-def process_subquery(state: AgentState) -> dict:
-    """Process one sub-query at a time using appropriate handler"""
-    current_index = state.current_query_index
+def unique_subqueries(sub_queries: list) -> dict[int, int]:
+    """Map every sub-query index to the first index asking the same question (same type)"""
+    first_seen = {}
+    canonical = {}
+    for index, sub_query in enumerate(sub_queries):
+        key = (sub_query.query_type, " ".join(sub_query.question.lower().split()))
+        canonical[index] = first_seen.setdefault(key, index)
+    return canonical
+
+
+def plan_tasks(sub_queries: list) -> list[list[int]]:
+    """
+    Group unique sub-queries into parallel branches
+
+    Policy questions share one branch, so they still get one batched
+    embedding request and vector search; every other question gets its own.
+    """
+    canonical = unique_subqueries(sub_queries)
+    unique = [index for index, first in canonical.items() if index == first]
+    batched = [i for i in unique if isinstance(handler_factory.get_handler(sub_queries[i].query_type), PolicyQueryHandler)]
+    tasks = [batched] if batched else []
+    tasks += [[i] for i in unique if i not in batched]
+    return tasks
+
+
+def dispatch_subqueries(state: AgentState):
+    """Fan the sub-queries out to parallel "answer" branches (straight to combine if none)"""
     sub_queries = state.sub_queries or []
-    
-    if current_index >= len(sub_queries):
-        return state.dict()
-    
-    current_query = sub_queries[current_index]
-    logger.info(f"Processing sub-query {current_index + 1}/{len(sub_queries)}: {current_query.question}")
-    
-    # Get appropriate handler and process query
-    handler = handler_factory.get_handler(current_query.query_type)
-    result = handler.handle(current_query.question, state.user_id)
-    
-    # Store result
-    query_results = state.query_results or []
-    query_results.append(result)
-    
-    return {
-        "query_results": query_results,
-        "current_query_index": current_index + 1
-    }
+    tasks = plan_tasks(sub_queries)
+    if not tasks:
+        return "combine"
+
+    logger.info(f"Dispatching {len(sub_queries)} sub-queries as {len(tasks)} parallel tasks")
+    return [
+        Send("answer", {
+            "indexes": indexes,
+            "sub_queries": [sub_queries[i] for i in indexes],
+            "user_id": state.user_id
+        })
+        for indexes in tasks
+    ]
+
+
+def answer_subqueries(task: dict) -> dict:
+    """Answer one branch: a single sub-query, or the batch of policy sub-queries"""
+    sub_queries = task["sub_queries"]
+    handler = handler_factory.get_handler(sub_queries[0].query_type)
+    for sub_query in sub_queries:
+        logger.info(f"Processing sub-query: {sub_query.question}")
+
+    if len(sub_queries) > 1:
+        answers = handler.handle_batch([sq.question for sq in sub_queries])
+    else:
+        answers = [handler.handle(sub_queries[0].question, task["user_id"])]
+    return {"answers": dict(zip(task["indexes"], answers))}
+
+
+async def astream_subqueries(task: dict, handler) -> list[str]:
+    """
+    Answer a branch through handler.astream, writing events to the graph's custom stream
+
+    Events are dicts with "event" and "data" keys, tagged with the sub-query
+    index: progress (the "retrieving" or "answering" stage), token and
+    sub_query_done. The sub-queries of a batched branch stream concurrently.
+    """
+    write = get_stream_writer()
+    semaphore = asyncio.Semaphore(max(1, settings.AGENT_MAX_PARALLEL_SUBQUERIES))
+
+    async def stream_one(index: int, sub_query) -> str:
+        async with semaphore:
+            stage = "retrieving" if sub_query.query_type in ("policy", "personal_data") else "answering"
+            write({"event": "progress", "data": {"index": index, "stage": stage, "question": sub_query.question}})
+            parts = []
+            async for token in handler.astream(sub_query.question, task["user_id"]):
+                if not parts and stage != "answering":
+                    write({"event": "progress", "data": {"index": index, "stage": "answering"}})
+                parts.append(token)
+                write({"event": "token", "data": {"index": index, "text": token}})
+            answer = "".join(parts)
+            write({"event": "sub_query_done", "data": {"index": index, "answer": answer}})
+            return answer
+
+    return await asyncio.gather(*(stream_one(i, sq) for i, sq in zip(task["indexes"], task["sub_queries"])))
+
+
+async def aanswer_subqueries(task: dict, config: RunnableConfig) -> dict:
+    """Async variant of answer_subqueries used by hr_agent_graph.ainvoke and astream"""
+    sub_queries = task["sub_queries"]
+    handler = handler_factory.get_handler(sub_queries[0].query_type)
+    for sub_query in sub_queries:
+        logger.info(f"Processing sub-query: {sub_query.question}")
+
+    if config.get("configurable", {}).get(STREAM_TOKENS):
+        answers = await astream_subqueries(task, handler)
+    elif len(sub_queries) > 1:
+        answers = await handler.ahandle_batch([sq.question for sq in sub_queries])
+    else:
+        answers = [await handler.ahandle(sub_queries[0].question, task["user_id"])]
+    return {"answers": dict(zip(task["indexes"], answers))}
 
 
-def should_continue(state: AgentState) -> str:
-    """Determine if we should process more sub-queries"""
-    sub_queries = state.sub_queries or []
-    current_index = state.current_query_index
-    
-    return "continue" if current_index < len(sub_queries) else "finish"
+def ordered_results(sub_queries: list, answers: dict[int, str]) -> list[str]:
+    """Answers in the order the questions were asked, each repeated question once"""
+    firsts = sorted(set(unique_subqueries(sub_queries).values()))
+    return [answers[index] for index in firsts if index in answers]
 
 
 def combine_results(state: AgentState) -> dict:
     """Combine all sub-query results into final answer"""
+    logger.debug(f"Combining {len(state.answers or {})} answers for {len(state.sub_queries or [])} sub-queries")
 
-    print("=" * 50)
-    print("COMBINE_RESULTS CALLED!")
-    print(f"State: {state}")
-    print("=" * 50)
-    
-    query_results = state.query_results or []
     sub_queries = state.sub_queries or []
+    query_results = ordered_results(sub_queries, state.answers or {})
     
-    if not query_results:
-        final_answer = "I couldn't process your questions. Please try again."
-    elif len(query_results) == 1:
-        final_answer = query_results[0]
-    else:
-        final_answer = "Here are the answers to your questions:\n\n" + "\n\n---\n\n".join(query_results)
-    
-    # Determine query_type for metadata
-    if sub_queries:
-        if len(sub_queries) == 1:
-            # Single query - use its type
-            query_type = sub_queries[0].query_type
-        else:
-            # Multiple queries - mark as compound
-            query_type = "compound"
-    else:
-        query_type = "general"
+    final_answer = format_final_answer(query_results)
+    query_type = resolve_query_type(sub_queries)
     
     # Return ALL relevant state information
     return {
         "messages": [{"role": "assistant", "content": final_answer}],
+        "query_results": query_results,
         "query_type": query_type,        
         "is_multiple": state.is_multiple, 
         "sub_queries": sub_queries       
     }
 
 
+def format_final_answer(query_results: list[str]) -> str:
+    """Join sub-query answers into the message shown to the user"""
+    if not query_results:
+        return "I couldn't process your questions. Please try again."
+    if len(query_results) == 1:
+        return query_results[0]
+    return "Here are the answers to your questions:\n\n" + "\n\n---\n\n".join(query_results)
+
+
+def resolve_query_type(sub_queries: list) -> str:
+    """Overall query type for response metadata"""
+    if not sub_queries:
+        return "general"
+    if len(sub_queries) == 1:
+        # Single query - use its type
+        return sub_queries[0].query_type
+    # Multiple queries - mark as compound
+    return "compound"
+
+
 # ============================================
 # Build Graph
 # ============================================
@@ -96,30 +181,33 @@ def create_agentic_orchestrator():
     """Build and compile the LangGraph workflow"""
     graph_builder = StateGraph(AgentState)
 
-    # Add nodes
-    graph_builder.add_node("decompose", decompose_query_node)
-    graph_builder.add_node("process", process_subquery)
+    # Add nodes - sync and async implementations, so both invoke() and
+    # ainvoke() work; the API uses ainvoke to keep the event loop free
+    graph_builder.add_node(
+        "decompose",
+        RunnableLambda(decompose_query_node, afunc=adecompose_query_node, name="decompose")
+    )
+    graph_builder.add_node(
+        "answer",
+        RunnableLambda(answer_subqueries, afunc=aanswer_subqueries, name="answer")
+    )
     graph_builder.add_node("combine", combine_results)
 
     # Build workflow
     graph_builder.add_edge(START, "decompose")
-    graph_builder.add_edge("decompose", "process")
     
-    # Loop through sub-queries
-    graph_builder.add_conditional_edges(
-        "process",
-        should_continue,
-        {
-            "continue": "process",
-            "finish": "combine"
-        }
-    )
+    # Fan out: one "answer" branch per task, all in the same step
+    graph_builder.add_conditional_edges("decompose", dispatch_subqueries, ["answer", "combine"])
+    graph_builder.add_edge("answer", "combine")
     
     graph_builder.add_edge("combine", END)
 
-    return graph_builder.compile()
+    # Caps the branches running at once, for invoke() and ainvoke() alike
+    return graph_builder.compile().with_config(
+        max_concurrency=max(1, settings.AGENT_MAX_PARALLEL_SUBQUERIES)
+    )
 
 
 # Create the compiled graph
 hr_agent_graph = create_agentic_orchestrator()
-logger.info("HR Agent Graph compiled successfully")
\ No newline at end of file
+logger.info("HR Agent Graph compiled successfully")
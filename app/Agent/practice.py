@@ -4,20 +4,17 @@ from dotenv import load_dotenv
 from typing import Annotated, Literal
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
-from langchain.chat_models import init_chat_model
 from pydantic import BaseModel, Field
 from sqlalchemy import text
 
+from app.core.providers import provider_clients
 from app.db.session import get_db
 from app.services.retriever import query_hr_documents, get_vectorstore
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
-llm = init_chat_model(
-    "llama-3.1-8b-instant",
-    model_provider="groq"
-)
+llm = provider_clients.groq_chat(temperature=0.7)  # ChatGroq default
 
 class MessageClassifier(BaseModel):
     message_type: Literal["emotional", "logical"] = Field(
@@ -5,17 +5,71 @@ Single Responsibility Principle: Only handles query decomposition
 
 import logging
 from app.Agent.models import AgentState, QueryDecomposition
+from app.Agent.fast_router import FastRouter
 from app.Agent.utils.llm_config import llm
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.singleflight import SingleFlight
+from app.services.embedding_cache import normalize_query
+from app.services.retriever import retriever_runtime
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever the decomposition prompt changes, so cached results are not reused
+PROMPT_VERSION = "1"
+
+
+def _model_id(llm_instance) -> str:
+    for attribute in ("deployment_name", "model_name", "model"):
+        value = getattr(llm_instance, attribute, None)
+        if isinstance(value, str) and value:
+            return value
+    return type(llm_instance).__name__
+
 
 class QueryDecomposer:
-    """Decomposes user queries into individual sub-questions"""
+    """
+    Decomposes user queries into individual sub-questions
+
+    Results are cached by (prompt version, model, normalized message):
+    decomposition depends on nothing else, so a repeated message skips the
+    LLM call. For the same reason concurrent identical messages can share
+    one in-flight call through a SingleFlight.
+    """
     
-    def __init__(self, llm_instance=None):
+    def __init__(self, llm_instance=None, cache: LRUCache | None = None, flights: SingleFlight | None = None):
         self.llm = llm_instance or llm
         self.decomposer_llm = self.llm.with_structured_output(QueryDecomposition)
+        self.model_id = _model_id(self.llm)
+        self.cache = cache
+        self.flights = flights
+    
+    def _cache_key(self, content: str) -> tuple:
+        return (PROMPT_VERSION, self.model_id, normalize_query(content))
+    
+    def _cached(self, content: str) -> QueryDecomposition | None:
+        if self.cache is None:
+            return None
+        result = self.cache.get(self._cache_key(content))
+        if result is not None:
+            logger.info("Decomposition cache hit")
+            # Copy, so no request can change the cached sub-queries
+            return result.model_copy(deep=True)
+        return None
+    
+    def _store(self, content: str, result: QueryDecomposition) -> None:
+        if self.cache is not None:
+            self.cache.set(self._cache_key(content), result.model_copy(deep=True))
+    
+    def _compute(self, content: str) -> QueryDecomposition:
+        result = self.decomposer_llm.invoke(self._build_messages(content))
+        self._store(content, result)
+        return result
+    
+    async def _acompute(self, content: str) -> QueryDecomposition:
+        result = await self.decomposer_llm.ainvoke(self._build_messages(content))
+        self._store(content, result)
+        return result
     
     def decompose(self, state: AgentState) -> dict:
         """
@@ -27,16 +81,37 @@ class QueryDecomposer:
         Returns:
             Updated state dict with sub_queries
         """
-        last_message = state.messages[-1]
-        
-        result = self.decomposer_llm.invoke([
+        content = state.messages[-1].content
+        result = self._cached(content)
+        if result is None and self.flights is None:
+            result = self._compute(content)
+        elif result is None:
+            # Shared by every concurrent caller, so each gets its own copy
+            result = self.flights.do(self._cache_key(content), lambda: self._compute(content)).model_copy(deep=True)
+        return self._to_state_update(result)
+    
+    async def adecompose(self, state: AgentState) -> dict:
+        """Async variant of decompose"""
+        content = state.messages[-1].content
+        result = self._cached(content)
+        if result is None and self.flights is None:
+            result = await self._acompute(content)
+        elif result is None:
+            result = await self.flights.ado(self._cache_key(content), lambda: self._acompute(content))
+            result = result.model_copy(deep=True)
+        return self._to_state_update(result)
+    
+    def _build_messages(self, content: str) -> list:
+        return [
             {
                 "role": "system",
                 "content": self._get_decomposition_prompt()
             },
-            {"role": "user", "content": last_message.content}
-        ])
-        
+            {"role": "user", "content": content}
+        ]
+    
+    @staticmethod
+    def _to_state_update(result: QueryDecomposition) -> dict:
         logger.info(f"Decomposed into {len(result.sub_queries)} sub-queries")
         for i, sq in enumerate(result.sub_queries):
             logger.info(f"  Sub-query {i+1}: [{sq.query_type}] {sq.question}")
@@ -80,8 +155,64 @@ is_multiple: True
 Keep each question standalone and complete."""
 
 
+def _make_fast_router() -> FastRouter | None:
+    if not settings.FAST_ROUTER_ENABLED:
+        return None
+    return FastRouter(
+        # The retriever's cached query embedding: a policy question routed
+        # here is not embedded a second time for retrieval
+        embedding_factory=(lambda: retriever_runtime.embedding) if settings.FAST_ROUTER_USE_EMBEDDINGS else None,
+        min_margin=settings.FAST_ROUTER_MIN_MARGIN
+    )
+
+
+fast_router = _make_fast_router()
+
+decomposition_cache = LRUCache(
+    maxsize=settings.DECOMPOSITION_CACHE_MAX_ENTRIES,
+    ttl=settings.DECOMPOSITION_CACHE_TTL_SECONDS
+) if settings.DECOMPOSITION_CACHE_ENABLED else None
+
+decomposition_flights = SingleFlight("decomposition") if settings.SINGLE_FLIGHT_ENABLED else None
+
+_decomposer: QueryDecomposer | None = None
+
+
+def get_decomposer() -> QueryDecomposer:
+    """Shared decomposer, so the structured-output runnable is built once"""
+    global _decomposer
+    # Rebuilt if the module's llm is swapped (tests, benchmarks)
+    if _decomposer is None or _decomposer.llm is not llm:
+        _decomposer = QueryDecomposer(llm, cache=decomposition_cache, flights=decomposition_flights)
+    return _decomposer
+
+
+def decomposition_stats() -> dict:
+    """Fast-path and cache counters for health reporting"""
+    return {
+        "fast_router": fast_router.stats() if fast_router else None,
+        "cache": decomposition_cache.stats() if decomposition_cache else None
+    }
+
+
+def _fast_path_update(sub_queries) -> dict:
+    return QueryDecomposer._to_state_update(QueryDecomposition(sub_queries=sub_queries, is_multiple=False))
+
+
 # Convenience function for use in LangGraph nodes
 def decompose_query_node(state: AgentState) -> dict:
     """LangGraph node wrapper for QueryDecomposer"""
-    decomposer = QueryDecomposer()
-    return decomposer.decompose(state)
\ No newline at end of file
+    if fast_router is not None:
+        sub_queries = fast_router.route(state.messages[-1].content)
+        if sub_queries is not None:
+            return _fast_path_update(sub_queries)
+    return get_decomposer().decompose(state)
+
+
+async def adecompose_query_node(state: AgentState) -> dict:
+    """Async LangGraph node wrapper for QueryDecomposer"""
+    if fast_router is not None:
+        sub_queries = await fast_router.aroute(state.messages[-1].content)
+        if sub_queries is not None:
+            return _fast_path_update(sub_queries)
+    return await get_decomposer().adecompose(state)
@@ -0,0 +1,74 @@
+"""
+Streaming execution of the agent workflow
+Runs the compiled LangGraph orchestrator (decompose → answer the
+sub-queries in parallel branches → combine) and turns its streamed
+updates and the answer branches' custom events into progress events and
+answer tokens the API forwards over server-sent events. Events of
+different sub-queries interleave; each carries its index.
+"""
+
+import logging
+from typing import AsyncIterator
+
+from app.Agent.models import AgentState
+from app.Agent.orchestrator import STREAM_TOKENS, hr_agent_graph, unique_subqueries
+
+logger = logging.getLogger(__name__)
+
+
+async def stream_agent_answer(question: str, user_id: int | None = None) -> AsyncIterator[dict]:
+    """
+    Run the agent for one user message, yielding events as they occur
+
+    Events are dicts with "event" and "data" keys:
+    - decomposed: the sub-queries found in the message
+    - progress: a sub-query entering the "retrieving" or "answering" stage
+    - token: a piece of a sub-query's answer
+    - sub_query_done: a sub-query's complete answer
+    - done: the assembled final answer and its metadata
+
+    Args:
+        question: The user's message
+        user_id: Authenticated user, needed for personal data queries
+    """
+    state = AgentState(messages=[{"role": "user", "content": question}], user_id=user_id)
+    # Repeated sub-queries are answered once; their copies get the same answer
+    copies: dict[int, list[int]] = {}
+
+    async for mode, chunk in hr_agent_graph.astream(
+        state,
+        {"configurable": {STREAM_TOKENS: True}},
+        stream_mode=["updates", "custom"]
+    ):
+        if mode == "custom":
+            if chunk["event"] == "sub_query_done":
+                index = chunk["data"]["index"]
+                for copy in copies.get(index, [index]):
+                    yield {"event": "sub_query_done", "data": {**chunk["data"], "index": copy}}
+            else:
+                yield chunk
+            continue
+
+        for node, update in chunk.items():
+            if node == "decompose":
+                sub_queries = update["sub_queries"] or []
+                copies = {}
+                for index, first in unique_subqueries(sub_queries).items():
+                    copies.setdefault(first, []).append(index)
+                yield {
+                    "event": "decomposed",
+                    "data": {
+                        "is_multiple": update["is_multiple"],
+                        "sub_queries": [sq.model_dump() for sq in sub_queries]
+                    }
+                }
+            elif node == "combine":
+                yield {
+                    "event": "done",
+                    "data": {
+                        "answer": update["messages"][-1]["content"],
+                        "query_type": update["query_type"],
+                        "is_compound": update["is_multiple"],
+                        "num_questions": len(update["sub_queries"]) or 1
+                    }
+                }
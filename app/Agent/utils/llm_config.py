@@ -72,9 +72,9 @@ LLM configuration with fallback
 import os
 import logging
 from dotenv import load_dotenv
-from langchain_openai import AzureChatOpenAI
-from langchain.chat_models import init_chat_model
 from app.core.config import settings
+from app.core.providers import provider_clients
+from app.core.llm_router import chat_router
 
 load_dotenv()
 logger = logging.getLogger(__name__)
@@ -88,34 +88,30 @@ def get_llm(temperature: float = 1.0):
     1. Azure OpenAI (if configured)
     2. Groq (fallback)
     
+    With LLM_ROUTER_ENABLED the choice is made per call by an LLMRouter
+    (circuit breakers, hedged requests) instead of once here.
+    
     Args:
         temperature: Controls randomness
     
     Returns:
         Configured LLM instance
     """
+    if settings.LLM_ROUTER_ENABLED:
+        return chat_router(temperature)
+
     # Try Azure OpenAI first
     if settings.AZURE_OPENAI_API_KEY and settings.AZURE_OPENAI_ENDPOINT:
         try:
             logger.info("Using Azure OpenAI")
-            return AzureChatOpenAI(
-                azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
-                azure_deployment=settings.AZURE_OPENAI_DEPLOYMENT,
-                api_key=settings.AZURE_OPENAI_API_KEY,
-                api_version=settings.AZURE_OPENAI_API_VERSION,
-                temperature=temperature
-            )
+            return provider_clients.azure_chat(temperature=temperature)
         except Exception as e:
             logger.warning(f"Azure OpenAI failed: {e}. Falling back to Groq.")
     
     # Fallback to Groq
     if settings.GROQ_API_KEY:
         logger.info("Using Groq as fallback")
-        return init_chat_model(
-            "llama-3.1-8b-instant",
-            model_provider="groq",
-            temperature=temperature
-        )
+        return provider_clients.groq_chat(temperature=temperature)
     
     raise ValueError("No LLM provider configured! Set AZURE_OPENAI_API_KEY or GROQ_API_KEY")
 
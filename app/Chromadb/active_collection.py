@@ -0,0 +1,183 @@
+# active_collection.py
+"""
+Blue/green collection versions behind an atomic pointer
+
+Ingestion never writes into the collection readers are using. Each build
+goes into a new physical collection, <name>_v<n>. Once that collection is
+complete, <name>.active.json is replaced atomically to point at it.
+Readers resolve the logical name through the pointer and watch its mtime,
+so every worker switches on its next query without a restart.
+Replaced collections are listed in <name>.retired.json. They are dropped
+once they have been inactive for a grace period, so queries still running
+on them finish normally.
+Builds of one logical name are serialized by an exclusive lock on
+<name>.sync.lock, so a watch loop and a manual sync never race.
+"""
+
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+
+def active_pointer_path(persist_directory: str, collection_name: str) -> str:
+    return os.path.join(persist_directory, f"{collection_name}.active.json")
+
+
+def retired_list_path(persist_directory: str, collection_name: str) -> str:
+    return os.path.join(persist_directory, f"{collection_name}.retired.json")
+
+
+def sync_lock_path(persist_directory: str, collection_name: str) -> str:
+    return os.path.join(persist_directory, f"{collection_name}.sync.lock")
+
+
+def _try_lock(f) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+@contextmanager
+def sync_lock(persist_directory: str, collection_name: str, poll_seconds: float = 0.5):
+    """
+    Hold the exclusive build lock of a logical collection name
+
+    Blocks while another sync, rebuild or gc of the same name runs, in this
+    process or another. The lock is not reentrant. The operating system
+    releases it if the holder dies, so a crashed run never leaves it stuck.
+    """
+    os.makedirs(persist_directory, exist_ok=True)
+    path = sync_lock_path(persist_directory, collection_name)
+    with open(path, "a+b") as f:
+        if not _try_lock(f):
+            logger.info("Waiting for another sync of %s to finish", collection_name)
+            while not _try_lock(f):
+                time.sleep(poll_seconds)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def versioned_collection_name(collection_name: str, number: int) -> str:
+    return f"{collection_name}_v{number}"
+
+
+def read_active_pointer(persist_directory: str, collection_name: str) -> dict:
+    """Return the pointer contents, or {} before the first blue/green build"""
+    path = active_pointer_path(persist_directory, collection_name)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning("Unreadable active collection pointer %s: %s", path, e)
+        return {}
+
+
+def active_collection_name(persist_directory: str, collection_name: str) -> str:
+    """Physical collection serving a logical name (the name itself for unversioned indexes)"""
+    return read_active_pointer(persist_directory, collection_name).get("collection") or collection_name
+
+
+def active_pointer_stamp(persist_directory: str, collection_name: str) -> int | None:
+    """The pointer's mtime in ns, or None if there is no pointer"""
+    try:
+        return os.stat(active_pointer_path(persist_directory, collection_name)).st_mtime_ns
+    except OSError:
+        return None
+
+
+def next_collection_number(pointer: dict) -> int:
+    return pointer.get("number", 0) + 1
+
+
+def _read_retired(persist_directory: str, collection_name: str) -> list[dict]:
+    try:
+        with open(retired_list_path(persist_directory, collection_name), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError) as e:
+        logger.warning("Unreadable retired collection list for %s: %s", collection_name, e)
+        return []
+
+
+def _write_json(path: str, payload) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def activate_collection(persist_directory: str, collection_name: str, physical_name: str, number: int, **fields) -> dict:
+    """
+    Atomically point the logical name at a new physical collection
+
+    The previously active collection (including an unversioned one under
+    the logical name) goes on the retired list with a timestamp. The list
+    lives in its own file so garbage collection never touches the pointer
+    that readers watch.
+    """
+    previous = read_active_pointer(persist_directory, collection_name)
+    previous_name = previous.get("collection") or collection_name
+    now = datetime.now(timezone.utc).isoformat()
+
+    pointer = {
+        "collection_name": collection_name,
+        "collection": physical_name,
+        "number": number,
+        "activated_at": now,
+        **fields
+    }
+    _write_json(active_pointer_path(persist_directory, collection_name), pointer)
+
+    if previous_name != physical_name:
+        retired = _read_retired(persist_directory, collection_name)
+        retired.append({"collection": previous_name, "retired_at": now})
+        _write_json(retired_list_path(persist_directory, collection_name), retired)
+    return pointer
+
+
+def expired_collections(persist_directory: str, collection_name: str, grace_seconds: float) -> list[str]:
+    """Retired collections whose grace period is over (never the active one)"""
+    active = active_collection_name(persist_directory, collection_name)
+    now = datetime.now(timezone.utc)
+    return [
+        entry["collection"]
+        for entry in _read_retired(persist_directory, collection_name)
+        if (now - datetime.fromisoformat(entry["retired_at"])).total_seconds() >= grace_seconds
+        and entry["collection"] != active
+    ]
+
+
+def forget_retired(persist_directory: str, collection_name: str, dropped: list[str]) -> None:
+    """Remove dropped collections from the retired list"""
+    retired = _read_retired(persist_directory, collection_name)
+    _write_json(
+        retired_list_path(persist_directory, collection_name),
+        [entry for entry in retired if entry["collection"] not in dropped]
+    )
@@ -0,0 +1,154 @@
+# dedup.py
+"""
+Near-duplicate chunk detection with MinHash and LSH
+
+Policy documents repeat boilerplate clauses word for word, or almost.
+Each chunk gets a MinHash signature over its word shingles. An LSH
+banding index finds earlier chunks that probably resemble it, and the
+signature agreement between the two estimates their Jaccard similarity.
+A chunk at or above the threshold is not embedded: it becomes an alias of
+the chunk seen first. The index and the signatures are saved next to the
+collection as <collection>.minhash.npz, so incremental syncs also match
+new chunks against the ones already stored.
+"""
+
+import hashlib
+import logging
+import os
+import re
+from collections import defaultdict
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def minhash_index_path(persist_directory: str, collection_name: str) -> str:
+    return os.path.join(persist_directory, f"{collection_name}.minhash.npz")
+
+
+def _lsh_params(threshold: float, num_perm: int) -> tuple[int, int]:
+    """Bands and rows per band whose S-curve crosses 0.5 closest to the threshold"""
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        crossing = (1 / bands) ** (1 / rows)
+        if best is None or abs(crossing - threshold) < best[0]:
+            best = (abs(crossing - threshold), bands, rows)
+    return best[1], best[2]
+
+
+class MinHashLSH:
+    """
+    MinHash signatures plus an LSH banding index over chunk ids
+
+    Args:
+        threshold: Estimated Jaccard similarity at which chunks are duplicates
+        num_perm: Signature length; more is more accurate and slower
+        shingle_size: Words per shingle
+        seed: Fixes the permutations, so signatures are comparable across runs
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = _lsh_params(threshold, num_perm)
+        generator = np.random.RandomState(seed)
+        self._a = generator.randint(1, (1 << 32) - 1, size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, (1 << 32) - 1, size=num_perm, dtype=np.uint64)
+        self.signatures: dict[str, np.ndarray] = {}
+        self._buckets: list[dict[bytes, set]] = [defaultdict(set) for _ in range(self.bands)]
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def signature(self, text: str) -> np.ndarray:
+        words = _WORD.findall(text.lower())
+        size = self.shingle_size
+        shingles = {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+        # Universal hashing per permutation; uint64 wrap-around is part of the hash
+        with np.errstate(over="ignore"):
+            permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def query(self, signature: np.ndarray) -> tuple[str | None, float]:
+        """Most similar indexed chunk at or above the threshold, as (id, estimated Jaccard)"""
+        candidates = set()
+        for band, key in self._band_keys(signature):
+            candidates |= self._buckets[band].get(key, set())
+        best_id, best_score = None, 0.0
+        for chunk_id in candidates:
+            score = float(np.mean(self.signatures[chunk_id] == signature))
+            if score > best_score:
+                best_id, best_score = chunk_id, score
+        if best_score >= self.threshold:
+            return best_id, best_score
+        return None, best_score
+
+    def add(self, chunk_id: str, signature: np.ndarray) -> None:
+        if chunk_id in self.signatures:
+            return
+        self.signatures[chunk_id] = signature
+        for band, key in self._band_keys(signature):
+            self._buckets[band][key].add(chunk_id)
+
+    def remove(self, chunk_id: str) -> None:
+        signature = self.signatures.pop(chunk_id, None)
+        if signature is None:
+            return
+        for band, key in self._band_keys(signature):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(chunk_id)
+                if not bucket:
+                    del self._buckets[band][key]
+
+    def save(self, path: str) -> None:
+        ids = list(self.signatures)
+        matrix = np.stack([self.signatures[i] for i in ids]) if ids else np.zeros((0, self.num_perm), np.uint32)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            ids=np.array(ids, dtype=object),
+            signatures=matrix,
+            params=np.array([self.threshold, self.num_perm, self.shingle_size])
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, threshold: float, num_perm: int, shingle_size: int = 5) -> "MinHashLSH":
+        """Load saved signatures; an index built with other parameters is ignored"""
+        index = cls(threshold=threshold, num_perm=num_perm, shingle_size=shingle_size)
+        if not os.path.exists(path):
+            return index
+        try:
+            with np.load(path, allow_pickle=True) as data:
+                _, saved_perm, saved_shingle = data["params"]
+                if int(saved_perm) != num_perm or int(saved_shingle) != shingle_size:
+                    logger.info("MinHash parameters changed, starting a fresh dedup index")
+                    return index
+                for chunk_id, signature in zip(data["ids"], data["signatures"]):
+                    index.add(str(chunk_id), signature)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Unreadable dedup index %s: %s", path, e)
+        return index
+
+
+def join_sources(sources) -> str:
+    """Chroma metadata values are scalars, so the source list is stored as one string"""
+    return "|".join(sorted(set(sources)))
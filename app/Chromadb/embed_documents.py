@@ -1,59 +1,539 @@
 # embed_documents.py
 import logging
-from sentence_transformers import SentenceTransformer
+import os
+import time
+from dataclasses import dataclass
 from langchain_chroma import Chroma
 from langchain.embeddings.base import Embeddings
-from app.Chromadb.file_loader import load_hr_documents, split_documents
-from langchain_openai import AzureOpenAIEmbeddings
+from app.Chromadb.embedding_backends import get_embedding_function, embedding_model_id
+from app.Chromadb.embedding_stage import EmbeddingStage, EmbeddingCheckpoint, checkpoint_path
+from app.Chromadb.dedup import MinHashLSH, minhash_index_path, join_sources
+from app.Chromadb.file_loader import list_hr_files, iter_hr_documents, iter_split_documents
+from app.Chromadb.active_collection import (
+    read_active_pointer,
+    next_collection_number,
+    versioned_collection_name,
+    activate_collection,
+    expired_collections,
+    forget_retired,
+    sync_lock
+)
+from app.Chromadb.index_metadata import write_index_metadata, index_metadata_path
+from app.Chromadb.lexical_index import BM25Index, lexical_index_path
+from app.Chromadb.manifest import ManifestDiff, read_manifest, write_manifest, diff_folder, manifest_path
+from app.Chromadb.pipeline import StreamingPipeline
 from app.core.config import settings
+from app.services.vector_index import full_precision_path
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_azure_embedding():
-    """Return Azure OpenAI Embedding instance."""
-    return AzureOpenAIEmbeddings(
-        azure_endpoint=settings.AZURE_EMBEDDINGS_ENDPOINT,
-        azure_deployment=settings.AZURE_EMBEDDINGS_DEPLOYMENT,
-        api_key=settings.AZURE_EMBEDDINGS_API_KEY,
-        api_version=settings.AZURE_OPENAI_API_VERSION
+METADATA_UPDATE_BATCH_SIZE = 256
+
+def get_azure_embedding(backend: str | None = None) -> Embeddings:
+    """Return the embedding instance for EMBEDDING_BACKEND (Azure OpenAI by default)."""
+    return get_embedding_function(backend)
+
+
+def _update_metadata(vectorstore: Chroma, docs) -> None:
+    """Same text, but offsets such as start_index may have moved; no re-embedding"""
+    vectorstore._collection.update(
+        ids=[doc.id for doc in docs],
+        metadatas=[doc.metadata for doc in docs]
+    )
+
+
+def _file_refs(files: dict) -> dict[str, set]:
+    refs: dict[str, set] = {}
+    for filename, entry in files.items():
+        for chunk_id in entry["chunk_ids"]:
+            refs.setdefault(chunk_id, set()).add(filename)
+    return refs
+
+
+def _update_shared_sources(vectorstore: Chroma, previous_files: dict, files: dict, loaded: set) -> int:
+    """
+    Record every file that references a collapsed chunk in its "sources" metadata
+
+    Only chunks shared by several files (now or before this run) are
+    touched. If the file a chunk was first seen in no longer references it,
+    "source" moves to one that does.
+    """
+    before, after = _file_refs(previous_files), _file_refs(files)
+    targets = [
+        chunk_id for chunk_id, sources in after.items()
+        if (len(sources) > 1 or len(before.get(chunk_id, ())) > 1)
+        and (sources != before.get(chunk_id) or sources & loaded)
+    ]
+    for start in range(0, len(targets), METADATA_UPDATE_BATCH_SIZE):
+        batch = targets[start:start + METADATA_UPDATE_BATCH_SIZE]
+        stored = vectorstore._collection.get(ids=batch, include=["metadatas"])
+        metadatas = []
+        for chunk_id, metadata in zip(stored["ids"], stored["metadatas"]):
+            metadata = dict(metadata or {})
+            metadata["sources"] = join_sources(after[chunk_id])
+            if metadata.get("source") not in after[chunk_id]:
+                metadata["source"] = sorted(after[chunk_id])[0]
+                # Offsets belonged to the old source file
+                metadata.pop("start_index", None)
+            metadatas.append(metadata)
+        if metadatas:
+            vectorstore._collection.update(ids=stored["ids"], metadatas=metadatas)
+    return len(targets)
+
+
+def _dedup_savings(counts: dict) -> dict:
+    """Rough cost avoided by not embedding and storing collapsed chunks"""
+    dimensions = counts["dimensions"]
+    return {
+        "collapsed_chunks": counts["duplicates"],
+        # ~4 characters per token for English text
+        "embedding_tokens": counts["duplicate_chars"] // 4,
+        # float32 vector plus stored text
+        "index_bytes": counts["duplicates"] * dimensions * 4 + counts["duplicate_chars"]
+    }
+
+
+def _copy_collection(source: Chroma, target: Chroma, batch_size: int = 1000) -> int:
+    """Copy ids, vectors, texts and metadata page by page"""
+    offset = 0
+    while True:
+        page = source._collection.get(
+            include=["embeddings", "documents", "metadatas"],
+            limit=batch_size,
+            offset=offset
+        )
+        if not len(page["ids"]):
+            return offset
+        target._collection.upsert(
+            ids=page["ids"],
+            embeddings=page["embeddings"],
+            documents=page["documents"],
+            metadatas=page["metadatas"]
+        )
+        offset += len(page["ids"])
+
+
+def collect_retired_collections(
+    persist_directory: str = "./chroma_db",
+    collection_name: str = "hr_documents",
+    grace_seconds: float | None = None
+) -> list[str]:
+    """Drop retired collections (and their side-cars) whose grace period has passed"""
+    if grace_seconds is None:
+        grace_seconds = settings.INDEX_RETIRED_GRACE_SECONDS
+    dropped = []
+    for name in expired_collections(persist_directory, collection_name, grace_seconds):
+        try:
+            Chroma(persist_directory=persist_directory, collection_name=name).delete_collection()
+        except Exception as e:
+            logger.warning(f"Could not drop retired collection '{name}': {e}")
+            continue
+        for path in (
+            index_metadata_path(persist_directory, name),
+            lexical_index_path(persist_directory, name),
+            manifest_path(persist_directory, name),
+            minhash_index_path(persist_directory, name),
+            full_precision_path(persist_directory, name),
+        ):
+            if os.path.exists(path):
+                os.remove(path)
+        dropped.append(name)
+        logger.info(f"🗑️ Dropped retired collection '{name}'")
+    if dropped:
+        forget_retired(persist_directory, collection_name, dropped)
+    return dropped
+
+
+def _rebuild_lexical_index(vectorstore: Chroma, persist_directory: str, collection_name: str) -> int:
+    """Rebuild the BM25 side-car from the collection contents (no embedding calls)"""
+    lexical_index = BM25Index()
+    offset = 0
+    while True:
+        stored = vectorstore._collection.get(include=["documents", "metadatas"], limit=1000, offset=offset)
+        if not stored["ids"]:
+            break
+        for doc_id, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+            lexical_index.add(doc_id, text or "", metadata or {})
+        offset += len(stored["ids"])
+    lexical_index.save(lexical_index_path(persist_directory, collection_name))
+    return len(lexical_index)
+
+
+@dataclass
+class SyncPlan:
+    """What a sync would do, computed from the manifest and the folder without side effects"""
+    model_id: str
+    manifest: dict
+    diff: ManifestDiff
+    full_rebuild: bool
+    source_collection: str
+    target_collection: str
+    target_number: int
+
+    def summary(self) -> dict:
+        return {
+            "embedding_model": self.model_id,
+            "active_collection": self.source_collection,
+            "target_collection": self.target_collection,
+            "full_rebuild": self.full_rebuild,
+            "added": self.diff.added,
+            "changed": self.diff.changed,
+            "removed": self.diff.removed,
+            "unchanged": len(self.diff.unchanged)
+        }
+
+
+def plan_sync(
+    docs_folder: str = "./data/hr_docs",
+    persist_directory: str = "./chroma_db",
+    collection_name: str = "hr_documents",
+    full_rebuild: bool = False
+) -> SyncPlan | None:
+    """
+    Compare the documents folder with the active collection's manifest
+
+    A full rebuild is planned when asked for, when there is no manifest yet,
+    or when the embedding model changed. Returns None if the folder has no
+    supported documents.
+    """
+    model_id = embedding_model_id()
+    pointer = read_active_pointer(persist_directory, collection_name)
+    source = pointer.get("collection") or collection_name
+    target_number = next_collection_number(pointer)
+    manifest = read_manifest(persist_directory, source)
+    if not manifest["files"]:
+        full_rebuild = True
+    elif manifest.get("embedding_model") != model_id:
+        logger.info(f"🔁 Embedding model changed ({manifest.get('embedding_model')} -> {model_id}), rebuilding")
+        full_rebuild = True
+    if full_rebuild:
+        manifest = {"files": {}}
+
+    filenames = list_hr_files(docs_folder)
+    if not filenames:
+        return None
+    return SyncPlan(
+        model_id=model_id,
+        manifest=manifest,
+        diff=diff_folder(manifest, docs_folder, filenames),
+        full_rebuild=full_rebuild,
+        source_collection=source,
+        target_collection=versioned_collection_name(collection_name, target_number),
+        target_number=target_number
     )
 
 
+def sync_vector_store(
+    docs_folder: str = "./data/hr_docs",
+    persist_directory: str = "./chroma_db",
+    collection_name: str = "hr_documents",
+    chunk_size: int = 800,
+    chunk_overlap: int = 150,
+    full_rebuild: bool = False
+) -> dict | None:
+    """
+    Bring the collection in line with the documents folder, blue/green
+
+    Changes are applied to a copy of the active collection, named
+    <collection_name>_v<n>, and the active pointer is switched only when that
+    copy is complete. Readers never see a half-built index. Only files whose
+    content hash changed are re-loaded and re-split, and only their new
+    chunks are embedded; chunks of edited or deleted files are removed. See
+    plan_sync for when the copy starts empty instead. A sync started while
+    another one of the same collection runs waits for it (see sync_lock).
+
+    Returns:
+        A run report (file and chunk counts, per-stage timings, index
+        version), or None if there were no documents
+    """
+    return _sync(docs_folder, persist_directory, collection_name, chunk_size, chunk_overlap, full_rebuild)[1]
+
+
 def setup_vector_store(
     docs_folder: str = "./data/hr_docs",
     persist_directory: str = "./chroma_db",
     collection_name: str = "hr_documents",
     chunk_size: int = 800,
-    chunk_overlap: int = 150
+    chunk_overlap: int = 150,
+    full_rebuild: bool = False
 ):
-    logger.info("📚 Loading documents...")
-    docs = load_hr_documents(docs_folder)
-    if not docs:
-        logger.error("❌ No documents found. Aborting.")
-        return None
+    """Sync the collection (see sync_vector_store) and return the active collection's Chroma handle"""
+    return _sync(docs_folder, persist_directory, collection_name, chunk_size, chunk_overlap, full_rebuild)[0]
+
 
-    logger.info("✂️ Splitting documents into chunks...")
-    split_docs = split_documents(docs, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+def _sync(docs_folder, persist_directory, collection_name, chunk_size, chunk_overlap, full_rebuild):
+    # Planned under the lock too: a sync that waited must see the version the other one activated
+    with sync_lock(persist_directory, collection_name):
+        return _sync_locked(docs_folder, persist_directory, collection_name, chunk_size, chunk_overlap, full_rebuild)
+
+
+def _sync_locked(docs_folder, persist_directory, collection_name, chunk_size, chunk_overlap, full_rebuild):
+    started = time.perf_counter()
+    plan = plan_sync(docs_folder, persist_directory, collection_name, full_rebuild)
+    if plan is None:
+        logger.error("❌ No documents found. Aborting.")
+        return None, None
+    model_id, manifest, diff, full_rebuild = plan.model_id, plan.manifest, plan.diff, plan.full_rebuild
+    logger.info(
+        f"🧾 Files: {len(diff.added)} new, {len(diff.changed)} changed, "
+        f"{len(diff.removed)} removed, {len(diff.unchanged)} unchanged"
+    )
+    report = {"collection": collection_name, **plan.summary()}
 
-    logger.info("🔧 Initializing Azure embedding function...")
+    logger.info(f"🔧 Initializing embedding function ({model_id})...")
     embedding = get_azure_embedding()
 
-    logger.info("💾 Creating Chroma vector store (from_documents)...")
-    vectorstore = Chroma.from_documents(
-        documents=split_docs,
-        embedding=embedding,
+    if not diff.has_changes:
+        logger.info("✅ Index already up to date, nothing to embed")
+        report["seconds"] = round(time.perf_counter() - started, 3)
+        active = Chroma(
+            persist_directory=persist_directory,
+            collection_name=plan.source_collection,
+            embedding_function=embedding
+        )
+        return active, report
+
+    target = plan.target_collection
+    # An interrupted earlier attempt may have left this version half built
+    Chroma(
+        persist_directory=persist_directory,
+        collection_name=target,
+        embedding_function=embedding
+    ).delete_collection()
+    vectorstore = Chroma(
         persist_directory=persist_directory,
-        collection_name=collection_name
+        collection_name=target,
+        embedding_function=embedding,
+        collection_metadata={"embedding_model": model_id}
     )
+    if not full_rebuild:
+        logger.info(f"📋 Copying '{plan.source_collection}' into '{target}'...")
+        source = Chroma(persist_directory=persist_directory, collection_name=plan.source_collection)
+        copied = _copy_collection(source, vectorstore)
+        logger.info(f"📋 Copied {copied} vectors (no embedding calls)")
+    else:
+        logger.info(f"🆕 Building '{target}' from scratch")
+
+    previous_files = manifest["files"]
+    chunk_ids_by_file: dict[str, list[str]] = {}
+    counts = {"new": 0, "kept": 0, "duplicates": 0, "duplicate_chars": 0, "dimensions": 0}
+
+    # Near-duplicate chunks become aliases of the chunk seen first
+    aliases: dict[str, str] = {}
+    lsh = None
+    if settings.INGEST_DEDUP_ENABLED:
+        lsh = MinHashLSH(threshold=settings.INGEST_DEDUP_THRESHOLD, num_perm=settings.INGEST_DEDUP_NUM_PERM)
+        if not full_rebuild:
+            lsh = MinHashLSH.load(
+                minhash_index_path(persist_directory, plan.source_collection),
+                threshold=settings.INGEST_DEDUP_THRESHOLD,
+                num_perm=settings.INGEST_DEDUP_NUM_PERM
+            )
+    # Old chunks of edited or deleted files must not absorb their own new
+    # versions; the ones still referenced after the run are put back below
+    withdrawn = {}
+    if lsh is not None:
+        unchanged_ids = {chunk_id for name in diff.unchanged for chunk_id in previous_files[name]["chunk_ids"]}
+        for name in diff.changed + diff.removed:
+            for chunk_id in previous_files[name]["chunk_ids"]:
+                if chunk_id not in unchanged_ids and chunk_id in lsh.signatures:
+                    withdrawn[chunk_id] = lsh.signatures[chunk_id]
+                    lsh.remove(chunk_id)
+
+    # Streamed files can fail after some of their chunks went through
+    failed_files = set()
+
+    def load(filenames):
+        return iter_hr_documents(
+            docs_folder,
+            list(filenames),
+            max_workers=settings.LOADER_MAX_WORKERS or None,
+            timeout=settings.LOADER_FILE_TIMEOUT_SECONDS,
+            stream_min_bytes=settings.LOADER_STREAM_MIN_BYTES,
+            part_chars=settings.LOADER_STREAM_PART_CHARS,
+            on_error=lambda filename, error: failed_files.add(filename)
+        )
+
+    def split(docs):
+        return iter_split_documents(docs, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+    def classify(chunk_lists):
+        """Pass on chunks that need embedding; refresh metadata of unchanged ones in place"""
+        kept = []
+        seen_by_file: dict[str, set] = {}
+        for chunks in chunk_lists:
+            if not chunks:
+                continue
+            filename = chunks[0].metadata["source"]
+            previous = set(previous_files.get(filename, {}).get("chunk_ids", ()))
+            ids = chunk_ids_by_file.setdefault(filename, [])
+            # Streamed files arrive as several lists
+            seen = seen_by_file.setdefault(filename, set())
+            for chunk in chunks:
+                # Identical chunks from one file share an id; Chroma rejects repeated ids
+                if chunk.id in seen:
+                    continue
+                seen.add(chunk.id)
+                ids.append(chunk.id)
+                if chunk.id in previous:
+                    counts["kept"] += 1
+                    kept.append(chunk)
+                else:
+                    counts["new"] += 1
+                    yield chunk
+            if len(kept) >= METADATA_UPDATE_BATCH_SIZE:
+                _update_metadata(vectorstore, kept)
+                kept = []
+        if kept:
+            _update_metadata(vectorstore, kept)
 
+    def deduplicate(chunks):
+        for chunk in chunks:
+            signature = lsh.signature(chunk.page_content)
+            canonical, _ = lsh.query(signature)
+            if canonical is not None:
+                aliases[chunk.id] = canonical
+                counts["duplicates"] += 1
+                counts["duplicate_chars"] += len(chunk.page_content)
+                continue
+            lsh.add(chunk.id, signature)
+            yield chunk
+
+    def upsert(batches):
+        for batch, vectors in batches:
+            counts["dimensions"] = counts["dimensions"] or len(vectors[0])
+            vectorstore._collection.upsert(
+                ids=[doc.id for doc in batch],
+                embeddings=vectors,
+                documents=[doc.page_content for doc in batch],
+                metadatas=[doc.metadata for doc in batch]
+            )
+            yield len(batch)
+
+    # Keyed by the logical name: checkpointed vectors stay valid across versions
+    checkpoint = EmbeddingCheckpoint(checkpoint_path(persist_directory, collection_name), model_id)
+    stage = EmbeddingStage(
+        embedding,
+        batch_size=settings.INGEST_EMBED_BATCH_SIZE,
+        max_concurrency=settings.INGEST_EMBED_CONCURRENCY,
+        max_retries=settings.INGEST_EMBED_MAX_RETRIES,
+        max_backoff=settings.INGEST_EMBED_MAX_BACKOFF_SECONDS,
+        checkpoint=checkpoint
+    )
+    pipeline = (
+        StreamingPipeline(diff.to_load, queue_size=settings.INGEST_QUEUE_SIZE)
+        .stage("load", load)
+        .stage("split", split)
+        .stage("classify", classify)
+    )
+    if lsh is not None:
+        pipeline.stage("dedup", deduplicate)
+    pipeline.stage("embed", stage.run).stage("upsert", upsert)
+
+    logger.info("🚰 Streaming new and changed documents through load → split → embed → upsert...")
     try:
-        count = vectorstore._collection.count()
-        logger.info(f"🎉 Chroma collection '{collection_name}' contains {count} vectors")
-    except:
-        pass
+        upserted = sum(pipeline.run())
+    finally:
+        checkpoint.close()
+        pipeline.log_report()
+    logger.info(f"📈 Embedding stage: {stage.stats()}")
+
+    files = {name: previous_files[name] for name in diff.unchanged}
+    failed_ids = {}
+    for filename in diff.to_load:
+        chunk_ids = list(dict.fromkeys(aliases.get(chunk_id, chunk_id) for chunk_id in chunk_ids_by_file.get(filename, ())))
+        if filename in failed_files:
+            # Retried next run; until then the last good version stays indexed
+            failed_ids[filename] = chunk_ids
+            if filename in previous_files:
+                files[filename] = previous_files[filename]
+        elif chunk_ids:
+            files[filename] = {**diff.file_states[filename], "chunk_ids": chunk_ids}
+
+    # A chunk goes only when no file references it any more (duplicates share chunks)
+    live_ids = {chunk_id for entry in files.values() for chunk_id in entry["chunk_ids"]}
+    stale_ids = sorted({
+        chunk_id
+        for name in diff.removed + diff.changed
+        for chunk_id in previous_files[name]["chunk_ids"]
+        if chunk_id not in live_ids
+    } | {
+        chunk_id
+        for chunk_ids in failed_ids.values()
+        for chunk_id in chunk_ids
+        if chunk_id not in live_ids
+    })
+    if stale_ids:
+        vectorstore.delete(ids=stale_ids)
+        if lsh is not None:
+            for chunk_id in stale_ids:
+                lsh.remove(chunk_id)
+    if lsh is not None:
+        for chunk_id, signature in withdrawn.items():
+            if chunk_id in live_ids:
+                lsh.add(chunk_id, signature)
+        _update_shared_sources(vectorstore, previous_files, files, set(diff.to_load))
+        lsh.save(minhash_index_path(persist_directory, target))
+
+    dedup_savings = _dedup_savings(counts)
+    logger.info(
+        f"🧮 Chunks: {upserted} embedded, {counts['kept']} unchanged, "
+        f"{counts['duplicates']} near-duplicates collapsed, {len(stale_ids)} deleted"
+    )
+    if counts["duplicates"]:
+        logger.info(
+            f"♻️ Dedup saved ~{dedup_savings['embedding_tokens']} embedding tokens "
+            f"and ~{dedup_savings['index_bytes'] / 1024:.0f} KiB of index"
+        )
 
-    return vectorstore
+    count = vectorstore._collection.count()
+    logger.info(f"🎉 Chroma collection '{target}' contains {count} vectors")
+
+    logger.info("🔎 Rebuilding BM25 lexical index...")
+    _rebuild_lexical_index(vectorstore, persist_directory, target)
+
+    write_manifest(persist_directory, target, {"embedding_model": model_id, "files": files})
+    # Everything is in Chroma and the manifest now; the next run starts clean
+    checkpoint.discard()
+
+    metadata = write_index_metadata(
+        persist_directory,
+        target,
+        chunk_count=count,
+        source_count=len(files),
+        embedding_model=model_id,
+        embedded_chunks=upserted,
+        deleted_chunks=len(stale_ids),
+        collapsed_duplicates=counts["duplicates"]
+    )
+
+    # The switch readers see: they reload (and drop cached answers) on their next query
+    activate_collection(
+        persist_directory,
+        collection_name,
+        target,
+        plan.target_number,
+        index_version=metadata["version"],
+        embedding_model=model_id
+    )
+    logger.info(f"🏷️ '{target}' is now active (index version {metadata['version']})")
+    dropped = collect_retired_collections(persist_directory, collection_name)
+
+    report.update(
+        failed=sorted(failed_files),
+        dropped_collections=dropped,
+        index_version=metadata["version"],
+        chunk_count=count,
+        embedded_chunks=upserted,
+        unchanged_chunks=counts["kept"],
+        deleted_chunks=len(stale_ids),
+        dedup=dedup_savings,
+        stages=pipeline.report(),
+        embedding=stage.stats(),
+        seconds=round(time.perf_counter() - started, 3)
+    )
+    return vectorstore, report
 
 if __name__ == "__main__":
     vs = setup_vector_store()
@@ -0,0 +1,123 @@
+# embedding_backends.py
+"""
+Embedding backends shared by ingestion and the retriever
+
+EMBEDDING_BACKEND selects Azure OpenAI ("azure") or a local
+sentence-transformers model on CPU ("local"). The model id returned by
+embedding_model_id() is stored with each collection build so a collection
+is never queried with vectors from a different model.
+"""
+
+import logging
+import os
+import threading
+from functools import lru_cache
+from langchain_core.embeddings import Embeddings
+from app.core.config import settings
+from app.core.providers import provider_clients
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingModelMismatch(RuntimeError):
+    """The collection was built with a different embedding model than the one configured"""
+
+
+class LocalSentenceTransformerEmbeddings(Embeddings):
+    """
+    sentence-transformers model running in-process
+
+    The model is loaded on first use, so importing this module (or building
+    the retriever with another backend) never pulls in torch. Inputs are
+    encoded in batches of batch_size; num_threads=0 uses every core.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int = 64,
+        num_threads: int = 0,
+        device: str = "cpu",
+        normalize: bool = True
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_threads = num_threads or os.cpu_count() or 1
+        self.device = device
+        self.normalize = normalize
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    import torch
+                    from sentence_transformers import SentenceTransformer
+
+                    torch.set_num_threads(self.num_threads)
+                    logger.info(
+                        f"Loading local embedding model {self.model_name} "
+                        f"on {self.device} ({self.num_threads} threads)"
+                    )
+                    self._model = SentenceTransformer(self.model_name, device=self.device)
+        return self._model
+
+    def _encode(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=self.normalize,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return vectors.tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._encode(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._encode([text])[0]
+
+
+def embedding_model_id(backend: str | None = None) -> str:
+    """Stable identifier of the configured embedding model, e.g. "local:all-MiniLM-L6-v2" """
+    backend = backend or settings.EMBEDDING_BACKEND
+    if backend == "azure":
+        return f"azure:{settings.AZURE_EMBEDDINGS_DEPLOYMENT}"
+    if backend == "local":
+        return f"local:{settings.LOCAL_EMBEDDING_MODEL}"
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+
+def get_embedding_function(backend: str | None = None) -> Embeddings:
+    """Return the embedding client for the configured (or given) backend"""
+    backend = backend or settings.EMBEDDING_BACKEND
+    if backend == "azure":
+        # Pooled transport shared with the chat models
+        return provider_clients.azure_embeddings()
+    if backend == "local":
+        return _local_embeddings(
+            settings.LOCAL_EMBEDDING_MODEL,
+            settings.LOCAL_EMBEDDING_BATCH_SIZE,
+            settings.LOCAL_EMBEDDING_THREADS
+        )
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+
+@lru_cache(maxsize=4)
+def _local_embeddings(model_name: str, batch_size: int, num_threads: int) -> LocalSentenceTransformerEmbeddings:
+    """One instance per configuration, so reloads and ingestion runs share the loaded model"""
+    return LocalSentenceTransformerEmbeddings(model_name=model_name, batch_size=batch_size, num_threads=num_threads)
+
+
+def check_embedding_model(recorded: str | None, expected: str, collection_name: str) -> None:
+    """Raise EmbeddingModelMismatch unless the recorded model matches (unrecorded builds pass)"""
+    if recorded and recorded != expected:
+        raise EmbeddingModelMismatch(
+            f"Collection '{collection_name}' was built with {recorded} but the configured "
+            f"embedding model is {expected}; re-index or change EMBEDDING_BACKEND"
+        )
@@ -0,0 +1,288 @@
+# embedding_stage.py
+"""
+Ingestion embedding stage
+
+Embeds chunks in fixed-size batches on a small thread pool. A shared
+limiter halves the number of concurrent requests and pauses every worker
+when the provider answers 429, then adds capacity back one success at a
+time. Finished batches go to a SQLite checkpoint keyed by chunk id, so a
+run that dies halfway resumes without paying for those vectors again.
+"""
+
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from itertools import islice
+from typing import Iterable, Iterator
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+_TRANSIENT_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def checkpoint_path(persist_directory: str, collection_name: str) -> str:
+    return os.path.join(persist_directory, f"{collection_name}.embed_checkpoint.sqlite3")
+
+
+class EmbeddingCheckpoint:
+    """Vectors of already-embedded chunks, keyed by chunk id, for one embedding model"""
+
+    def __init__(self, path: str, model: str):
+        self.path = path
+        self.model = model
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunk_vectors (chunk_id TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL)"
+        )
+        # Vectors from another model are useless for this run
+        self._conn.execute("DELETE FROM chunk_vectors WHERE model != ?", (model,))
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunk_vectors").fetchone()[0]
+
+    def get_many(self, chunk_ids: list[str]) -> dict[str, list[float]]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(chunk_ids), 500):
+                batch = chunk_ids[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT chunk_id, vector FROM chunk_vectors WHERE chunk_id IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                for chunk_id, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[chunk_id] = vector.tolist()
+        return found
+
+    def put_many(self, chunk_ids: list[str], vectors: list[list[float]]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunk_vectors (chunk_id, model, vector) VALUES (?, ?, ?)",
+                [(chunk_id, self.model, array("f", vector).tobytes()) for chunk_id, vector in zip(chunk_ids, vectors)]
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def discard(self) -> None:
+        """Close and delete the checkpoint once its vectors are safely stored"""
+        self.close()
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(self.path + suffix)
+            except FileNotFoundError:
+                pass
+
+
+class _AdaptiveLimiter:
+    """Concurrency limit with multiplicative decrease on throttling and additive increase on success"""
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.active = 0
+        self.paused_until = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while True:
+                wait_for = self.paused_until - time.monotonic()
+                if wait_for <= 0 and self.active < max(1, int(self.limit)):
+                    self.active += 1
+                    return
+                self._cond.wait(timeout=wait_for if wait_for > 0 else None)
+
+    def release(self, succeeded: bool) -> None:
+        with self._cond:
+            self.active -= 1
+            if succeeded and self.limit < self.max_concurrency:
+                self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def throttle(self, delay: float) -> None:
+        with self._cond:
+            self.limit = max(1.0, self.limit / 2)
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+            self._cond.notify_all()
+
+
+def _status_code(error: Exception) -> int | None:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def _retry_after(error: Exception) -> float | None:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    for name in ("retry-after-ms", "retry-after"):
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            seconds = float(value)
+        except ValueError:
+            continue
+        return seconds / 1000 if name.endswith("-ms") else seconds
+    return None
+
+
+def _is_transient(error: Exception) -> bool:
+    status = _status_code(error)
+    if status is not None:
+        return status in _TRANSIENT_STATUS
+    # Connection resets and timeouts carry no status code
+    return isinstance(error, (TimeoutError, ConnectionError)) or type(error).__name__ in (
+        "APIConnectionError", "APITimeoutError", "RateLimitError"
+    )
+
+
+class EmbeddingStage:
+    """
+    Batched, concurrent, throttling-aware document embedding
+
+    Args:
+        embedding: Any LangChain Embeddings implementation
+        batch_size: Chunks per provider request
+        max_concurrency: Upper bound on requests in flight
+        max_retries: Retries per batch for 429s and other transient errors
+        max_backoff: Cap on a single backoff, in seconds
+        checkpoint: Optional store that makes an interrupted run resumable
+    """
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        batch_size: int = 64,
+        max_concurrency: int = 4,
+        max_retries: int = 8,
+        max_backoff: float = 60.0,
+        checkpoint: EmbeddingCheckpoint | None = None
+    ):
+        self.embedding = embedding
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self.checkpoint = checkpoint
+        self._limiter = _AdaptiveLimiter(max_concurrency)
+        self._stats_lock = threading.Lock()
+        self.embedded = 0
+        self.resumed = 0
+        self.requests = 0
+        self.throttled = 0
+        self.retries = 0
+
+    def _backoff(self, error: Exception, attempt: int) -> float:
+        delay = _retry_after(error)
+        if delay is None:
+            delay = min(self.max_backoff, 2 ** attempt) * (0.5 + random.random() / 2)
+        return min(delay, self.max_backoff)
+
+    def _embed_batch(self, docs: list[Document]) -> tuple[list[Document], list[list[float]]]:
+        texts = [doc.page_content for doc in docs]
+        for attempt in range(self.max_retries + 1):
+            self._limiter.acquire()
+            try:
+                vectors = self.embedding.embed_documents(texts)
+            except Exception as e:
+                self._limiter.release(succeeded=False)
+                if attempt == self.max_retries or not _is_transient(e):
+                    raise
+                delay = self._backoff(e, attempt)
+                rate_limited = _status_code(e) == 429 or type(e).__name__ == "RateLimitError"
+                with self._stats_lock:
+                    self.retries += 1
+                    self.throttled += rate_limited
+                if rate_limited:
+                    logger.warning(f"Embedding provider throttled us, backing off {delay:.1f}s")
+                    self._limiter.throttle(delay)
+                else:
+                    logger.warning(f"Embedding batch failed ({e}), retrying in {delay:.1f}s")
+                    time.sleep(delay)
+                continue
+            self._limiter.release(succeeded=True)
+            with self._stats_lock:
+                self.requests += 1
+                self.embedded += len(docs)
+            if self.checkpoint is not None:
+                self.checkpoint.put_many([doc.id for doc in docs], vectors)
+            return docs, vectors
+
+    def _batches(self, docs: Iterable[Document]) -> Iterator[list[Document]]:
+        docs = iter(docs)
+        while batch := list(islice(docs, self.batch_size)):
+            yield batch
+
+    def _from_checkpoint(self, batch: list[Document]) -> tuple[list[Document], list[Document], list]:
+        """Split a batch into (docs to embed, checkpointed docs, their vectors)"""
+        if self.checkpoint is None:
+            return batch, [], []
+        stored = self.checkpoint.get_many([doc.id for doc in batch])
+        if not stored:
+            return batch, [], []
+        done = [doc for doc in batch if doc.id in stored]
+        self.resumed += len(done)
+        return [doc for doc in batch if doc.id not in stored], done, [stored[doc.id] for doc in done]
+
+    def run(self, docs: Iterable[Document]) -> Iterator[tuple[list[Document], list[list[float]]]]:
+        """
+        Yield (docs, vectors) batches as they finish
+
+        docs is consumed lazily: at most 2 * max_concurrency batches are
+        submitted ahead of the consumer. Chunks already in the checkpoint
+        are passed through without a provider call. Order across batches
+        is not preserved. If a batch still fails after its retries the
+        error propagates; finished batches stay checkpointed.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="embed") as executor:
+            in_flight = set()
+            try:
+                for batch in self._batches(docs):
+                    batch, done, vectors = self._from_checkpoint(batch)
+                    if done:
+                        yield done, vectors
+                    if not batch:
+                        continue
+                    in_flight.add(executor.submit(self._embed_batch, batch))
+                    if len(in_flight) >= 2 * self.max_concurrency:
+                        finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            yield future.result()
+                for future in as_completed(in_flight):
+                    yield future.result()
+            finally:
+                for future in in_flight:
+                    future.cancel()
+        if self.resumed:
+            logger.info(f"Reused {self.resumed} checkpointed vectors")
+
+    def stats(self) -> dict:
+        return {
+            "embedded": self.embedded,
+            "resumed": self.resumed,
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "concurrency_limit": round(self._limiter.limit, 2)
+        }
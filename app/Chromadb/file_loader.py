@@ -1,24 +1,104 @@
 # file_loader.py
 import os
+import time
+import codecs
+import hashlib
+import mmap
+from collections import deque
 import docx2txt
 import logging
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
 from PyPDF2 import PdfReader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 
 logger = logging.getLogger(__name__)
 
+# Bytes read to pick a text file's encoding, and bytes decoded per step after that
+ENCODING_SAMPLE_BYTES = 64 * 1024
+TEXT_BLOCK_BYTES = 1024 * 1024
+
+
+def iter_pdf_pages(reader: PdfReader):
+    """Yield the text of each non-empty page, one page in memory at a time"""
+    for page in reader.pages:
+        page_text = page.extract_text() or ""
+        if page_text.strip():
+            yield page_text
+
+
+def detect_encoding(sample: bytes) -> str:
+    """Pick an encoding from the start of a file; latin-1 decodes anything, so it comes last"""
+    for enc in ('utf-8', 'cp1252'):
+        try:
+            # A multi-byte character may be cut at the end of the sample
+            codecs.getincrementaldecoder(enc)().decode(sample, final=False)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return 'latin-1'
+
+
+def iter_txt_blocks(file_path: str, encoding: str | None = None):
+    """
+    Decode a memory-mapped text file block by block
+
+    The encoding is detected once from the first ENCODING_SAMPLE_BYTES.
+    Bytes that do not fit it further in are replaced rather than failing
+    the whole file.
+    """
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            encoding = encoding or detect_encoding(mapped[:ENCODING_SAMPLE_BYTES])
+            decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+            for start in range(0, len(mapped), TEXT_BLOCK_BYTES):
+                text = decoder.decode(mapped[start:start + TEXT_BLOCK_BYTES])
+                if text:
+                    yield text
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                yield tail
+
+
+def _cut_point(text: str, limit: int) -> int:
+    """Last paragraph (or line, sentence, word) break before limit, so parts end cleanly"""
+    for separator in ("\n\n", "\n", ". ", " "):
+        cut = text.rfind(separator, limit // 2, limit)
+        if cut != -1:
+            return cut + len(separator)
+    return limit
+
+
+def iter_text_parts(segments, part_chars: int, joiner: str = ""):
+    """
+    Regroup streamed segments (pages, decoded blocks) into parts of at most part_chars
+
+    Yields (offset, text): offset is where the part starts in the text the
+    segments would form joined with `joiner`, so chunk offsets stay
+    document-wide.
+    """
+    buffer, offset = "", 0
+    for number, segment in enumerate(segments):
+        buffer = f"{buffer}{joiner}{segment}" if number else segment
+        while len(buffer) >= part_chars:
+            cut = _cut_point(buffer, part_chars)
+            yield offset, buffer[:cut]
+            offset += cut
+            buffer = buffer[cut:]
+    if buffer.strip():
+        yield offset, buffer
+
+
 def load_pdf(file_path: str):
     try:
-        reader = PdfReader(file_path)
-        text = []
-        for i, page in enumerate(reader.pages):
-            page_text = page.extract_text() or ""
-            if page_text.strip():
-                # avoid verbose "Page X:" unless you want it
-                text.append(page_text)
-        content = "\n\n".join(text).strip()
-        metadata = {"source": os.path.basename(file_path), "file_type": "pdf", "page_count": len(reader.pages)}
+        # A path would be read into memory whole; the handle lets pages load as they are parsed
+        with open(file_path, "rb") as f:
+            reader = PdfReader(f)
+            content = "\n\n".join(iter_pdf_pages(reader)).strip()
+            metadata = {"source": os.path.basename(file_path), "file_type": "pdf", "page_count": len(reader.pages)}
         return content, metadata
     except Exception as e:
         logger.error("Error loading PDF %s: %s", file_path, e)
@@ -33,61 +113,298 @@ def load_docx(file_path: str):
         return "", {"source": os.path.basename(file_path), "error": str(e)}
 
 def load_txt(file_path: str):
-    encodings = ['utf-8', 'latin-1', 'cp1252']
-    for enc in encodings:
-        try:
-            with open(file_path, "r", encoding=enc) as f:
-                text = f.read()
-                return text.strip(), {"source": os.path.basename(file_path), "file_type": "txt", "encoding": enc}
-        except UnicodeDecodeError:
-            continue
-        except Exception as e:
-            logger.error("Error reading TXT %s: %s", file_path, e)
-            break
-    logger.error("Could not decode file: %s", file_path)
-    return "", {"source": os.path.basename(file_path), "error": "Encoding failed"}
-
-def load_hr_documents(folder_path: str = "./data/hr_docs"):
-    docs = []
+    try:
+        with open(file_path, "rb") as f:
+            encoding = detect_encoding(f.read(ENCODING_SAMPLE_BYTES))
+        text = "".join(iter_txt_blocks(file_path, encoding))
+        return text.strip(), {"source": os.path.basename(file_path), "file_type": "txt", "encoding": encoding}
+    except Exception as e:
+        logger.error("Error reading TXT %s: %s", file_path, e)
+        return "", {"source": os.path.basename(file_path), "error": str(e)}
+
+SUPPORTED_EXTENSIONS = {'.pdf', '.docx', '.txt'}
+
+
+def list_hr_files(folder_path: str = "./data/hr_docs"):
+    """Supported file names in the folder, sorted for a stable order"""
     if not os.path.exists(folder_path):
         logger.error("Documents folder not found: %s", folder_path)
-        return docs
+        return []
 
-    supported = {'.pdf', '.docx', '.txt'}
-    for filename in os.listdir(folder_path):
-        file_ext = os.path.splitext(filename)[1].lower()
-        if file_ext not in supported:
+    filenames = []
+    for filename in sorted(os.listdir(folder_path)):
+        if os.path.splitext(filename)[1].lower() not in SUPPORTED_EXTENSIONS:
             logger.warning("Skipping unsupported file type: %s", filename)
             continue
+        filenames.append(filename)
+    return filenames
 
-        path = os.path.join(folder_path, filename)
-        if file_ext == '.pdf':
-            text, metadata = load_pdf(path)
-        elif file_ext == '.docx':
-            text, metadata = load_docx(path)
-        else:
-            text, metadata = load_txt(path)
 
-        if text:
-            docs.append(Document(page_content=text, metadata=metadata))
-            logger.info("Loaded %s (%d chars)", filename, len(text))
-        else:
-            logger.warning("Empty/failed to load: %s", filename)
+def load_file(path: str):
+    """Load one supported file as a Document, or None if it is empty or unreadable"""
+    filename = os.path.basename(path)
+    file_ext = os.path.splitext(filename)[1].lower()
+    if file_ext == '.pdf':
+        text, metadata = load_pdf(path)
+    elif file_ext == '.docx':
+        text, metadata = load_docx(path)
+    else:
+        text, metadata = load_txt(path)
 
-    logger.info("Total documents loaded: %d", len(docs))
-    return docs
+    if not text:
+        logger.warning("Empty/failed to load: %s", filename)
+        return None
+    logger.info("Loaded %s (%d chars)", filename, len(text))
+    return Document(page_content=text, metadata=metadata)
 
 
-def split_documents(docs, chunk_size=500, chunk_overlap=100):
-    if not docs:
-        return []
+def iter_file_parts(path: str, part_chars: int = 65536):
+    """
+    Stream a PDF or text file as Documents of at most part_chars each
+
+    Pages and decoded blocks are regrouped into parts as they are read, so
+    memory is bounded by the part (or the largest page), not the file.
+    Each part carries its document-wide "part_offset". DOCX files have no
+    page stream and come out as a single part.
+    """
+    filename = os.path.basename(path)
+    file_ext = os.path.splitext(filename)[1].lower()
+    if file_ext == '.pdf':
+        # PdfReader keeps reading from the handle, so it stays open until the last page
+        with open(path, "rb") as f:
+            reader = PdfReader(f)
+            metadata = {"source": filename, "file_type": "pdf", "page_count": len(reader.pages)}
+            yield from _documents(metadata, iter_text_parts(iter_pdf_pages(reader), part_chars, joiner="\n\n"))
+    elif file_ext == '.txt':
+        with open(path, "rb") as f:
+            encoding = detect_encoding(f.read(ENCODING_SAMPLE_BYTES))
+        metadata = {"source": filename, "file_type": "txt", "encoding": encoding}
+        yield from _documents(metadata, iter_text_parts(iter_txt_blocks(path, encoding), part_chars))
+    else:
+        doc = load_file(path)
+        if doc is not None:
+            yield doc
 
-    splitter = RecursiveCharacterTextSplitter(
+
+def _documents(metadata: dict, parts):
+    """One Document per (offset, text) part, numbered in order"""
+    total = 0
+    for number, (offset, text) in enumerate(parts):
+        total += len(text)
+        yield Document(page_content=text, metadata={**metadata, "part": number, "part_offset": offset})
+    logger.info("Streamed %s (%d chars)", metadata["source"], total)
+
+
+def _load_file_safe(path: str):
+    """Pool entry point: never raises, so one bad file cannot fail the batch"""
+    try:
+        return load_file(path), None
+    except Exception as e:
+        return None, str(e)
+
+
+def _iter_pool(paths, max_workers: int, timeout: float, max_attempts: int = 2):
+    """
+    Load paths on a process pool, yielding a (doc, error) per path in input order
+
+    At most max_workers files are in flight, so a file's timeout runs from
+    roughly when a worker picks it up. A file that times out is reported as
+    failed and the pool is replaced, since its worker cannot be reclaimed.
+    When a worker dies, the files it may have taken down with it are retried
+    in a fresh pool up to max_attempts times before they count as failed.
+    Files finished ahead of a slow one wait in a reorder buffer, and new
+    files are only submitted within a window of 2 * max_workers past the
+    next file to yield, so memory stays bounded.
+    """
+    results = {}
+    attempts = [0] * len(paths)
+    pending = deque(range(len(paths)))
+    next_index = 0
+    window = 2 * max_workers
+    while pending or next_index < len(paths):
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+        in_flight = {}
+        restart = crashed = False
+        try:
+            while (pending or in_flight) and not restart:
+                while results.get(next_index) is not None:
+                    yield results.pop(next_index)
+                    next_index += 1
+                while pending and len(in_flight) < max_workers and pending[0] < next_index + window:
+                    index = pending.popleft()
+                    attempts[index] += 1
+                    in_flight[executor.submit(_load_file_safe, paths[index])] = (index, time.monotonic())
+                if not in_flight:
+                    continue
+                next_deadline = min(started for _, started in in_flight.values()) + timeout
+                done, _ = wait(
+                    in_flight,
+                    timeout=max(0.0, next_deadline - time.monotonic()),
+                    return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    index, _ = in_flight.pop(future)
+                    try:
+                        results[index] = future.result()
+                    except BrokenProcessPool:
+                        restart = crashed = True
+                        in_flight[future] = (index, None)
+                now = time.monotonic()
+                for future, (index, started) in list(in_flight.items()):
+                    if started is not None and now - started >= timeout:
+                        results[index] = (None, f"timed out after {timeout:.0f}s")
+                        del in_flight[future]
+                        restart = True
+        finally:
+            if restart:
+                for process in list((executor._processes or {}).values()):
+                    process.terminate()
+            executor.shutdown(wait=not restart, cancel_futures=True)
+
+        # Files interrupted by the restart go first in the next pool; only a
+        # crash counts against them, since any of them may have caused it
+        for index, _ in reversed(list(in_flight.values())):
+            if not crashed:
+                attempts[index] -= 1
+            if attempts[index] < max_attempts:
+                pending.appendleft(index)
+            else:
+                results[index] = (None, "worker process died")
+        while results.get(next_index) is not None:
+            yield results.pop(next_index)
+            next_index += 1
+
+
+def iter_hr_documents(
+    folder_path: str = "./data/hr_docs",
+    filenames=None,
+    max_workers: int | None = None,
+    timeout: float = 120.0,
+    stream_min_bytes: int | None = None,
+    part_chars: int = 65536,
+    on_error=None
+):
+    """
+    Yield the documents of the folder (or of the given file names) as they load
+
+    Files are parsed on a process pool of max_workers (default: CPU count)
+    with a per-file timeout; a file that fails, hangs or crashes its worker
+    is logged and skipped. Documents come out in file-name order.
+
+    Files of at least stream_min_bytes are instead streamed in this process
+    as several part Documents (see iter_file_parts), so one large handbook
+    never sits in memory whole; the pool timeout does not apply to them.
+    on_error(filename, error) is called for every file that failed, including
+    a streamed file that failed after some of its parts were yielded.
+    """
+    if filenames is None:
+        filenames = list_hr_files(folder_path)
+    paths = [os.path.join(folder_path, filename) for filename in filenames]
+    max_workers = max_workers or os.cpu_count() or 1
+
+    # Files deleted or made unreadable since they were listed fail on their own
+    stat_errors = {}
+
+    def streamed(path):
+        if stream_min_bytes is None or os.path.splitext(path)[1].lower() not in ('.pdf', '.txt'):
+            return False
+        try:
+            return os.path.getsize(path) >= stream_min_bytes
+        except OSError as e:
+            stat_errors[path] = str(e)
+            return False
+
+    is_streamed = [streamed(path) for path in paths]
+    pooled = [path for path, stream in zip(paths, is_streamed) if not stream and path not in stat_errors]
+    if max_workers == 1 or len(pooled) <= 1:
+        results = (_load_file_safe(path) for path in pooled)
+    else:
+        results = _iter_pool(pooled, min(max_workers, len(pooled)), timeout)
+
+    loaded = 0
+    for path, stream in zip(paths, is_streamed):
+        filename = os.path.basename(path)
+        if path in stat_errors:
+            logger.error("Failed to load %s: %s", filename, stat_errors[path])
+            if on_error is not None:
+                on_error(filename, stat_errors[path])
+            continue
+        if stream:
+            parts = 0
+            try:
+                for part in iter_file_parts(path, part_chars):
+                    parts += 1
+                    yield part
+            except Exception as e:
+                logger.error("Failed to stream %s after %d parts: %s", filename, parts, e)
+                if on_error is not None:
+                    on_error(filename, str(e))
+                continue
+            if parts:
+                loaded += 1
+            continue
+
+        doc, error = next(results)
+        if error:
+            logger.error("Failed to load %s: %s", filename, error)
+            if on_error is not None:
+                on_error(filename, error)
+        elif doc is not None:
+            loaded += 1
+            yield doc
+
+    logger.info("Total documents loaded: %d of %d files", loaded, len(paths))
+
+
+def load_hr_documents(
+    folder_path: str = "./data/hr_docs",
+    filenames=None,
+    max_workers: int | None = None,
+    timeout: float = 120.0
+):
+    """Load every supported file in the folder, or only the given file names, as a list"""
+    return list(iter_hr_documents(folder_path, filenames, max_workers=max_workers, timeout=timeout))
+
+
+def make_splitter(chunk_size=500, chunk_overlap=100):
+    return RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
         length_function=len,
+        add_start_index=True,
         separators=["\n\n", "\n", ". ", "! ", "? ", " ", ""]
     )
-    split_docs = splitter.split_documents(docs)
+
+
+def iter_split_documents(docs, chunk_size=500, chunk_overlap=100):
+    """
+    Yield the chunks of each document (a list per document, ids set) as documents arrive
+
+    Parts of a streamed file yield a list each; their start_index is
+    shifted by the part offset so it stays relative to the whole file.
+    """
+    splitter = make_splitter(chunk_size, chunk_overlap)
+    for doc in docs:
+        chunks = splitter.split_documents([doc])
+        for chunk in chunks:
+            offset = chunk.metadata.pop("part_offset", 0)
+            chunk.metadata.pop("part", None)
+            if offset and "start_index" in chunk.metadata:
+                chunk.metadata["start_index"] += offset
+            chunk.id = make_chunk_id(chunk)
+        yield chunks
+
+
+def split_documents(docs, chunk_size=500, chunk_overlap=100):
+    if not docs:
+        return []
+
+    split_docs = [chunk for chunks in iter_split_documents(docs, chunk_size, chunk_overlap) for chunk in chunks]
     logger.info("Split %d documents into %d chunks", len(docs), len(split_docs))
-    return split_docs
\ No newline at end of file
+    return split_docs
+
+
+def make_chunk_id(doc: Document) -> str:
+    """Stable chunk id from its source and content, shared by Chroma and the BM25 index"""
+    source = doc.metadata.get("source", "")
+    return hashlib.sha256(f"{source}\x00{doc.page_content}".encode("utf-8")).hexdigest()[:32]
\ No newline at end of file
@@ -0,0 +1,71 @@
+# index_metadata.py
+"""
+Small JSON side-car describing a Chroma collection build
+
+Stored next to the Chroma files as <collection>.index.json. The version
+changes every time the collection is rebuilt, which lets readers (the
+retriever runtime and its caches) notice a re-index without talking to
+the ingestion process.
+"""
+
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+UNVERSIONED = "unversioned"
+
+
+def index_metadata_path(persist_directory: str, collection_name: str) -> str:
+    return os.path.join(persist_directory, f"{collection_name}.index.json")
+
+
+def new_index_version() -> str:
+    """Sortable, unique version string for a fresh build"""
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return f"{stamp}-{uuid.uuid4().hex[:8]}"
+
+
+def read_index_metadata(persist_directory: str, collection_name: str) -> dict:
+    """Return the side-car contents, or {} if the collection was never versioned"""
+    path = index_metadata_path(persist_directory, collection_name)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning("Unreadable index metadata %s: %s", path, e)
+        return {}
+
+
+def index_metadata_stamp(persist_directory: str, collection_name: str) -> int | None:
+    """Cheap change detector: the side-car's mtime in ns, or None if missing"""
+    try:
+        return os.stat(index_metadata_path(persist_directory, collection_name)).st_mtime_ns
+    except OSError:
+        return None
+
+
+def write_index_metadata(persist_directory: str, collection_name: str, **fields) -> dict:
+    """
+    Atomically replace the side-car with the given fields
+
+    A new version is generated unless one is passed explicitly.
+    """
+    os.makedirs(persist_directory, exist_ok=True)
+    metadata = {
+        "collection_name": collection_name,
+        "version": fields.pop("version", None) or new_index_version(),
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+        **fields
+    }
+    path = index_metadata_path(persist_directory, collection_name)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(tmp_path, path)
+    return metadata
@@ -0,0 +1,142 @@
+# lexical_index.py
+"""
+BM25 inverted index over the policy chunks
+Built next to the Chroma collection at ingest time and saved as
+<collection>.bm25.json so exact terms ("emergency leave", "NPAX") can be
+matched without an embedding call.
+"""
+
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i if in is it me my of on or "
+    "our the their there this to was what when where which who will with you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def lexical_index_path(persist_directory: str, collection_name: str) -> str:
+    return os.path.join(persist_directory, f"{collection_name}.bm25.json")
+
+
+class BM25Index:
+    """Okapi BM25 over chunk texts, keyed by the same ids as the Chroma collection"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids: list[str] = []
+        self.texts: list[str] = []
+        self.metadatas: list[dict] = []
+        self.doc_lengths: list[int] = []
+        self.postings: dict[str, list[tuple[int, int]]] = defaultdict(list)
+        self._positions: dict[str, int] = {}
+        self._idf: dict[str, float] | None = None
+        self._avg_length = 1.0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, doc_id: str, text: str, metadata: dict | None = None) -> None:
+        position = len(self.ids)
+        tokens = tokenize(text)
+        self._positions[doc_id] = position
+        self.ids.append(doc_id)
+        self.texts.append(text)
+        self.metadatas.append(metadata or {})
+        self.doc_lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            self.postings[term].append((position, tf))
+        self._idf = None
+
+    def add_documents(self, docs: list[Document]) -> None:
+        for doc in docs:
+            self.add(doc.id, doc.page_content, doc.metadata)
+
+    def _get_idf(self) -> dict[str, float]:
+        if self._idf is None:
+            n = len(self.ids)
+            self._idf = {
+                term: math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for term, posting in self.postings.items()
+            }
+            self._avg_length = (sum(self.doc_lengths) / n if n else 0.0) or 1.0
+        return self._idf
+
+    def search(self, query: str, k: int = 3) -> list[tuple[str, float]]:
+        """Return up to k (doc_id, score) pairs, best first"""
+        return [(self.ids[position], score) for position, score in self._search_positions(query, k)]
+
+    def search_documents(self, query: str, k: int = 3) -> list[tuple[Document, float]]:
+        return [(self.document(position), score) for position, score in self._search_positions(query, k)]
+
+    def _search_positions(self, query: str, k: int) -> list[tuple[int, float]]:
+        if not self.ids:
+            return []
+        idf = self._get_idf()
+        avg_length = self._avg_length
+        scores: dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            term_idf = idf.get(term)
+            if term_idf is None:
+                continue
+            for position, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[position] / avg_length)
+                scores[position] += term_idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def document(self, position: int) -> Document:
+        return Document(id=self.ids[position], page_content=self.texts[position], metadata=self.metadatas[position])
+
+    def is_decisive(self, query: str, hits: list[tuple], k: int, ratio: float) -> bool:
+        """
+        True when the lexical top-k is clearly separated from the rest
+
+        `hits` are (doc_id or Document, score) pairs from a search over at
+        least k + 1 candidates. Requires k hits, every query term present in
+        the best hit, and the k-th score at least `ratio` times the next one.
+        """
+        terms = set(tokenize(query))
+        if not terms or len(hits) < k:
+            return False
+        top = hits[0][0]
+        best = self._positions[top.id if isinstance(top, Document) else top]
+        best_terms = {term for term in terms if any(p == best for p, _ in self.postings.get(term, ()))}
+        if best_terms != terms:
+            return False
+        return len(hits) == k or hits[k - 1][1] >= ratio * hits[k][1]
+
+    def save(self, path: str) -> None:
+        payload = {
+            "k1": self.k1,
+            "b": self.b,
+            "ids": self.ids,
+            "texts": self.texts,
+            "metadatas": self.metadatas,
+        }
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+        logger.info("Saved BM25 index with %d chunks to %s", len(self.ids), path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        index = cls(k1=payload["k1"], b=payload["b"])
+        for doc_id, text, metadata in zip(payload["ids"], payload["texts"], payload["metadatas"]):
+            index.add(doc_id, text, metadata)
+        return index
@@ -0,0 +1,109 @@
+# manifest.py
+"""
+Content-hash manifest for incremental indexing
+
+Stored next to the Chroma files as <collection>.manifest.json. For every
+source file it records the file's content hash (plus size and mtime, so an
+untouched file is never re-read) and the ids of the chunks it produced.
+Chunk ids are content hashes too (see make_chunk_id), so comparing a
+file's old and new chunk ids tells exactly which chunks need embedding
+and which need deleting.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FORMAT = 1
+
+
+def manifest_path(persist_directory: str, collection_name: str) -> str:
+    return os.path.join(persist_directory, f"{collection_name}.manifest.json")
+
+
+def file_hash(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_manifest(persist_directory: str, collection_name: str) -> dict:
+    """Return the manifest, or an empty one if it is missing or unreadable"""
+    path = manifest_path(persist_directory, collection_name)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format") == MANIFEST_FORMAT:
+            return manifest
+        logger.warning("Ignoring manifest %s with unknown format", path)
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        logger.warning("Unreadable manifest %s: %s", path, e)
+    return {"format": MANIFEST_FORMAT, "files": {}}
+
+
+def write_manifest(persist_directory: str, collection_name: str, manifest: dict) -> None:
+    os.makedirs(persist_directory, exist_ok=True)
+    manifest = {**manifest, "format": MANIFEST_FORMAT}
+    path = manifest_path(persist_directory, collection_name)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+@dataclass
+class ManifestDiff:
+    """Source files grouped by what re-indexing has to do with them"""
+    unchanged: list[str] = field(default_factory=list)
+    changed: list[str] = field(default_factory=list)
+    added: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    # Fresh size/mtime/hash for every file still present
+    file_states: dict[str, dict] = field(default_factory=dict)
+
+    @property
+    def to_load(self) -> list[str]:
+        return sorted(self.changed + self.added)
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.changed or self.added or self.removed)
+
+
+def diff_folder(manifest: dict, folder_path: str, filenames: list[str]) -> ManifestDiff:
+    """
+    Compare the files in a folder with the manifest
+
+    A file whose size and mtime match its manifest entry is taken as
+    unchanged without hashing; otherwise its content hash decides (a
+    touched but identical file is still unchanged).
+    """
+    previous = manifest.get("files", {})
+    diff = ManifestDiff()
+    for filename in filenames:
+        stat = os.stat(os.path.join(folder_path, filename))
+        entry = previous.get(filename)
+        if entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+            content_hash = entry["hash"]
+        else:
+            content_hash = file_hash(os.path.join(folder_path, filename))
+        diff.file_states[filename] = {"hash": content_hash, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+        if entry is None:
+            diff.added.append(filename)
+        elif entry["hash"] == content_hash:
+            diff.unchanged.append(filename)
+        else:
+            diff.changed.append(filename)
+
+    present = set(filenames)
+    diff.removed = sorted(name for name in previous if name not in present)
+    return diff
@@ -0,0 +1,185 @@
+# pipeline.py
+"""
+Streaming ingestion pipeline
+
+Each stage is a generator transform (iterator in, iterator out) running
+in its own thread, connected to the next by a bounded queue. Stages
+overlap, and memory stays flat: a fast stage blocks on its full output
+queue instead of buffering the corpus. Every stage records how long it
+waited for input, how long it was blocked on output and how long it was
+busy, so the report shows which stage limits throughput.
+"""
+
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class PipelineCancelled(Exception):
+    """Raised inside stage threads when the consumer stopped early"""
+
+
+@dataclass
+class StageStats:
+    name: str
+    items_in: int = 0
+    items_out: int = 0
+    wall_seconds: float = 0.0
+    input_wait_seconds: float = 0.0
+    output_wait_seconds: float = 0.0
+
+    @property
+    def busy_seconds(self) -> float:
+        return max(0.0, self.wall_seconds - self.input_wait_seconds - self.output_wait_seconds)
+
+    def as_dict(self) -> dict:
+        busy = self.busy_seconds
+        return {
+            "stage": self.name,
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "wall_s": round(self.wall_seconds, 3),
+            "busy_s": round(busy, 3),
+            "input_wait_s": round(self.input_wait_seconds, 3),
+            "output_wait_s": round(self.output_wait_seconds, 3),
+            "items_per_s": round(self.items_out / busy, 2) if busy else None
+        }
+
+
+class StreamingPipeline:
+    """
+    Chain of threaded generator stages fed from a source iterable
+
+    Example:
+        pipeline = StreamingPipeline(filenames, queue_size=8)
+        pipeline.stage("load", load_docs).stage("split", split_docs)
+        for chunk in pipeline.run():
+            ...
+    """
+
+    def __init__(self, source: Iterable, queue_size: int = 8):
+        self.source = source
+        self.queue_size = queue_size
+        self._stages: list[tuple[str, Callable[[Iterator], Iterable]]] = []
+        self.stats: list[StageStats] = []
+        self._stop = threading.Event()
+
+    def stage(self, name: str, transform: Callable[[Iterator], Iterable]) -> "StreamingPipeline":
+        self._stages.append((name, transform))
+        return self
+
+    def _put(self, out: queue.Queue, item) -> None:
+        while not self._stop.is_set():
+            try:
+                out.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        raise PipelineCancelled()
+
+    def _get(self, upstream: queue.Queue):
+        while not self._stop.is_set():
+            try:
+                return upstream.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        raise PipelineCancelled()
+
+    def _input(self, upstream, stats: StageStats) -> Iterator:
+        """Iterate the upstream queue (or the source), charging waits to this stage"""
+        if not isinstance(upstream, queue.Queue):
+            for item in upstream:
+                stats.items_in += 1
+                yield item
+            return
+        while True:
+            started = time.perf_counter()
+            item = self._get(upstream)
+            stats.input_wait_seconds += time.perf_counter() - started
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            stats.items_in += 1
+            yield item
+
+    def _run_stage(self, transform, upstream, out: queue.Queue, stats: StageStats) -> None:
+        started = time.perf_counter()
+        try:
+            for item in transform(self._input(upstream, stats)):
+                put_started = time.perf_counter()
+                self._put(out, item)
+                stats.output_wait_seconds += time.perf_counter() - put_started
+                stats.items_out += 1
+            self._put(out, _DONE)
+        except PipelineCancelled:
+            pass
+        except BaseException as e:
+            try:
+                self._put(out, _Failure(e))
+            except PipelineCancelled:
+                pass
+        finally:
+            stats.wall_seconds = time.perf_counter() - started
+
+    def run(self) -> Iterator:
+        """Start every stage and yield the last stage's output in the calling thread"""
+        if not self._stages:
+            yield from self.source
+            return
+
+        self._stop.clear()
+        self.stats = []
+        upstream = iter(self.source)
+        threads = []
+        for name, transform in self._stages:
+            stats = StageStats(name)
+            out = queue.Queue(maxsize=self.queue_size)
+            thread = threading.Thread(
+                target=self._run_stage,
+                args=(transform, upstream, out, stats),
+                name=f"pipeline-{name}",
+                daemon=True
+            )
+            self.stats.append(stats)
+            threads.append(thread)
+            upstream = out
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = upstream.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join(timeout=5)
+
+    def report(self) -> list[dict]:
+        return [stats.as_dict() for stats in self.stats]
+
+    def log_report(self) -> None:
+        for row in self.report():
+            rate = f"{row['items_per_s']}/s" if row["items_per_s"] is not None else "n/a"
+            logger.info(
+                f"⏱️ {row['stage']:<8} {row['items_in']:>6} in {row['items_out']:>6} out | "
+                f"busy {row['busy_s']:.2f}s ({rate}), waiting on input {row['input_wait_s']:.2f}s, "
+                f"on output {row['output_wait_s']:.2f}s"
+            )
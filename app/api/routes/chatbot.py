@@ -3,12 +3,18 @@ Chatbot Routes
 Handles HR chatbot queries with Agentic RAG orchestration
 """
 
+import json
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from app.models.user import User
 from app.api.dependencies import get_current_user
-from app.services.retriever import query_hr_documents
-from app.Agent import hr_agent_graph, AgentState
+from app.services.retriever import aquery_hr_documents, retriever_runtime
+from app.Agent import hr_agent_graph, AgentState, stream_agent_answer
+from app.Agent.query_decomposer import decomposition_stats
+from app.core.llm_router import llm_router_stats
+from app.core.singleflight import single_flight_stats
 #for CHATBOT HISTORY
 from sqlalchemy.orm import Session
 from app.db.session import get_db
@@ -36,6 +42,54 @@ class ChatResponse(BaseModel):
     message_id: int
 
 
+def _start_conversation(db: Session, request: ChatRequest, user_id: int):
+    """Get the requested conversation (or create one) and store the user question"""
+    if request.conversation_id:
+        # Verify user owns this conversation
+        conversation = ChatbotService.get_conversation(
+            db, 
+            request.conversation_id, 
+            user_id
+        )
+        if not conversation:
+            raise HTTPException(
+                status_code=404,
+                detail="Conversation not found"
+            )
+    else:
+        # Create new conversation
+        conversation = ChatbotService.create_conversation(
+            db,
+            user_id,
+            title=f"Query: {request.question[:50]}..."
+        )
+    
+    ChatbotService.add_message(
+        db,
+        conversation.conversation_id,
+        request.question
+    )
+    return conversation
+
+
+def _source_for(query_type: str, num_questions: int) -> str:
+    """Map query_type to a user-friendly source"""
+    if query_type == "compound":
+        return f"multiple_sources ({num_questions} questions)"
+    elif query_type == "policy":
+        return "policy_documents"
+    elif query_type == "personal_data":
+        return "personal_database"
+    elif query_type == "general":
+        return "general_knowledge"
+    return "unknown"
+
+
+def _format_sse(event: str, data: dict) -> str:
+    """Encode one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 @router.post("/query", response_model=ChatResponse)
 async def chat_query(
     request: ChatRequest,
@@ -70,33 +124,8 @@ async def chat_query(
     try:
         user_id = current_user.user_id
 
-        # Create or get conversation
-        if request.conversation_id:
-            # Verify user owns this conversation
-            conversation = ChatbotService.get_conversation(
-                db, 
-                request.conversation_id, 
-                user_id
-            )
-            if not conversation:
-                raise HTTPException(
-                    status_code=404,
-                    detail="Conversation not found"
-                )
-        else:
-            # Create new conversation
-            conversation = ChatbotService.create_conversation(
-                db,
-                user_id,
-                title=f"Query: {request.question[:50]}..."
-            )
-        
-        # Store user question
-        user_message = ChatbotService.add_message(
-            db,
-            conversation.conversation_id,
-            request.question
-        )
+        # Create or get conversation, then store the user question
+        conversation = await run_in_threadpool(_start_conversation, db, request, user_id)
         
         # Process with agent
         initial_state = AgentState(
@@ -105,7 +134,7 @@ async def chat_query(
         )
         
         logger.info(f"User {current_user.email} (ID: {user_id}) asked: {request.question}")
-        result = hr_agent_graph.invoke(initial_state)
+        result = await hr_agent_graph.ainvoke(initial_state)
         
         final_message = result["messages"][-1]
         answer = final_message["content"] if isinstance(final_message, dict) else final_message.content
@@ -116,19 +145,11 @@ async def chat_query(
         query_type = result.get("query_type", "general")  # ← Now this will work!
         
         # Map query_type to user-friendly source
-        if query_type == "compound":
-            source = f"multiple_sources ({len(sub_queries)} questions)"
-        elif query_type == "policy":
-            source = "policy_documents"
-        elif query_type == "personal_data":
-            source = "personal_database"
-        elif query_type == "general":
-            source = "general_knowledge"
-        else:
-            source = "unknown"
+        source = _source_for(query_type, len(sub_queries))
 
         # Store bot response
-        bot_message = ChatbotService.add_message(
+        bot_message = await run_in_threadpool(
+            ChatbotService.add_message,
             db,
             conversation.conversation_id,
             answer
@@ -154,10 +175,11 @@ async def chat_query(
         # Fallback to basic RAG
         try:
             logger.info("Falling back to basic RAG system")
-            rag_result = query_hr_documents(request.question)
+            rag_result = await aquery_hr_documents(request.question)
 
             # Store fallback response
-            bot_message = ChatbotService.add_message(
+            bot_message = await run_in_threadpool(
+                ChatbotService.add_message,
                 db,
                 conversation.conversation_id,
                 rag_result["answer"]
@@ -180,6 +202,65 @@ async def chat_query(
             )
 
 
+@router.post("/query/stream")
+async def chat_query_stream(
+    request: ChatRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Query the HR chatbot and stream the answer as server-sent events.
+    
+    **Requires**: Valid JWT token in Authorization header
+    
+    **Events**:
+    - **decomposed**: sub-queries extracted from the question
+    - **progress**: a sub-query entering the `retrieving` or `answering` stage
+    - **token**: a piece of a sub-query's answer (`index`, `text`)
+    - **sub_query_done**: a sub-query's full answer
+    - **done**: final answer with metadata, `conversation_id` and `message_id`
+    - **error**: the stream failed; nothing was stored for the answer
+    
+    The assembled answer is stored in the conversation history once the
+    stream completes.
+    """
+    user_id = current_user.user_id
+    conversation = await run_in_threadpool(_start_conversation, db, request, user_id)
+    logger.info(f"User {current_user.email} (ID: {user_id}) streaming: {request.question}")
+
+    async def event_stream():
+        try:
+            async for event in stream_agent_answer(request.question, user_id):
+                data = event["data"]
+                if event["event"] == "done":
+                    bot_message = await run_in_threadpool(
+                        ChatbotService.add_message,
+                        db,
+                        conversation.conversation_id,
+                        data["answer"]
+                    )
+                    num_questions = data["num_questions"]
+                    data = {
+                        **data,
+                        "source": _source_for(data["query_type"], num_questions),
+                        "conversation_id": conversation.conversation_id,
+                        "message_id": bot_message.message_id
+                    }
+                yield _format_sse(event["event"], data)
+        except Exception as e:
+            logger.error(f"Streaming chatbot error for user {current_user.email}: {str(e)}")
+            yield _format_sse("error", {
+                "detail": "Chatbot service temporarily unavailable. Please try again later.",
+                "conversation_id": conversation.conversation_id
+            })
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/history")
 async def get_chat_history(
     current_user: User = Depends(get_current_user),
@@ -319,6 +400,10 @@ async def chatbot_health_check(
         return {
             "status": "healthy",
             "service": "Agentic Chatbot",
+            "retriever": retriever_runtime.stats(),
+            "decomposition": decomposition_stats(),
+            "llm_providers": llm_router_stats(),
+            "single_flight": single_flight_stats(),
             "user": current_user.email
         }
     except Exception as e:
@@ -31,7 +31,96 @@ class Settings(BaseSettings):
     AZURE_EMBEDDINGS_ENDPOINT: str | None = None
     AZURE_EMBEDDINGS_API_KEY: str | None = None
 
+    # Embedding backend: "azure" or "local" (sentence-transformers on CPU)
+    EMBEDDING_BACKEND: str = "azure"
+    LOCAL_EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    LOCAL_EMBEDDING_BATCH_SIZE: int = 64
+    LOCAL_EMBEDDING_THREADS: int = 0  # 0 = all cores
+
+    # Document ingestion
+    LOADER_MAX_WORKERS: int = 0  # 0 = one process per core
+    LOADER_FILE_TIMEOUT_SECONDS: float = 120.0
+    LOADER_STREAM_MIN_BYTES: int = 4 * 1024 * 1024  # larger PDF/TXT files are streamed in parts
+    LOADER_STREAM_PART_CHARS: int = 65536
+    INGEST_EMBED_BATCH_SIZE: int = 64
+    INGEST_EMBED_CONCURRENCY: int = 4
+    INGEST_EMBED_MAX_RETRIES: int = 8
+    INGEST_EMBED_MAX_BACKOFF_SECONDS: float = 60.0
+    INGEST_QUEUE_SIZE: int = 8  # items buffered between pipeline stages
+    INGEST_DEDUP_ENABLED: bool = True
+    INGEST_DEDUP_THRESHOLD: float = 0.9  # estimated Jaccard of word 5-shingles
+    INGEST_DEDUP_NUM_PERM: int = 128
+    INDEX_RETIRED_GRACE_SECONDS: int = 3600  # keep replaced collections this long before dropping them
+
     GROQ_API_KEY: str
+    GROQ_MODEL: str = "llama-3.1-8b-instant"
+
+    # Shared HTTP transport for LLM and embedding providers
+    PROVIDER_HTTP_MAX_CONNECTIONS: int = 100
+    PROVIDER_HTTP_MAX_KEEPALIVE: int = 20
+    PROVIDER_HTTP_KEEPALIVE_SECONDS: float = 60.0
+    PROVIDER_HTTP_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    PROVIDER_HTTP_READ_TIMEOUT_SECONDS: float = 60.0
+    PROVIDER_HTTP2: bool = True  # needs the h2 package; HTTP/1.1 otherwise
+
+    # LLM provider routing (circuit breakers and hedged requests)
+    LLM_ROUTER_ENABLED: bool = True
+    LLM_ROUTER_WINDOW: int = 200  # recent calls kept for latency and error rate
+    LLM_HEDGE_ENABLED: bool = True
+    LLM_HEDGE_AFTER_SECONDS: float = 0.0  # 0 = the primary's rolling p95
+    LLM_HEDGE_MIN_SECONDS: float = 2.0
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    LLM_BREAKER_FAILURES: int = 5  # consecutive failures that open the breaker
+    LLM_BREAKER_ERROR_RATE: float = 0.5
+    LLM_BREAKER_MIN_CALLS: int = 20
+    LLM_BREAKER_COOLDOWN_SECONDS: float = 30.0
+
+    # Policy retriever (Chroma)
+    CHROMA_PERSIST_DIRECTORY: str = "./chroma_db"
+    CHROMA_COLLECTION_NAME: str = "hr_documents"
+    RETRIEVER_TOP_K: int = 3
+    RETRIEVER_SEARCH_BACKEND: str = "chroma"  # "chroma" or "memory" (in-process index)
+    RETRIEVER_HNSW_MIN_SIZE: int = 5000
+    RETRIEVER_VECTOR_STORAGE: str = "float32"  # memory backend: "float32", "float16" or "int8"
+    RETRIEVER_VECTOR_PCA_DIM: int = 0  # 0 = keep every dimension
+    RETRIEVER_RESCORE_FACTOR: int = 4  # compact modes re-score k * factor candidates at full precision
+
+    # Hybrid BM25 + vector retrieval
+    RETRIEVER_HYBRID: bool = True
+    RETRIEVER_CANDIDATE_K: int = 8
+    RETRIEVER_RRF_K: int = 60
+    BM25_DECISIVE_RATIO: float = 2.0
+
+    # Context packing for policy prompts
+    CONTEXT_TOKEN_BUDGET: int = 1200
+    CONTEXT_MIN_K: int = 1
+    CONTEXT_MAX_K: int = 6
+    CONTEXT_RELATIVE_CUTOFF: float = 0.8
+    CONTEXT_DEDUP_THRESHOLD: float = 0.8
+
+    # Query embedding cache (memory LRU + SQLite)
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 2048
+    EMBEDDING_CACHE_PATH: str = "./cache/query_embeddings.sqlite3"
+    EMBEDDING_CACHE_MAX_DISK_ENTRIES: int = 50000
+
+    # Semantic answer cache for policy questions
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIMILARITY: float = 0.95
+    ANSWER_CACHE_MAX_ENTRIES: int = 1000
+    ANSWER_CACHE_TTL_SECONDS: int = 86400
+
+    # Query decomposition cache (normalized message -> sub-queries)
+    DECOMPOSITION_CACHE_ENABLED: bool = True
+    DECOMPOSITION_CACHE_MAX_ENTRIES: int = 4096
+    DECOMPOSITION_CACHE_TTL_SECONDS: int = 3600
+
+    # Agent workflow
+    AGENT_MAX_PARALLEL_SUBQUERIES: int = 4  # sub-query handlers running at once per request
+    FAST_ROUTER_ENABLED: bool = True  # classify simple messages without the decomposition LLM call
+    FAST_ROUTER_USE_EMBEDDINGS: bool = True  # nearest-centroid fallback when no keyword rule decides
+    FAST_ROUTER_MIN_MARGIN: float = 0.08
+    SINGLE_FLIGHT_ENABLED: bool = True  # identical concurrent decompositions and policy questions share one run
 
     class Config:
         env_file = ".env"  # loads variables from your .env file
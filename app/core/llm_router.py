@@ -0,0 +1,541 @@
+"""
+Latency-aware routing across chat providers
+
+get_llm used to pick Azure OpenAI or Groq once, at import time, so a slow
+or failing provider stalled every request until restart. LLMRouter is a
+Runnable over the configured providers, in priority order:
+
+- Each route keeps a rolling latency window (p50/p95) and every provider
+  a circuit breaker fed by its rolling error rate. An open breaker takes
+  the provider out of rotation until a cooldown passes; then one trial
+  request decides whether it closes again.
+- When the primary has not answered after the hedge delay (a fixed value,
+  or the primary's rolling p95), the same request goes to the next
+  provider as well. The first answer wins; the other call is cancelled
+  (async) or left to finish in the background (sync).
+- A failed call fails over to the next provider straight away.
+
+Streaming calls fail over only before their first chunk and are not hedged.
+"""
+
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Iterator
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from app.core.config import settings
+from app.core.providers import provider_clients
+
+logger = logging.getLogger(__name__)
+
+# Token of calls let through a closed breaker
+_CLOSED = object()
+
+
+class CircuitBreaker:
+    """
+    Rolling error rate and breaker state for one provider
+
+    Args:
+        name: Provider name, for logs and stats
+        failure_threshold: Consecutive failures that open the breaker
+        error_rate: Error rate over the window that opens the breaker
+        min_calls: Calls in the window before the error rate counts
+        cooldown_seconds: Time an open breaker rejects calls before a trial
+        window: Number of recent outcomes kept
+        clock: Monotonic time source (tests pass a fake one)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        error_rate: float = 0.5,
+        min_calls: int = 20,
+        cooldown_seconds: float = 30.0,
+        window: int = 200,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate
+        self.min_calls = min_calls
+        self.cooldown_seconds = cooldown_seconds
+        self.clock = clock
+        self._outcomes: deque[bool] = deque(maxlen=window)  # True for a failed call
+        self._consecutive_failures = 0
+        self._opened_at: float | None = None
+        self._trial: object | None = None  # token of the half-open trial call in flight
+        self._lock = threading.Lock()
+        self._counts = {"calls": 0, "errors": 0, "opened": 0, "rejected": 0}
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._trial is not None or self.clock() - self._opened_at >= self.cooldown_seconds:
+            return "half_open"
+        return "open"
+
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            return sum(self._outcomes) / len(self._outcomes) if self._outcomes else 0.0
+
+    def allow(self) -> object | None:
+        """
+        A token for one call to this provider, or None while it is rejecting calls
+
+        When half-open the caller claims the trial call. Pass the token back
+        with the call's outcome, so only the trial call itself can close,
+        reopen or release the breaker.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return _CLOSED
+            if self._trial is not None or self.clock() - self._opened_at < self.cooldown_seconds:
+                self._counts["rejected"] += 1
+                return None
+            self._trial = object()
+            return self._trial
+
+    def record_success(self, token: object | None = None) -> None:
+        with self._lock:
+            self._counts["calls"] += 1
+            self._outcomes.append(False)
+            self._consecutive_failures = 0
+            if self._opened_at is not None:
+                if token is not None and token is not self._trial:
+                    # A call let through before the breaker opened, or a
+                    # released trial: it says nothing about recovery
+                    return
+                logger.info(f"Circuit closed for {self.name}")
+                # A fresh window, so old errors do not reopen it at once
+                self._outcomes.clear()
+                self._opened_at = None
+                self._trial = None
+
+    def record_failure(self, token: object | None = None) -> None:
+        with self._lock:
+            self._counts["calls"] += 1
+            self._counts["errors"] += 1
+            self._outcomes.append(True)
+            self._consecutive_failures += 1
+            if self._opened_at is not None:
+                if token is not None and token is self._trial:
+                    # The trial call failed: stay open for another cooldown
+                    self._opened_at = self.clock()
+                    self._trial = None
+                # else a call let through before the breaker opened
+                return
+            rate = sum(self._outcomes) / len(self._outcomes)
+            if self._consecutive_failures >= self.failure_threshold or (
+                len(self._outcomes) >= self.min_calls and rate >= self.error_rate_threshold
+            ):
+                logger.warning(
+                    f"Circuit opened for {self.name}: {self._consecutive_failures} consecutive failures, "
+                    f"error rate {rate:.0%}"
+                )
+                self._opened_at = self.clock()
+                self._counts["opened"] += 1
+
+    def record_cancelled(self, token: object | None) -> None:
+        """
+        A call abandoned before it finished (lost a hedge) says nothing about health
+
+        Releases the trial if token is the one that claimed it.
+        """
+        with self._lock:
+            if token is not None and token is self._trial:
+                self._trial = None
+
+    def stats(self) -> dict:
+        return {**self._counts, "state": self.state, "error_rate": round(self.error_rate, 4)}
+
+
+class LatencyWindow:
+    """Rolling call latencies of one route"""
+
+    def __init__(self, size: int = 200):
+        self.size = size
+        self._samples: deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> float | None:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, round(pct / 100 * (len(samples) - 1)))]
+
+
+@dataclass
+class ProviderRoute:
+    """One provider's model, its shared breaker and this route's latencies"""
+    name: str
+    model: Runnable
+    breaker: CircuitBreaker
+    latency: LatencyWindow
+
+
+# Breakers are per provider, shared by every router that uses it
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+_routers: "weakref.WeakSet[LLMRouter]" = weakref.WeakSet()
+_executor: ThreadPoolExecutor | None = None
+
+
+def circuit_breaker(name: str) -> CircuitBreaker:
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(
+                name,
+                failure_threshold=settings.LLM_BREAKER_FAILURES,
+                error_rate=settings.LLM_BREAKER_ERROR_RATE,
+                min_calls=settings.LLM_BREAKER_MIN_CALLS,
+                cooldown_seconds=settings.LLM_BREAKER_COOLDOWN_SECONDS,
+                window=settings.LLM_ROUTER_WINDOW
+            )
+        return _breakers[name]
+
+
+def _thread_pool() -> ThreadPoolExecutor:
+    global _executor
+    with _breakers_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-router")
+        return _executor
+
+
+class LLMRouter(Runnable):
+    """
+    Runnable that sends each call to the healthiest configured provider
+
+    Args:
+        routes: Providers in priority order
+        hedge_after_seconds: Fixed hedge delay; None uses the primary's p95
+        hedge_min_seconds: Lower bound of the p95-based delay, and the
+            delay until the primary has min_samples latencies
+        hedge_enabled: Send duplicate requests to the next provider
+        min_samples: Latencies needed before the p95 is trusted
+        name: Label in stats
+    """
+
+    def __init__(
+        self,
+        routes: list[ProviderRoute],
+        hedge_after_seconds: float | None = None,
+        hedge_min_seconds: float = 2.0,
+        hedge_enabled: bool = True,
+        min_samples: int = 20,
+        name: str = "chat"
+    ):
+        if not routes:
+            raise ValueError("LLMRouter needs at least one provider")
+        self.routes = routes
+        self.hedge_after_seconds = hedge_after_seconds
+        self.hedge_min_seconds = hedge_min_seconds
+        self.hedge_enabled = hedge_enabled
+        self.min_samples = min_samples
+        self.name = name
+        self.model_name = "+".join(route.name for route in routes)
+        self._lock = threading.Lock()
+        self._counts = {"calls": 0, "hedged": 0, "hedge_wins": 0, "failovers": 0}
+        _routers.add(self)
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._counts[key] += 1
+
+    def _derive(self, name: str, transform: Callable[[Runnable], Runnable]) -> "LLMRouter":
+        """Router over transformed models; breakers are shared, latencies are not"""
+        return LLMRouter(
+            [
+                ProviderRoute(route.name, transform(route.model), route.breaker, LatencyWindow(route.latency.size))
+                for route in self.routes
+            ],
+            hedge_after_seconds=self.hedge_after_seconds,
+            hedge_min_seconds=self.hedge_min_seconds,
+            hedge_enabled=self.hedge_enabled,
+            min_samples=self.min_samples,
+            name=name
+        )
+
+    def with_structured_output(self, schema, **kwargs) -> "LLMRouter":
+        schema_name = getattr(schema, "__name__", "structured")
+        return self._derive(f"{self.name}:{schema_name}", lambda model: model.with_structured_output(schema, **kwargs))
+
+    def hedge_delay(self, route: ProviderRoute) -> float:
+        if self.hedge_after_seconds:
+            return self.hedge_after_seconds
+        p95 = route.latency.percentile(95) if len(route.latency) >= self.min_samples else None
+        return max(self.hedge_min_seconds, p95 or 0.0)
+
+    def _candidates(self) -> Iterator[tuple[ProviderRoute, object | None]]:
+        """
+        (route, breaker token) of each route that lets a call through
+
+        Routes are claimed lazily in priority order. The token goes back to
+        the breaker with the call's outcome.
+        """
+        allowed = False
+        for route in self.routes:
+            token = route.breaker.allow()
+            if token is not None:
+                allowed = True
+                yield route, token
+        if not allowed:
+            # Every breaker is open: trying the primary beats failing outright
+            logger.warning(f"All providers of {self.name} are unavailable, trying {self.routes[0].name}")
+            yield self.routes[0], None
+
+    def _record(
+        self,
+        route: ProviderRoute,
+        token,
+        started: float,
+        error: BaseException | None,
+        settled: threading.Event | None = None
+    ) -> None:
+        if settled is not None and settled.is_set():
+            # A hedged call that finished after another call won the race:
+            # treated like a cancelled one, so its outcome is dropped
+            route.breaker.record_cancelled(token)
+            return
+        if error is None:
+            route.latency.add(time.perf_counter() - started)
+            route.breaker.record_success(token)
+        elif isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+            route.breaker.record_cancelled(token)
+        else:
+            logger.warning(f"{route.name} call failed: {error}")
+            route.breaker.record_failure(token)
+
+    def _call(self, route: ProviderRoute, token, input, config, kwargs, settled: threading.Event | None = None):
+        started = time.perf_counter()
+        try:
+            result = route.model.invoke(input, config, **kwargs)
+        except BaseException as e:
+            self._record(route, token, started, e, settled)
+            raise
+        self._record(route, token, started, None, settled)
+        return result
+
+    async def _acall(self, route: ProviderRoute, token, input, config, kwargs):
+        started = time.perf_counter()
+        try:
+            result = await route.model.ainvoke(input, config, **kwargs)
+        except BaseException as e:
+            self._record(route, token, started, e)
+            raise
+        self._record(route, token, started, None)
+        return result
+
+    def _next_route(self, candidates: Iterator, reason: str) -> tuple[ProviderRoute, object | None] | None:
+        claim = next(candidates, None)
+        if claim is not None:
+            logger.info(f"{reason.capitalize()} {self.name} call to {claim[0].name}")
+            self._count("hedged" if reason == "hedging" else "failovers")
+        return claim
+
+    def invoke(self, input, config: RunnableConfig | None = None, **kwargs):
+        self._count("calls")
+        candidates = self._candidates()
+        primary = next(candidates)
+        pool = _thread_pool()
+        # Set once a call wins; threads cannot be cancelled, so losers check it
+        settled = threading.Event()
+
+        def submit(claim):
+            # Keep callbacks and tracing context in the worker thread
+            return pool.submit(contextvars.copy_context().run, self._call, *claim, input, config, kwargs, settled)
+
+        pending = {submit(primary): primary}
+        hedge_delay = self.hedge_delay(primary[0]) if self.hedge_enabled else None
+        hedge = None
+        error: BaseException | None = None
+        while pending:
+            done, _ = wait(pending, timeout=hedge_delay, return_when=FIRST_COMPLETED)
+            if not done:
+                # The primary is slow: race it against the next provider
+                hedge_delay = None
+                hedge = self._next_route(candidates, "hedging")
+                if hedge is not None:
+                    pending[submit(hedge)] = hedge
+                continue
+            for future in done:
+                claim = pending.pop(future)
+                if future.exception() is None:
+                    if claim is hedge:
+                        self._count("hedge_wins")
+                    # A running loser finishes in the background and is ignored
+                    settled.set()
+                    return future.result()
+                error = future.exception()
+            if not pending:
+                hedge_delay = None
+                claim = self._next_route(candidates, "failing over")
+                if claim is not None:
+                    pending[submit(claim)] = claim
+        raise error
+
+    async def ainvoke(self, input, config: RunnableConfig | None = None, **kwargs):
+        self._count("calls")
+        candidates = self._candidates()
+        primary = next(candidates)
+        pending = {asyncio.ensure_future(self._acall(*primary, input, config, kwargs)): primary}
+        hedge_delay = self.hedge_delay(primary[0]) if self.hedge_enabled else None
+        hedge = None
+        error: BaseException | None = None
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedge_delay = None
+                    hedge = self._next_route(candidates, "hedging")
+                    if hedge is not None:
+                        pending[asyncio.ensure_future(self._acall(*hedge, input, config, kwargs))] = hedge
+                    continue
+                for task in done:
+                    claim = pending.pop(task)
+                    if task.exception() is None:
+                        if claim is hedge:
+                            self._count("hedge_wins")
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    hedge_delay = None
+                    claim = self._next_route(candidates, "failing over")
+                    if claim is not None:
+                        pending[asyncio.ensure_future(self._acall(*claim, input, config, kwargs))] = claim
+            raise error
+        finally:
+            # The losing call of a hedge, or all calls if this one is cancelled.
+            # A task cancelled before it started never reaches _acall's handler.
+            for task, (route, token) in pending.items():
+                task.cancel()
+                route.breaker.record_cancelled(token)
+
+    def stream(self, input, config: RunnableConfig | None = None, **kwargs) -> Iterator:
+        self._count("calls")
+        error: BaseException | None = None
+        for route, token in self._candidates():
+            started = time.perf_counter()
+            first_chunk = None
+            try:
+                for chunk in route.model.stream(input, config, **kwargs):
+                    if first_chunk is None:
+                        # Time to first token is the latency a streaming caller sees
+                        first_chunk = time.perf_counter() - started
+                    yield chunk
+            except Exception as e:
+                self._record(route, token, started, e)
+                if first_chunk is not None:
+                    raise
+                error = e
+                self._count("failovers")
+                continue
+            except GeneratorExit as e:
+                self._record(route, token, started, e)
+                raise
+            route.latency.add(first_chunk if first_chunk is not None else time.perf_counter() - started)
+            route.breaker.record_success(token)
+            return
+        raise error
+
+    async def astream(self, input, config: RunnableConfig | None = None, **kwargs) -> AsyncIterator:
+        self._count("calls")
+        error: BaseException | None = None
+        for route, token in self._candidates():
+            started = time.perf_counter()
+            first_chunk = None
+            try:
+                async for chunk in route.model.astream(input, config, **kwargs):
+                    if first_chunk is None:
+                        first_chunk = time.perf_counter() - started
+                    yield chunk
+            except Exception as e:
+                self._record(route, token, started, e)
+                if first_chunk is not None:
+                    raise
+                error = e
+                self._count("failovers")
+                continue
+            except (GeneratorExit, asyncio.CancelledError) as e:
+                self._record(route, token, started, e)
+                raise
+            route.latency.add(first_chunk if first_chunk is not None else time.perf_counter() - started)
+            route.breaker.record_success(token)
+            return
+        raise error
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            **self._counts,
+            "providers": {
+                route.name: {
+                    "state": route.breaker.state,
+                    "p50_ms": _ms(route.latency.percentile(50)),
+                    "p95_ms": _ms(route.latency.percentile(95)),
+                    "samples": len(route.latency)
+                }
+                for route in self.routes
+            }
+        }
+
+
+def _ms(seconds: float | None) -> float | None:
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+def configured_routes(temperature: float = 1.0) -> list[ProviderRoute]:
+    """Azure OpenAI first, then Groq, for whichever is configured"""
+    routes = []
+    if settings.AZURE_OPENAI_API_KEY and settings.AZURE_OPENAI_ENDPOINT:
+        routes.append(("azure", lambda: provider_clients.azure_chat(temperature=temperature)))
+    if settings.GROQ_API_KEY:
+        routes.append(("groq", lambda: provider_clients.groq_chat(temperature=temperature)))
+    built = []
+    for name, build in routes:
+        try:
+            built.append(ProviderRoute(name, build(), circuit_breaker(name), LatencyWindow(settings.LLM_ROUTER_WINDOW)))
+        except Exception as e:
+            logger.warning(f"{name} chat client unavailable: {e}")
+    return built
+
+
+def chat_router(temperature: float = 1.0, name: str = "chat") -> LLMRouter:
+    routes = configured_routes(temperature)
+    if not routes:
+        raise ValueError("No LLM provider configured! Set AZURE_OPENAI_API_KEY or GROQ_API_KEY")
+    return LLMRouter(
+        routes,
+        hedge_after_seconds=settings.LLM_HEDGE_AFTER_SECONDS or None,
+        hedge_min_seconds=settings.LLM_HEDGE_MIN_SECONDS,
+        hedge_enabled=settings.LLM_HEDGE_ENABLED,
+        min_samples=settings.LLM_HEDGE_MIN_SAMPLES,
+        name=name
+    )
+
+
+def llm_router_stats() -> dict:
+    """Breaker state per provider and latency/hedging counters per router"""
+    return {
+        "breakers": {name: breaker.stats() for name, breaker in list(_breakers.items())},
+        "routers": [router.stats() for router in list(_routers)]
+    }
@@ -0,0 +1,159 @@
+"""
+Provider-client registry shared by every LLM and embedding client
+
+One pooled httpx.Client and one httpx.AsyncClient per worker process carry
+all Azure OpenAI and Groq traffic, so keep-alive connections, TLS sessions
+and (with h2 installed) HTTP/2 streams are reused across requests instead
+of being set up again by each client. Chat and embedding clients are built
+once per configuration and handed out to every caller.
+"""
+
+import importlib.util
+import logging
+import threading
+import httpx
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderClients:
+    """
+    Lazily built, pooled HTTP transports plus the provider clients using them
+
+    The async client belongs to the event loop that first uses it; the API
+    runs one loop per worker. Call close()/aclose() on shutdown.
+    """
+
+    def __init__(self):
+        # Reentrant: a client built under the lock fetches the transports
+        self._lock = threading.RLock()
+        self._http_client: httpx.Client | None = None
+        self._async_http_client: httpx.AsyncClient | None = None
+        self._models: dict[tuple, object] = {}
+        self.http2 = False
+
+    @staticmethod
+    def _http2() -> bool:
+        if not settings.PROVIDER_HTTP2:
+            return False
+        if importlib.util.find_spec("h2") is None:
+            logger.warning("PROVIDER_HTTP2 is set but the h2 package is missing; using HTTP/1.1")
+            return False
+        return True
+
+    def _transport_options(self) -> dict:
+        self.http2 = self._http2()
+        return {
+            "limits": httpx.Limits(
+                max_connections=settings.PROVIDER_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.PROVIDER_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=settings.PROVIDER_HTTP_KEEPALIVE_SECONDS
+            ),
+            "timeout": httpx.Timeout(
+                settings.PROVIDER_HTTP_READ_TIMEOUT_SECONDS,
+                connect=settings.PROVIDER_HTTP_CONNECT_TIMEOUT_SECONDS
+            ),
+            "http2": self.http2
+        }
+
+    @property
+    def http_client(self) -> httpx.Client:
+        if self._http_client is None:
+            with self._lock:
+                if self._http_client is None:
+                    self._http_client = httpx.Client(**self._transport_options())
+        return self._http_client
+
+    @property
+    def async_http_client(self) -> httpx.AsyncClient:
+        if self._async_http_client is None:
+            with self._lock:
+                if self._async_http_client is None:
+                    self._async_http_client = httpx.AsyncClient(**self._transport_options())
+        return self._async_http_client
+
+    def _transports(self) -> dict:
+        return {"http_client": self.http_client, "http_async_client": self.async_http_client}
+
+    def _shared(self, key: tuple, build):
+        model = self._models.get(key)
+        if model is None:
+            with self._lock:
+                model = self._models.get(key)
+                if model is None:
+                    model = self._models[key] = build()
+        return model
+
+    def azure_chat(self, temperature: float = 1.0):
+        """AzureChatOpenAI on the shared transports"""
+        def build():
+            from langchain_openai import AzureChatOpenAI
+
+            return AzureChatOpenAI(
+                azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
+                azure_deployment=settings.AZURE_OPENAI_DEPLOYMENT,
+                api_key=settings.AZURE_OPENAI_API_KEY,
+                api_version=settings.AZURE_OPENAI_API_VERSION,
+                temperature=temperature,
+                **self._transports()
+            )
+
+        return self._shared(("azure_chat", temperature), build)
+
+    def groq_chat(self, temperature: float = 1.0, model: str | None = None):
+        """Groq chat model on the shared transports"""
+        model = model or settings.GROQ_MODEL
+
+        def build():
+            from langchain.chat_models import init_chat_model
+
+            return init_chat_model(
+                model,
+                model_provider="groq",
+                temperature=temperature,
+                **self._transports()
+            )
+
+        return self._shared(("groq_chat", model, temperature), build)
+
+    def azure_embeddings(self):
+        """AzureOpenAIEmbeddings on the shared transports"""
+        def build():
+            from langchain_openai import AzureOpenAIEmbeddings
+
+            return AzureOpenAIEmbeddings(
+                azure_endpoint=settings.AZURE_EMBEDDINGS_ENDPOINT,
+                azure_deployment=settings.AZURE_EMBEDDINGS_DEPLOYMENT,
+                api_key=settings.AZURE_EMBEDDINGS_API_KEY,
+                api_version=settings.AZURE_OPENAI_API_VERSION,
+                **self._transports()
+            )
+
+        return self._shared(("azure_embeddings",), build)
+
+    def close(self) -> None:
+        """Close the sync transport and forget the clients built on it"""
+        with self._lock:
+            self._models.clear()
+            if self._http_client is not None:
+                self._http_client.close()
+                self._http_client = None
+
+    async def aclose(self) -> None:
+        """Close both transports (from the event loop that used the async one)"""
+        client, self._async_http_client = self._async_http_client, None
+        self.close()
+        if client is not None:
+            await client.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "clients": sorted(key[0] for key in self._models),
+            "http2": self.http2,
+            "max_connections": settings.PROVIDER_HTTP_MAX_CONNECTIONS
+        }
+
+
+# Singleton instance
+provider_clients = ProviderClients()
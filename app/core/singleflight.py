@@ -0,0 +1,234 @@
+"""
+Single-flight coalescing of identical concurrent work
+
+After a company-wide announcement many employees ask the same question
+within seconds. A SingleFlight lets the first caller for a key run the
+computation while concurrent callers with the same key wait for it and
+share its result. Nothing is kept once the computation finishes; caching
+finished results is the job of the caches in front of it.
+
+Only user-independent work may be keyed this way: the result is handed to
+every caller with the same key.
+"""
+
+import asyncio
+import logging
+import threading
+import weakref
+from concurrent.futures import Future
+from typing import AsyncIterator, Awaitable, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+_flights: "weakref.WeakValueDictionary[str, SingleFlight]" = weakref.WeakValueDictionary()
+
+
+class _Broadcast:
+    """Chunks of one streamed computation, replayed to every subscriber"""
+
+    def __init__(self, source: AsyncIterator):
+        self.chunks: list = []
+        self.finished = False
+        self.error: BaseException | None = None
+        self._wake = asyncio.Event()
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    def _notify(self) -> None:
+        wake, self._wake = self._wake, asyncio.Event()
+        wake.set()
+
+    async def _pump(self, source: AsyncIterator) -> None:
+        try:
+            async for chunk in source:
+                self.chunks.append(chunk)
+                self._notify()
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.finished = True
+            self._notify()
+
+    async def subscribe(self) -> AsyncIterator:
+        position = 0
+        while True:
+            while position < len(self.chunks):
+                yield self.chunks[position]
+                position += 1
+            if self.finished:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._wake.wait()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one computation
+
+    The async computations run as their own tasks, so a caller that goes
+    away (a closed connection) does not cancel them for the others. The
+    async side assumes one event loop per worker, as the API runs.
+
+    Args:
+        name: Label in stats
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._tasks: dict[Hashable, asyncio.Future] = {}
+        self._futures: dict[Hashable, Future] = {}
+        self._streams: dict[Hashable, _Broadcast] = {}
+        self._lock = threading.Lock()
+        self._counts = {"leaders": 0, "followers": 0}
+        _flights[name] = self
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self._counts[key] += n
+
+    def _register(self, registry: dict, key: Hashable, flight, done=None) -> None:
+        """Keep flight under key until it (or the future done) completes"""
+        registry[key] = flight
+
+        def forget(_):
+            if registry.get(key) is flight:
+                del registry[key]
+
+        (done or flight).add_done_callback(forget)
+
+    @staticmethod
+    def _consume(task: asyncio.Future) -> None:
+        # Nobody may be left awaiting a failed task; keep asyncio from warning
+        if not task.cancelled():
+            task.exception()
+
+    def _start(self, key: Hashable, awaitable: Awaitable) -> asyncio.Future:
+        task = asyncio.ensure_future(awaitable)
+        task.add_done_callback(self._consume)
+        self._register(self._tasks, key, task)
+        return task
+
+    async def ado(self, key: Hashable, factory: Callable[[], Awaitable]):
+        """Result of factory(), computed once for all concurrent callers with this key"""
+        task = self._tasks.get(key)
+        if task is None:
+            self._count("leaders")
+            task = self._start(key, factory())
+        else:
+            self._count("followers")
+            logger.info(f"Joined in-flight {self.name} computation")
+        return await asyncio.shield(task)
+
+    async def ado_many(self, keys: list[Hashable], factory: Callable[[list], Awaitable[list]]) -> list:
+        """
+        Batch variant of ado
+
+        Keys already in flight join their computation; factory(missing)
+        computes the rest in one call and returns their results in order.
+        Returns one result per key, in order.
+        """
+        joined = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            task = self._tasks.get(key)
+            if task is not None:
+                joined[key] = task
+            else:
+                missing.append(key)
+        if joined:
+            self._count("followers", len(joined))
+            logger.info(f"Joined {len(joined)} in-flight {self.name} computations")
+
+        if missing:
+            self._count("leaders", len(missing))
+            batch = asyncio.ensure_future(factory(missing))
+            batch.add_done_callback(self._consume)
+
+            async def pick(position: int):
+                return (await batch)[position]
+
+            for position, key in enumerate(missing):
+                joined[key] = self._start(key, pick(position))
+
+        results = {key: await asyncio.shield(task) for key, task in joined.items()}
+        return [results[key] for key in keys]
+
+    def do(self, key: Hashable, fn: Callable[[], object]):
+        """Blocking variant of ado for calls made from worker threads"""
+        with self._lock:
+            future = self._futures.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._register(self._futures, key, future)
+                self._counts["leaders"] += 1
+            else:
+                self._counts["followers"] += 1
+        if not leader:
+            logger.info(f"Joined in-flight {self.name} computation")
+            return future.result()
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        return future.result()
+
+    def do_many(self, keys: list[Hashable], fn: Callable[[list], list]) -> list:
+        """Blocking variant of ado_many"""
+        joined, claimed = {}, {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                future = self._futures.get(key)
+                if future is not None:
+                    joined[key] = future
+                else:
+                    claimed[key] = future = Future()
+                    self._register(self._futures, key, future)
+            self._counts["followers"] += len(joined)
+            self._counts["leaders"] += len(claimed)
+        if joined:
+            logger.info(f"Joined {len(joined)} in-flight {self.name} computations")
+
+        if claimed:
+            try:
+                results = fn(list(claimed))
+                if len(results) != len(claimed):
+                    raise RuntimeError(f"{self.name}: expected {len(claimed)} results, got {len(results)}")
+                for future, result in zip(claimed.values(), results):
+                    future.set_result(result)
+            except BaseException as e:
+                for future in claimed.values():
+                    if not future.done():
+                        future.set_exception(e)
+        results = {key: future.result() for key, future in {**joined, **claimed}.items()}
+        return [results[key] for key in keys]
+
+    async def astream(self, key: Hashable, factory: Callable[[], AsyncIterator]) -> AsyncIterator:
+        """
+        Chunks of factory()'s stream, produced once for all concurrent callers
+
+        A caller joining late first gets the chunks produced so far.
+        """
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            self._count("leaders")
+            broadcast = _Broadcast(factory())
+            self._register(self._streams, key, broadcast, done=broadcast.task)
+        else:
+            self._count("followers")
+            logger.info(f"Joined in-flight {self.name} stream")
+        async for chunk in broadcast.subscribe():
+            yield chunk
+
+    def stats(self) -> dict:
+        calls = self._counts["leaders"] + self._counts["followers"]
+        return {
+            **self._counts,
+            "in_flight": len(self._tasks) + len(self._futures) + len(self._streams),
+            "coalesced_rate": round(self._counts["followers"] / calls, 4) if calls else 0.0
+        }
+
+
+def single_flight_stats() -> dict:
+    """Counters of every live SingleFlight, by name"""
+    return {name: flight.stats() for name, flight in list(_flights.items())}
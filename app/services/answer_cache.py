@@ -0,0 +1,153 @@
+"""
+Semantic answer cache for policy questions
+Serves a stored answer when a new question embeds close enough to an old one,
+or matches it word for word when it was answered without an embedding
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+import numpy as np
+from app.services.embedding_cache import normalize_query
+
+
+@dataclass
+class _CachedAnswer:
+    question: str
+    answer: str
+    index_version: str
+    created_at: float
+
+
+class SemanticAnswerCache:
+    """
+    Bounded cache of policy answers looked up by cosine similarity
+
+    Every entry is tagged with the index version it was generated from and
+    is only served while that version is current, so a re-index makes all
+    older answers unreachable at once. Entries are also indexed by their
+    normalized question, so questions answered without a vector (a decisive
+    BM25 match skips the embedding) are still served on an exact repeat.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        max_entries: int = 1000,
+        ttl: float | None = None
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[int, _CachedAnswer] = OrderedDict()
+        self._vectors: dict[int, np.ndarray] = {}
+        self._by_text: dict[tuple[str, str], int] = {}
+        self._matrix: np.ndarray | None = None
+        self._matrix_ids: list[int] = []
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray | None:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(v))
+        return v / norm if norm else None
+
+    def _servable(self, entry: _CachedAnswer, index_version: str, now: float) -> bool:
+        return entry.index_version == index_version and not (self.ttl and now - entry.created_at > self.ttl)
+
+    def _hit(self, entry_id: int) -> str:
+        self._entries.move_to_end(entry_id)
+        self.hits += 1
+        return self._entries[entry_id].answer
+
+    def lookup(self, vector, index_version: str, question: str | None = None) -> str | None:
+        """
+        Return the best cached answer, or None
+
+        An exact repeat of question is served first; otherwise the closest
+        entry above the threshold, when there is a vector.
+        """
+        now = time.time()
+        with self._lock:
+            if question is not None:
+                entry_id = self._by_text.get((index_version, normalize_query(question)))
+                if entry_id is not None and self._servable(self._entries[entry_id], index_version, now):
+                    return self._hit(entry_id)
+
+            query = self._normalize(vector) if vector is not None else None
+            if query is None or not self._vectors:
+                self.misses += 1
+                return None
+
+            matrix = self._get_matrix()
+            if matrix.shape[1] != query.shape[0]:
+                self.misses += 1
+                return None
+
+            scores = matrix @ query
+            for pos in np.argsort(-scores):
+                if scores[pos] < self.threshold:
+                    break
+                entry_id = self._matrix_ids[pos]
+                if self._servable(self._entries[entry_id], index_version, now):
+                    return self._hit(entry_id)
+
+            self.misses += 1
+            return None
+
+    def add(self, question: str, vector, answer: str, index_version: str) -> None:
+        """Store an answer; vector may be None for a question answered without one"""
+        normalized = self._normalize(vector) if vector is not None else None
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _CachedAnswer(
+                question=question,
+                answer=answer,
+                index_version=index_version,
+                created_at=time.time()
+            )
+            self._by_text[(index_version, normalize_query(question))] = entry_id
+            if normalized is not None:
+                self._vectors[entry_id] = normalized
+                self._matrix = None
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, entry_id: int) -> None:
+        """Remove an entry from every index (caller holds the lock)"""
+        entry = self._entries.pop(entry_id)
+        text_key = (entry.index_version, normalize_query(entry.question))
+        if self._by_text.get(text_key) == entry_id:
+            del self._by_text[text_key]
+        if self._vectors.pop(entry_id, None) is not None:
+            self._matrix = None
+
+    def invalidate(self, keep_version: str | None = None) -> int:
+        """Drop every entry not generated from keep_version; returns the count removed"""
+        with self._lock:
+            stale = [i for i, e in self._entries.items() if e.index_version != keep_version]
+            for entry_id in stale:
+                self._drop(entry_id)
+            return len(stale)
+
+    def _get_matrix(self) -> np.ndarray:
+        """Contiguous matrix of entry vectors, rebuilt lazily after writes"""
+        if self._matrix is None:
+            self._matrix_ids = list(self._vectors.keys())
+            self._matrix = np.vstack([self._vectors[i] for i in self._matrix_ids])
+        return self._matrix
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,189 @@
+"""
+Context assembly for policy answers
+Turns scored retrieval candidates into the prompt context: picks k from the
+score distribution, drops near-duplicates, merges overlapping or adjacent
+chunks of the same source and trims the result to a token budget.
+"""
+
+import logging
+import re
+from langchain_core.documents import Document
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # optional: fall back to a character estimate
+    _ENCODING = None
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+_SENTENCE_END = re.compile(r"[.!?]\s")
+
+
+def count_tokens(text: str) -> int:
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def adaptive_k(
+    scored_docs: list[tuple[Document, float]],
+    min_k: int,
+    max_k: int,
+    relative_cutoff: float | None
+) -> list:
+    """
+    Keep the leading candidates whose score stays close to the best one
+
+    Always keeps the first min_k and never more than max_k; in between,
+    drops candidates scoring below relative_cutoff * best. Scores need not
+    be sorted (fused candidates keep their RRF order), so every candidate
+    up to max_k is checked. With relative_cutoff None the first max_k are
+    kept.
+    """
+    if not scored_docs:
+        return []
+    candidates = scored_docs[:max_k]
+    if relative_cutoff is None:
+        return candidates
+    best = max(score for _, score in candidates)
+    return [
+        (doc, score) for position, (doc, score) in enumerate(candidates)
+        if position < min_k or (best > 0 and score >= relative_cutoff * best)
+    ]
+
+
+def _shingles(text: str, size: int = 5) -> set:
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def drop_near_duplicates(scored_docs: list, threshold: float) -> list:
+    """Remove candidates whose word-shingle Jaccard similarity to a better one exceeds threshold"""
+    kept, kept_shingles = [], []
+    for doc, score in scored_docs:
+        shingles = _shingles(doc.page_content)
+        if any(len(shingles & other) / (len(shingles | other) or 1) >= threshold for other in kept_shingles):
+            continue
+        kept.append((doc, score))
+        kept_shingles.append(shingles)
+    return kept
+
+
+def _text_overlap(left: str, right: str, min_overlap: int = 30, max_overlap: int = 400) -> int:
+    """Length of the longest suffix of left that is a prefix of right"""
+    for length in range(min(len(left), len(right), max_overlap), min_overlap - 1, -1):
+        if left.endswith(right[:length]):
+            return length
+    return 0
+
+
+def merge_adjacent(scored_docs: list) -> list[dict]:
+    """
+    Merge chunks of the same source that overlap or touch
+
+    Uses the splitter's start_index when present, otherwise looks for a
+    textual overlap between chunk ends. Returns passages (text, source,
+    rank) where rank is the best rank among the merged chunks.
+    """
+    by_source: dict[str, list] = {}
+    for rank, (doc, _) in enumerate(scored_docs):
+        by_source.setdefault(doc.metadata.get("source", ""), []).append((rank, doc))
+
+    passages = []
+    for source, items in by_source.items():
+        items.sort(key=lambda item: item[1].metadata.get("start_index", -1))
+        current = None
+        for rank, doc in items:
+            text = doc.page_content
+            start = doc.metadata.get("start_index")
+            if current is not None:
+                merged = None
+                if start is not None and current["end"] is not None and start <= current["end"]:
+                    merged = current["text"] + text[current["end"] - start:]
+                else:
+                    overlap = _text_overlap(current["text"], text)
+                    if overlap:
+                        merged = current["text"] + text[overlap:]
+                if merged is not None:
+                    current["text"] = merged
+                    current["rank"] = min(current["rank"], rank)
+                    if start is not None and current["end"] is not None:
+                        current["end"] = max(current["end"], start + len(text))
+                    continue
+                passages.append(current)
+            current = {
+                "text": text,
+                "source": source,
+                "rank": rank,
+                "end": start + len(text) if start is not None else None
+            }
+        if current is not None:
+            passages.append(current)
+
+    passages.sort(key=lambda p: p["rank"])
+    return passages
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to roughly max_tokens, preferring a sentence boundary"""
+    if _ENCODING is not None:
+        cut = _ENCODING.decode(_ENCODING.encode(text, disallowed_special=())[:max_tokens])
+    else:
+        cut = text[:max_tokens * 4]
+    ends = list(_SENTENCE_END.finditer(cut))
+    if ends and ends[-1].end() > len(cut) // 2:
+        return cut[:ends[-1].end()].rstrip()
+    return cut.rsplit(" ", 1)[0].rstrip()
+
+
+def pack_context(
+    scored_docs: list[tuple[Document, float]],
+    token_budget: int = 1200,
+    min_k: int = 1,
+    max_k: int = 6,
+    relative_cutoff: float | None = 0.8,
+    dedup_threshold: float = 0.8,
+    min_tail_tokens: int = 60
+) -> str:
+    """
+    Build the prompt context from scored candidates (best first)
+
+    Args:
+        scored_docs: (Document, score) pairs, higher score = more relevant
+        token_budget: Maximum context size in tokens
+        min_k / max_k: Bounds for the adaptive number of chunks
+        relative_cutoff: Keep chunks scoring at least this fraction of the best;
+            None keeps max_k
+        dedup_threshold: Shingle Jaccard above which a chunk is a near-duplicate
+        min_tail_tokens: Smallest truncated passage worth adding at the end
+
+    Returns:
+        Passages joined by blank lines
+    """
+    selected = adaptive_k(scored_docs, min_k=min_k, max_k=max_k, relative_cutoff=relative_cutoff)
+    selected = drop_near_duplicates(selected, dedup_threshold)
+    passages = merge_adjacent(selected)
+
+    parts, used = [], 0
+    for passage in passages:
+        text = passage["text"].strip()
+        tokens = count_tokens(text)
+        if used + tokens <= token_budget:
+            parts.append(text)
+            used += tokens
+            continue
+        remaining = token_budget - used
+        if remaining >= min_tail_tokens or not parts:
+            parts.append(_truncate_to_tokens(text, remaining))
+            used = token_budget
+        break
+
+    logger.debug(
+        f"Packed context: {len(scored_docs)} candidates -> {len(selected)} chunks "
+        f"-> {len(parts)} passages, ~{used} tokens"
+    )
+    return "\n\n".join(parts)
@@ -0,0 +1,264 @@
+"""
+Query embedding cache for the policy retriever
+Two tiers: an in-memory LRU in front of a SQLite table that survives restarts
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from langchain_core.embeddings import Embeddings
+from app.core.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation"""
+    return _WHITESPACE.sub(" ", text.casefold()).strip().rstrip("?!. ")
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded cache of query embeddings keyed by (model, normalized text)
+
+    The memory tier answers repeat questions without touching disk; the
+    SQLite tier keeps vectors across restarts and is pruned to
+    max_disk_entries by least recent use. The async methods serve memory
+    hits inline and run the SQLite reads and writes in a worker thread.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        path: str | None = None,
+        max_entries: int = 2048,
+        max_disk_entries: int = 50000
+    ):
+        self.model = model
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+        self._memory = LRUCache(maxsize=max_entries)
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._writes_since_prune = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if path:
+            self._open(path)
+
+    def _open(self, path: str) -> None:
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS query_embeddings (
+                       key TEXT PRIMARY KEY,
+                       model TEXT NOT NULL,
+                       vector BLOB NOT NULL,
+                       last_used REAL NOT NULL
+                   )"""
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_query_embeddings_last_used "
+                "ON query_embeddings (last_used)"
+            )
+            conn.commit()
+            self._conn = conn
+        except sqlite3.Error as e:
+            # The memory tier still works without the disk tier
+            logger.warning(f"Embedding cache disk tier disabled ({path}): {e}")
+            self._conn = None
+
+    def key(self, text: str) -> str:
+        payload = f"{self.model}\x00{normalize_query(text)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, text: str) -> list[float] | None:
+        """Return the cached vector for a query, or None on a miss"""
+        key = self.key(text)
+        vector = self._memory.get(key)
+        if vector is not None:
+            return vector
+        return self._promote(key)
+
+    async def aget(self, text: str) -> list[float] | None:
+        """Async variant of get; only a memory miss leaves the event loop"""
+        key = self.key(text)
+        vector = self._memory.get(key)
+        if vector is not None:
+            return vector
+        if self._conn is None:
+            self.misses += 1
+            return None
+        return await asyncio.to_thread(self._promote, key)
+
+    def _promote(self, key: str) -> list[float] | None:
+        """Disk lookup after a memory miss; a hit is copied into memory"""
+        vector = self._disk_get(key)
+        if vector is not None:
+            self.disk_hits += 1
+            self._memory.set(key, vector)
+            return vector
+
+        self.misses += 1
+        return None
+
+    def set(self, text: str, vector: list[float]) -> None:
+        key = self.key(text)
+        vector = list(vector)
+        self._memory.set(key, vector)
+        self._disk_set(key, vector)
+
+    async def aset_many(self, texts: list[str], vectors: list[list[float]]) -> None:
+        """Store several vectors: memory at once, disk in one worker-thread hop"""
+        items = [(self.key(text), list(vector)) for text, vector in zip(texts, vectors)]
+        for key, vector in items:
+            self._memory.set(key, vector)
+        if self._conn is not None:
+            await asyncio.to_thread(self._disk_set_many, items)
+
+    def _disk_set_many(self, items: list[tuple[str, list[float]]]) -> None:
+        for key, vector in items:
+            self._disk_set(key, vector)
+
+    def _disk_get(self, key: str) -> list[float] | None:
+        if self._conn is None:
+            return None
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    "SELECT vector FROM query_embeddings WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                self._conn.execute(
+                    "UPDATE query_embeddings SET last_used = ? WHERE key = ?",
+                    (time.time(), key)
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache read failed: {e}")
+                return None
+        vector = array("f")
+        vector.frombytes(row[0])
+        return vector.tolist()
+
+    def _disk_set(self, key: str, vector: list[float]) -> None:
+        if self._conn is None:
+            return
+        blob = array("f", vector).tobytes()
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (key, model, vector, last_used) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, self.model, blob, time.time())
+                )
+                self._writes_since_prune += 1
+                if self._writes_since_prune >= 100:
+                    self._prune()
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache write failed: {e}")
+
+    def _prune(self) -> None:
+        """Trim the disk tier to max_disk_entries (caller holds the lock)"""
+        self._writes_since_prune = 0
+        self._conn.execute(
+            """DELETE FROM query_embeddings WHERE key IN (
+                   SELECT key FROM query_embeddings
+                   ORDER BY last_used DESC LIMIT -1 OFFSET ?
+               )""",
+            (self.max_disk_entries,)
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> dict:
+        memory = self._memory.stats()
+        lookups = memory["hits"] + self.disk_hits + self.misses
+        hits = memory["hits"] + self.disk_hits
+        return {
+            "model": self.model,
+            "memory_size": memory["size"],
+            "memory_hits": memory["hits"],
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves embed_query from a QueryEmbeddingCache
+
+    Document embedding (ingestion) passes straight through.
+    """
+
+    def __init__(self, embedding: Embeddings, cache: QueryEmbeddingCache):
+        self.embedding = embedding
+        self.cache = cache
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embedding.embed_documents(texts)
+
+    def lookup(self, text: str) -> list[float] | None:
+        """Cached vector for a query without calling the provider"""
+        return self.cache.get(text)
+
+    def embed_and_store(self, text: str) -> list[float]:
+        vector = self.embedding.embed_query(text)
+        self.cache.set(text, vector)
+        return vector
+
+    def embed_and_store_many(self, texts: list[str]) -> list[list[float]]:
+        """Embed several queries in one provider request and cache them all"""
+        vectors = self.embedding.embed_documents(texts)
+        for text, vector in zip(texts, vectors):
+            self.cache.set(text, vector)
+        return vectors
+
+    def embed_query(self, text: str) -> list[float]:
+        vector = self.cache.get(text)
+        if vector is None:
+            vector = self.embed_and_store(text)
+        return vector
+
+    async def alookup(self, text: str) -> list[float] | None:
+        return await self.cache.aget(text)
+
+    async def aembed_and_store(self, text: str) -> list[float]:
+        vector = await self.embedding.aembed_query(text)
+        await self.cache.aset_many([text], [vector])
+        return vector
+
+    async def aembed_and_store_many(self, texts: list[str]) -> list[list[float]]:
+        vectors = await self.embedding.aembed_documents(texts)
+        await self.cache.aset_many(texts, vectors)
+        return vectors
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self.embedding.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        vector = await self.cache.aget(text)
+        if vector is None:
+            vector = await self.aembed_and_store(text)
+        return vector
@@ -1,58 +1,649 @@
 # retriever.py
 
+import asyncio
+import logging
 import os
+import threading
+from dataclasses import dataclass
+from typing import AsyncIterator
 from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import Runnable
 from langchain_core.output_parsers import StrOutputParser
-from langchain_openai import AzureChatOpenAI
 from dotenv import load_dotenv
-from langchain_openai import AzureOpenAIEmbeddings
-from app.core.config import settings 
+from app.core.config import settings
+from app.core.providers import provider_clients
+from app.core.llm_router import chat_router
+from app.services.embedding_cache import QueryEmbeddingCache, CachedQueryEmbeddings
+from app.services.answer_cache import SemanticAnswerCache
+from app.services.vector_index import InProcessVectorIndex, full_precision_path
+from app.services.context_packer import pack_context
+from app.Chromadb.embedding_backends import get_embedding_function, embedding_model_id, check_embedding_model
+from app.Chromadb.active_collection import active_collection_name, active_pointer_stamp
+from app.Chromadb.index_metadata import UNVERSIONED, read_index_metadata, index_metadata_stamp
+from app.Chromadb.lexical_index import BM25Index, lexical_index_path
 
 load_dotenv()
+logger = logging.getLogger(__name__)
 
-def query_hr_documents(question: str):
-
-    embedding = AzureOpenAIEmbeddings(
-        azure_endpoint=settings.AZURE_EMBEDDINGS_ENDPOINT,
-        azure_deployment=settings.AZURE_EMBEDDINGS_DEPLOYMENT,
-        api_key=settings.AZURE_EMBEDDINGS_API_KEY,
-        api_version=settings.AZURE_OPENAI_API_VERSION
-    )
-
-    vectorstore = Chroma(
-        persist_directory="./chroma_db",
-        collection_name="hr_documents",
-        embedding_function=embedding
-    )
-
-    docs = vectorstore.similarity_search(
-        query=question,
-        k=3
-    )
-
-    context = "\n\n".join([d.page_content for d in docs])
-
-    llm = AzureChatOpenAI(
-        azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
-        azure_deployment=settings.AZURE_OPENAI_DEPLOYMENT,
-        api_key=settings.AZURE_OPENAI_API_KEY,
-        api_version=settings.AZURE_OPENAI_API_VERSION,
-        temperature=1.0
-    )
-
-    prompt = PromptTemplate(
-        input_variables=["context", "question"],
-        template=(
-            "You are an HR assistant chatbot. "
-            "Use the following HR documents as context to answer.\n\n"
-            "Context:\n{context}\n\n"
-            "Question: {question}\n\n"
-            "Answer clearly and concisely based on the policy."
-        ),
-    )
-
-    chain = prompt | llm | StrOutputParser()
-    answer = chain.invoke({"context": context, "question": question})
-
-    return {"answer": answer}
\ No newline at end of file
+
+POLICY_PROMPT = PromptTemplate(
+    input_variables=["context", "question"],
+    template=(
+        "You are an HR assistant chatbot. "
+        "Use the following HR documents as context to answer.\n\n"
+        "Context:\n{context}\n\n"
+        "Question: {question}\n\n"
+        "Answer clearly and concisely based on the policy."
+    ),
+)
+
+
+@dataclass
+class _RetrieverState:
+    """Snapshot of the clients used to answer one query"""
+    embedding: Embeddings
+    vectorstore: Chroma
+    llm: Runnable
+    chain: object
+    index_version: str
+    index_stamp: tuple
+    collection: str
+    memory_index: InProcessVectorIndex | None = None
+    lexical_index: BM25Index | None = None
+
+
+def reciprocal_rank_fusion(result_lists: list[list[Document]], k: int = 60) -> list[tuple[Document, float]]:
+    """Merge ranked lists by summing 1 / (k + rank) per document; returns (doc, rrf_score) pairs"""
+    scores: dict[str, float] = {}
+    docs: dict[str, Document] = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results):
+            key = doc.id or doc.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+            docs.setdefault(key, doc)
+    return [(docs[key], scores[key]) for key in sorted(scores, key=scores.get, reverse=True)]
+
+
+def _distance_to_similarity(distance: float, space: str) -> float:
+    """Chroma distance to a similarity where higher is better"""
+    if space == "l2":
+        # Squared L2 between unit vectors = 2 - 2 * cosine
+        return 1.0 - distance / 2.0
+    return 1.0 - distance
+
+
+class RetrieverRuntime:
+    """
+    Process-wide policy retriever
+
+    Owns the embedding client, the Chroma handle and the compiled prompt
+    chain so they are built once per process instead of once per question.
+    The FastAPI lifespan calls load() on startup and close() on shutdown;
+    reload() rebuilds everything and swaps it in atomically, so queries
+    already running keep using the snapshot they started with. A sync by
+    setup_vector_store points the logical collection at a new, complete
+    physical collection (blue/green), which triggers the reload (and drops
+    cached answers) on the next query.
+    """
+
+    def __init__(
+        self,
+        persist_directory: str | None = None,
+        collection_name: str | None = None,
+        top_k: int | None = None,
+        search_backend: str | None = None
+    ):
+        self.persist_directory = persist_directory or settings.CHROMA_PERSIST_DIRECTORY
+        self.collection_name = collection_name or settings.CHROMA_COLLECTION_NAME
+        self.top_k = top_k or settings.RETRIEVER_TOP_K
+        self.search_backend = search_backend or settings.RETRIEVER_SEARCH_BACKEND
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._state: _RetrieverState | None = None
+        self.embedding_cache: QueryEmbeddingCache | None = None
+        self.answer_cache: SemanticAnswerCache | None = None
+        if settings.ANSWER_CACHE_ENABLED:
+            self.answer_cache = SemanticAnswerCache(
+                threshold=settings.ANSWER_CACHE_SIMILARITY,
+                max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+                ttl=settings.ANSWER_CACHE_TTL_SECONDS
+            )
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._state is not None
+
+    def load(self) -> "RetrieverRuntime":
+        """Build the shared clients if they are not built yet"""
+        if self._state is None:
+            with self._lock:
+                if self._state is None:
+                    self._state = self._build_state()
+        return self
+
+    def reload(self) -> "RetrieverRuntime":
+        """Rebuild the clients and vector store handle, e.g. after re-indexing"""
+        state = self._build_state()
+        with self._lock:
+            self._state = state
+        if self.answer_cache is not None:
+            dropped = self.answer_cache.invalidate(keep_version=state.index_version)
+            if dropped:
+                logger.info(f"Dropped {dropped} cached answers from older index versions")
+        logger.info(f"Retriever runtime reloaded (index version {state.index_version})")
+        return self
+
+    def close(self) -> None:
+        """Drop the shared clients and close the embedding cache"""
+        with self._lock:
+            self._state = None
+            if self.embedding_cache is not None:
+                self.embedding_cache.close()
+                self.embedding_cache = None
+
+    def stats(self) -> dict:
+        """Runtime and cache counters for health reporting"""
+        return {
+            "loaded": self.is_loaded,
+            "collection": self.collection_name,
+            "active_collection": self._state.collection if self._state else None,
+            "index_version": self._state.index_version if self._state else None,
+            "search_backend": self.search_backend,
+            "embedding_model": embedding_model_id(),
+            "providers": provider_clients.stats(),
+            "embedding_cache": self.embedding_cache.stats() if self.embedding_cache else None,
+            "answer_cache": self.answer_cache.stats() if self.answer_cache else None
+        }
+
+    def _index_stamp(self) -> tuple:
+        """
+        Cheap change detector for the served index
+
+        Blue/green builds switch the active-collection pointer; indexes built
+        before that (no pointer yet) are rebuilt in place and rewrite their
+        index side-car instead.
+        """
+        pointer = active_pointer_stamp(self.persist_directory, self.collection_name)
+        if pointer is not None:
+            return ("active", pointer)
+        return ("index", index_metadata_stamp(self.persist_directory, self.collection_name))
+
+    def _snapshot(self) -> _RetrieverState:
+        state = self.load()._state
+        stamp = self._index_stamp()
+        if stamp != state.index_stamp:
+            with self._reload_lock:
+                state = self._state
+                if stamp != state.index_stamp:
+                    logger.info("Active index changed on disk, reloading retriever")
+                    state = self.reload()._state
+        return state
+
+    def _build_state(self) -> _RetrieverState:
+        # Read the stamp first so a rebuild racing with us triggers another reload
+        index_stamp = self._index_stamp()
+        collection = active_collection_name(self.persist_directory, self.collection_name)
+        index_metadata = read_index_metadata(self.persist_directory, collection)
+
+        model_id = embedding_model_id()
+        embedding = get_embedding_function()
+
+        if settings.EMBEDDING_CACHE_ENABLED:
+            # The cache outlives reloads so warm vectors are kept; entries are
+            # keyed by model id, so switching backends never mixes vectors
+            if self.embedding_cache is None or self.embedding_cache.model != model_id:
+                if self.embedding_cache is not None:
+                    self.embedding_cache.close()
+                self.embedding_cache = QueryEmbeddingCache(
+                    model=model_id,
+                    path=settings.EMBEDDING_CACHE_PATH,
+                    max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+                    max_disk_entries=settings.EMBEDDING_CACHE_MAX_DISK_ENTRIES
+                )
+            embedding = CachedQueryEmbeddings(embedding, self.embedding_cache)
+
+        vectorstore = Chroma(
+            persist_directory=self.persist_directory,
+            collection_name=collection,
+            embedding_function=embedding
+        )
+
+        # Touch the collection so the SQLite files and HNSW segment are
+        # opened now rather than on the first user question
+        try:
+            count = vectorstore._collection.count()
+            logger.info(f"Retriever warmed: '{collection}' has {count} vectors")
+        except Exception as e:
+            logger.warning(f"Could not warm Chroma collection '{collection}': {e}")
+
+        # Refuse to serve a collection built with another model: its vectors
+        # live in a different space (often a different dimension)
+        recorded_model = index_metadata.get("embedding_model") or (
+            vectorstore._collection.metadata or {}
+        ).get("embedding_model")
+        check_embedding_model(recorded_model, model_id, collection)
+
+        memory_index = None
+        if self.search_backend == "memory":
+            memory_index = self._load_memory_index(vectorstore, collection)
+
+        lexical_index = None
+        lexical_path = lexical_index_path(self.persist_directory, collection)
+        if settings.RETRIEVER_HYBRID and os.path.exists(lexical_path):
+            try:
+                lexical_index = BM25Index.load(lexical_path)
+            except Exception as e:
+                logger.warning(f"BM25 index unavailable, using vector search only: {e}")
+
+        if settings.LLM_ROUTER_ENABLED:
+            llm = chat_router(temperature=1.0, name="answer")
+        else:
+            llm = provider_clients.azure_chat(temperature=1.0)
+
+        chain = POLICY_PROMPT | llm | StrOutputParser()
+        return _RetrieverState(
+            embedding=embedding,
+            vectorstore=vectorstore,
+            llm=llm,
+            chain=chain,
+            index_version=index_metadata.get("version", UNVERSIONED),
+            index_stamp=index_stamp,
+            collection=collection,
+            memory_index=memory_index,
+            lexical_index=lexical_index
+        )
+
+    @property
+    def vectorstore(self) -> Chroma:
+        return self._snapshot().vectorstore
+
+    @property
+    def embedding(self) -> Embeddings:
+        """Query embedding of the served index (cached), e.g. for routing; retrieval reuses its vectors"""
+        return self._snapshot().embedding
+
+    def _load_memory_index(self, vectorstore: Chroma, collection: str) -> InProcessVectorIndex:
+        return InProcessVectorIndex.from_collection(
+            vectorstore._collection,
+            hnsw_min_size=settings.RETRIEVER_HNSW_MIN_SIZE,
+            storage=settings.RETRIEVER_VECTOR_STORAGE,
+            pca_dim=settings.RETRIEVER_VECTOR_PCA_DIM or None,
+            rescore_factor=settings.RETRIEVER_RESCORE_FACTOR,
+            full_precision_path=full_precision_path(self.persist_directory, collection)
+        )
+
+    def _memory_index(self, state: _RetrieverState) -> InProcessVectorIndex:
+        if state.memory_index is None:
+            # Selected per call: build it once and keep it on the snapshot
+            state.memory_index = self._load_memory_index(state.vectorstore, state.collection)
+        return state.memory_index
+
+    def _search(self, state: _RetrieverState, vector, k: int, search_backend: str | None = None) -> list:
+        """Vector search through the selected backend; (doc, similarity) pairs"""
+        return self._search_many(state, [vector], k, search_backend)[0]
+
+    def _search_many(self, state: _RetrieverState, vectors: list, k: int, search_backend: str | None = None) -> list:
+        """One multi-query vector search; returns a (doc, similarity) list per vector"""
+        backend = search_backend or self.search_backend
+        if backend == "memory":
+            return self._memory_index(state).search_many(vectors, k=k)
+        if backend != "chroma":
+            raise ValueError(f"Unknown retriever search backend: {backend}")
+        collection = state.vectorstore._collection
+        space = (collection.metadata or {}).get("hnsw:space", "l2")
+        results = collection.query(
+            query_embeddings=vectors,
+            n_results=k,
+            include=["documents", "metadatas", "distances"]
+        )
+        return [
+            [
+                (
+                    Document(id=doc_id, page_content=text or "", metadata=metadata or {}),
+                    _distance_to_similarity(distance, space)
+                )
+                for doc_id, text, metadata, distance in zip(ids, texts, metadatas, distances)
+            ]
+            for ids, texts, metadatas, distances in zip(
+                results["ids"], results["documents"], results["metadatas"], results["distances"]
+            )
+        ]
+
+    @staticmethod
+    def _embed_many(state: _RetrieverState, texts: list[str]) -> list:
+        if isinstance(state.embedding, CachedQueryEmbeddings):
+            return state.embedding.embed_and_store_many(texts)
+        return state.embedding.embed_documents(texts)
+
+    @staticmethod
+    async def _aembed_many(state: _RetrieverState, texts: list[str]) -> list:
+        if isinstance(state.embedding, CachedQueryEmbeddings):
+            return await state.embedding.aembed_and_store_many(texts)
+        return await state.embedding.aembed_documents(texts)
+
+    @staticmethod
+    def _cached_vector(state: _RetrieverState, question: str):
+        if isinstance(state.embedding, CachedQueryEmbeddings):
+            return state.embedding.lookup(question)
+        return None
+
+    @staticmethod
+    async def _acached_vector(state: _RetrieverState, question: str):
+        if isinstance(state.embedding, CachedQueryEmbeddings):
+            return await state.embedding.alookup(question)
+        return None
+
+    def _lexical_hits(self, state: _RetrieverState, question: str) -> list:
+        if state.lexical_index is None:
+            return []
+        return state.lexical_index.search_documents(question, k=settings.RETRIEVER_CANDIDATE_K)
+
+    def _is_decisive(self, state: _RetrieverState, question: str, lexical_hits: list) -> bool:
+        """True when BM25 alone is confident enough to skip the embedding call"""
+        return bool(lexical_hits) and state.lexical_index.is_decisive(
+            question, lexical_hits, k=self.top_k, ratio=settings.BM25_DECISIVE_RATIO
+        )
+
+    def _embed_unless_decisive(self, state: _RetrieverState, question: str, lexical_hits: list):
+        """
+        Query vector, or None when the lexical ranking alone is decisive
+
+        A vector already in the embedding cache is always used since it
+        costs nothing.
+        """
+        vector = self._cached_vector(state, question)
+        if vector is not None:
+            return vector
+        if self._is_decisive(state, question, lexical_hits):
+            logger.info("Lexical match is decisive, skipping query embedding")
+            return None
+        if isinstance(state.embedding, CachedQueryEmbeddings):
+            return state.embedding.embed_and_store(question)
+        return state.embedding.embed_query(question)
+
+    async def _aembed_unless_decisive(self, state: _RetrieverState, question: str, lexical_hits: list):
+        """Async variant of _embed_unless_decisive"""
+        vector = await self._acached_vector(state, question)
+        if vector is not None:
+            return vector
+        if self._is_decisive(state, question, lexical_hits):
+            logger.info("Lexical match is decisive, skipping query embedding")
+            return None
+        if isinstance(state.embedding, CachedQueryEmbeddings):
+            return await state.embedding.aembed_and_store(question)
+        return await state.embedding.aembed_query(question)
+
+    def _rank(self, state: _RetrieverState, vector, lexical_hits: list, search_backend: str | None) -> list:
+        """Scored candidates from vector search, BM25, or their RRF fusion (see _fuse), best first"""
+        if vector is None:
+            return lexical_hits
+        dense_hits = self._search(state, vector, settings.RETRIEVER_CANDIDATE_K, search_backend)
+        return self._fuse(dense_hits, lexical_hits)
+
+    @staticmethod
+    def _fuse(dense_hits: list, lexical_hits: list) -> list:
+        """
+        Candidates in RRF order, each scored by its relevance in the list(s) that found it
+
+        The score is the larger of the dense similarity and the BM25 score,
+        each as a fraction of its list's best, so the packer's relative
+        cutoff keeps what either retriever rates close to its top hit. RRF
+        scores themselves cannot be cut that way: a document found by one
+        list scores about half of one found by both, however relevant.
+        """
+        if not lexical_hits:
+            return dense_hits
+        relevance: dict[str, float] = {}
+        for hits in (dense_hits, lexical_hits):
+            best = hits[0][1] if hits else 0.0
+            if best <= 0:
+                continue
+            for doc, score in hits:
+                relevance[doc.id] = max(relevance.get(doc.id, 0.0), score / best)
+        fused = reciprocal_rank_fusion(
+            [[doc for doc, _ in dense_hits], [doc for doc, _ in lexical_hits]],
+            k=settings.RETRIEVER_RRF_K
+        )
+        return [(doc, relevance.get(doc.id, 0.0)) for doc, _ in fused]
+
+    def retrieve(self, question: str, search_backend: str | None = None) -> list:
+        """Return the top-k policy chunks for a question"""
+        state = self._snapshot()
+        lexical_hits = self._lexical_hits(state, question)
+        vector = self._embed_unless_decisive(state, question, lexical_hits)
+        candidates = self._rank(state, vector, lexical_hits, search_backend)
+        return [doc for doc, _ in candidates[:self.top_k]]
+
+    def _cached_answer(self, state: _RetrieverState, question: str, vector) -> str | None:
+        """Cached answer for a repeat or, with a vector, a close paraphrase"""
+        if self.answer_cache is None:
+            return None
+        cached = self.answer_cache.lookup(vector, state.index_version, question=question)
+        if cached is not None:
+            logger.info("Policy answer served from semantic cache")
+        return cached
+
+    def _prepare(self, state: _RetrieverState, question: str, search_backend: str | None) -> tuple:
+        """
+        Everything before generation: (vector, cached_answer, candidates)
+
+        cached_answer is set (and candidates None) on a semantic cache hit.
+        """
+        lexical_hits = self._lexical_hits(state, question)
+        vector = self._embed_unless_decisive(state, question, lexical_hits)
+        cached = self._cached_answer(state, question, vector)
+        if cached is not None:
+            return vector, cached, None
+        return vector, None, self._rank(state, vector, lexical_hits, search_backend)
+
+    async def _aprepare(self, state: _RetrieverState, question: str, search_backend: str | None) -> tuple:
+        """Async variant of _prepare; the blocking vector search runs in a worker thread"""
+        lexical_hits = self._lexical_hits(state, question)
+        vector = await self._aembed_unless_decisive(state, question, lexical_hits)
+        cached = self._cached_answer(state, question, vector)
+        if cached is not None:
+            return vector, cached, None
+        candidates = await asyncio.to_thread(self._rank, state, vector, lexical_hits, search_backend)
+        return vector, None, candidates
+
+    @staticmethod
+    def _chain_input(question: str, candidates: list) -> dict:
+        """Prompt variables, with the context packed from _rank's candidates"""
+        context = pack_context(
+            candidates,
+            token_budget=settings.CONTEXT_TOKEN_BUDGET,
+            min_k=settings.CONTEXT_MIN_K,
+            max_k=settings.CONTEXT_MAX_K,
+            relative_cutoff=settings.CONTEXT_RELATIVE_CUTOFF,
+            dedup_threshold=settings.CONTEXT_DEDUP_THRESHOLD
+        )
+        return {"context": context, "question": question}
+
+    def _remember(self, state: _RetrieverState, question: str, vector, answer: str) -> None:
+        # Without a vector (decisive BM25 match) the answer is kept for exact repeats
+        if self.answer_cache is not None:
+            self.answer_cache.add(question, vector, answer, state.index_version)
+
+    async def _asnapshot(self) -> _RetrieverState:
+        # Loading or reloading opens Chroma; keep that off the event loop
+        if self._state is None:
+            return await asyncio.to_thread(self._snapshot)
+        state = self._state
+        if self._index_stamp() != state.index_stamp:
+            return await asyncio.to_thread(self._snapshot)
+        return state
+
+    def query(self, question: str, search_backend: str | None = None) -> dict:
+        """Answer a policy question from the indexed HR documents"""
+        state = self._snapshot()
+        vector, cached, candidates = self._prepare(state, question, search_backend)
+        if cached is not None:
+            return {"answer": cached, "cached": True}
+
+        answer = state.chain.invoke(self._chain_input(question, candidates))
+        self._remember(state, question, vector, answer)
+        return {"answer": answer, "cached": False}
+
+    async def aquery(self, question: str, search_backend: str | None = None) -> dict:
+        """Async variant of query: async embedding and LLM calls, threaded vector search"""
+        state = await self._asnapshot()
+        vector, cached, candidates = await self._aprepare(state, question, search_backend)
+        if cached is not None:
+            return {"answer": cached, "cached": True}
+
+        answer = await state.chain.ainvoke(self._chain_input(question, candidates))
+        self._remember(state, question, vector, answer)
+        return {"answer": answer, "cached": False}
+
+    async def astream_query(self, question: str, search_backend: str | None = None) -> AsyncIterator[str]:
+        """
+        Stream a policy answer as LLM tokens arrive
+
+        A cached answer is yielded whole.
+        """
+        state = await self._asnapshot()
+        vector, cached, candidates = await self._aprepare(state, question, search_backend)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        async for token in state.chain.astream(self._chain_input(question, candidates)):
+            parts.append(token)
+            yield token
+        self._remember(state, question, vector, "".join(parts))
+
+    def _plan_batch(self, state: _RetrieverState, questions: list[str]) -> tuple:
+        """Lexical hits and cached vectors per question, plus the questions still to embed"""
+        lexical = {q: self._lexical_hits(state, q) for q in questions}
+        vectors = {q: self._cached_vector(state, q) for q in questions}
+        to_embed = [
+            q for q in questions
+            if vectors[q] is None and not self._is_decisive(state, q, lexical[q])
+        ]
+        return lexical, vectors, to_embed
+
+    async def _aplan_batch(self, state: _RetrieverState, questions: list[str]) -> tuple:
+        """Async variant of _plan_batch; vectors missing from memory are read off the event loop"""
+        lexical = {q: self._lexical_hits(state, q) for q in questions}
+        vectors = {q: await self._acached_vector(state, q) for q in questions}
+        to_embed = [
+            q for q in questions
+            if vectors[q] is None and not self._is_decisive(state, q, lexical[q])
+        ]
+        return lexical, vectors, to_embed
+
+    def _batch_contexts(
+        self,
+        state: _RetrieverState,
+        questions: list[str],
+        lexical: dict,
+        vectors: dict,
+        search_backend: str | None
+    ) -> tuple:
+        """
+        Serve what the answer cache can, then run one multi-query search
+
+        Returns (results, pending, chain_inputs) where pending are the
+        questions that still need generation.
+        """
+        results: dict[str, dict] = {}
+        for q in questions:
+            cached = self._cached_answer(state, q, vectors[q])
+            if cached is not None:
+                results[q] = {"answer": cached, "cached": True}
+
+        pending = [q for q in questions if q not in results]
+        searchable = [q for q in pending if vectors[q] is not None]
+        dense: dict[str, list] = {}
+        if searchable:
+            hits = self._search_many(
+                state, [vectors[q] for q in searchable], settings.RETRIEVER_CANDIDATE_K, search_backend
+            )
+            dense = dict(zip(searchable, hits))
+
+        inputs = []
+        for q in pending:
+            candidates = self._fuse(dense[q], lexical[q]) if q in dense else lexical[q]
+            inputs.append(self._chain_input(q, candidates))
+        return results, pending, inputs
+
+    def _finish_batch(self, state, questions, results, pending, vectors, answers, embedded: int) -> list[dict]:
+        for q, answer in zip(pending, answers):
+            results[q] = {"answer": answer, "cached": False}
+            self._remember(state, q, vectors[q], answer)
+        logger.info(
+            f"Batched {len(questions)} policy questions: "
+            f"{embedded} embedded in one request, {len(pending)} generated"
+        )
+        return [results[q] for q in questions]
+
+    def query_batch(self, questions: list[str], search_backend: str | None = None) -> list[dict]:
+        """
+        Answer several policy questions with shared round trips
+
+        Uncached questions are embedded in a single embeddings request and
+        searched with one multi-query vector search; the LLM calls run
+        concurrently through chain.batch. Returns one result per question,
+        in order.
+        """
+        if not questions:
+            return []
+        state = self._snapshot()
+        unique = list(dict.fromkeys(questions))
+
+        lexical, vectors, to_embed = self._plan_batch(state, unique)
+        if to_embed:
+            vectors.update(zip(to_embed, self._embed_many(state, to_embed)))
+
+        results, pending, inputs = self._batch_contexts(state, unique, lexical, vectors, search_backend)
+        answers = state.chain.batch(inputs) if inputs else []
+        return self._finish_batch(state, questions, results, pending, vectors, answers, len(to_embed))
+
+    async def aquery_batch(self, questions: list[str], search_backend: str | None = None) -> list[dict]:
+        """Async variant of query_batch"""
+        if not questions:
+            return []
+        state = await self._asnapshot()
+        unique = list(dict.fromkeys(questions))
+
+        lexical, vectors, to_embed = await self._aplan_batch(state, unique)
+        if to_embed:
+            vectors.update(zip(to_embed, await self._aembed_many(state, to_embed)))
+
+        results, pending, inputs = await asyncio.to_thread(
+            self._batch_contexts, state, unique, lexical, vectors, search_backend
+        )
+        answers = await state.chain.abatch(inputs) if inputs else []
+        return self._finish_batch(state, questions, results, pending, vectors, answers, len(to_embed))
+
+
+# Singleton instance, owned by the FastAPI lifespan
+retriever_runtime = RetrieverRuntime()
+
+
+def get_vectorstore() -> Chroma:
+    """Return the shared Chroma handle"""
+    return retriever_runtime.vectorstore
+
+
+def query_hr_documents(question: str, search_backend: str | None = None):
+    return retriever_runtime.query(question, search_backend=search_backend)
+
+
+def query_hr_documents_batch(questions: list[str], search_backend: str | None = None) -> list[dict]:
+    """Batch variant of query_hr_documents: one result dict per question"""
+    return retriever_runtime.query_batch(questions, search_backend=search_backend)
+
+
+async def aquery_hr_documents(question: str, search_backend: str | None = None) -> dict:
+    """Async variant of query_hr_documents"""
+    return await retriever_runtime.aquery(question, search_backend=search_backend)
+
+
+async def aquery_hr_documents_batch(questions: list[str], search_backend: str | None = None) -> list[dict]:
+    """Async variant of query_hr_documents_batch"""
+    return await retriever_runtime.aquery_batch(questions, search_backend=search_backend)
@@ -0,0 +1,294 @@
+"""
+In-process vector index mirroring a Chroma collection
+Keeps every chunk embedding in one contiguous float32 matrix so policy
+lookups skip the Chroma client and its SQLite reads entirely.
+
+Every worker process holds its own copy, so the matrix can also be kept
+compact: float16 or int8 scalar quantization, optionally after a PCA
+projection. The compact matrix only shortlists candidates; they are
+re-scored against full-precision vectors memory-mapped from a .npy file,
+which the OS page cache shares between workers.
+"""
+
+import logging
+import os
+import time
+import numpy as np
+from langchain_core.documents import Document
+
+try:
+    import hnswlib
+except ImportError:  # listed in requirements.txt; exact search is used without it
+    hnswlib = None
+
+logger = logging.getLogger(__name__)
+
+# Set once the missing-hnswlib warning has been logged
+_hnsw_missing_logged = False
+
+STORAGE_MODES = ("float32", "float16", "int8")
+
+# Rows scored per step in compact modes, so the float32 upcast stays small
+_SCORE_BLOCK_ROWS = 4096
+
+
+def full_precision_path(persist_directory: str, collection_name: str) -> str:
+    return os.path.join(persist_directory, f"{collection_name}.vectors.npy")
+
+
+def _write_npy(path: str, matrix: np.ndarray) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+    np.save(tmp_path, matrix)
+    os.replace(tmp_path, path)
+
+
+def _map_npy(path: str, matrix: np.ndarray) -> np.ndarray:
+    """
+    Memory-map the copy of matrix saved at path, writing it only if missing or stale
+
+    Collection versions do not change once built, so the first worker
+    writes the file and the others find it equal and just map it. The
+    comparison reads it block by block through the shared page cache.
+    """
+    try:
+        mapped = np.load(path, mmap_mode="r")
+        if mapped.shape == matrix.shape and mapped.dtype == matrix.dtype and all(
+            np.array_equal(mapped[start:start + _SCORE_BLOCK_ROWS], matrix[start:start + _SCORE_BLOCK_ROWS])
+            for start in range(0, len(matrix), _SCORE_BLOCK_ROWS)
+        ):
+            return mapped
+    except (OSError, ValueError):
+        pass
+    _write_npy(path, matrix)
+    return np.load(path, mmap_mode="r")
+
+
+def _fit_pca(matrix: np.ndarray, dim: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    PCA projection of the rows of matrix onto `dim` dimensions
+
+    Returns the mean row, shape (n_features,), and a (dim, n_features)
+    matrix whose rows are the principal axes by decreasing variance; a
+    vector x reduces to (x - mean) @ components.T.
+    """
+    mean = matrix.mean(axis=0)
+    centered = matrix - mean
+    # Eigenvectors of the (n_features x n_features) scatter matrix; cheaper than an SVD of the data
+    eigenvalues, eigenvectors = np.linalg.eigh(centered.T @ centered)
+    order = np.argsort(eigenvalues)[::-1][:dim]
+    return mean.astype(np.float32), np.ascontiguousarray(eigenvectors[:, order].T, dtype=np.float32)
+
+
+def _log_hnsw_missing(size: int) -> None:
+    global _hnsw_missing_logged
+    if not _hnsw_missing_logged:
+        _hnsw_missing_logged = True
+        logger.warning(
+            f"hnswlib is not installed; searching {size} vectors exactly. "
+            f"Install it (see requirements.txt) to use HNSW above RETRIEVER_HNSW_MIN_SIZE"
+        )
+
+
+class InProcessVectorIndex:
+    """
+    Cosine-similarity index over a snapshot of a Chroma collection
+
+    Small collections are searched exactly with one matrix-vector product.
+    When hnswlib is installed and the collection has at least hnsw_min_size
+    vectors, an HNSW graph is built over the same matrix instead.
+    Results are (Document, similarity) pairs, highest similarity first.
+
+    With storage "float16" or "int8" (and/or pca_dim), only the compact
+    matrix stays in memory and it is always searched exactly; the top
+    k * rescore_factor candidates are re-scored at full precision when
+    full_precision_path is given. Without that file the compact scores
+    are returned as they are.
+    """
+
+    def __init__(
+        self,
+        ids: list[str],
+        documents: list[str],
+        metadatas: list[dict | None],
+        embeddings,
+        hnsw_min_size: int = 5000,
+        hnsw_m: int = 16,
+        hnsw_ef_construction: int = 200,
+        hnsw_ef_search: int = 64,
+        storage: str = "float32",
+        pca_dim: int | None = None,
+        rescore_factor: int = 4,
+        full_precision_path: str | None = None
+    ):
+        if storage not in STORAGE_MODES:
+            raise ValueError(f"Unknown vector storage mode: {storage}")
+        matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[0] != len(ids):
+            raise ValueError("embeddings must be a (n_docs, dim) matrix")
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix = matrix / norms
+
+        self.storage = storage
+        self.rescore_factor = max(1, rescore_factor)
+        self._full_dim = matrix.shape[1]
+        self._pca_mean = self._pca_components = None
+        self._int8_scale = None
+        self.compact = storage != "float32" or bool(pca_dim and pca_dim < self._full_dim)
+
+        if not self.compact:
+            self.matrix = matrix
+        else:
+            self.matrix = None
+            if full_precision_path is not None:
+                # Read-only and backed by the page cache: one copy for all workers
+                self.matrix = _map_npy(full_precision_path, matrix)
+            reduced = matrix
+            if pca_dim and pca_dim < self._full_dim and len(matrix):
+                self._pca_mean, self._pca_components = _fit_pca(matrix, pca_dim)
+                reduced = (matrix - self._pca_mean) @ self._pca_components.T
+            if storage == "int8":
+                # Symmetric per-dimension scale
+                scale = np.abs(reduced).max(axis=0) / 127.0 if len(reduced) else np.ones(reduced.shape[1])
+                scale[scale == 0] = 1.0
+                self._int8_scale = scale.astype(np.float32)
+                self._codes = np.clip(np.rint(reduced / self._int8_scale), -127, 127).astype(np.int8)
+            else:
+                self._codes = np.ascontiguousarray(reduced, dtype=np.float16 if storage == "float16" else np.float32)
+            del matrix, reduced
+
+        self.ids = list(ids)
+        self.documents = [
+            Document(id=doc_id, page_content=text or "", metadata=metadata or {})
+            for doc_id, text, metadata in zip(ids, documents, metadatas)
+        ]
+
+        self._hnsw = None
+        # HNSW keeps its own float32 copy, which compact storage exists to avoid
+        wants_hnsw = not self.compact and len(self.ids) >= hnsw_min_size
+        if wants_hnsw and hnswlib is None:
+            _log_hnsw_missing(len(self.ids))
+        elif wants_hnsw:
+            index = hnswlib.Index(space="ip", dim=self.dim)
+            index.init_index(max_elements=len(self.ids), ef_construction=hnsw_ef_construction, M=hnsw_m)
+            index.add_items(self.matrix, np.arange(len(self.ids)))
+            index.set_ef(hnsw_ef_search)
+            self._hnsw = index
+
+    @classmethod
+    def from_collection(cls, collection, **kwargs) -> "InProcessVectorIndex":
+        """Load every vector, text and metadata from a chromadb Collection"""
+        started = time.perf_counter()
+        data = collection.get(include=["documents", "metadatas", "embeddings"])
+        embeddings = data["embeddings"]
+        if embeddings is None or len(embeddings) == 0:
+            embeddings = np.zeros((0, 1), dtype=np.float32)
+        index = cls(
+            ids=data["ids"],
+            documents=data["documents"],
+            metadatas=data["metadatas"],
+            embeddings=embeddings,
+            **kwargs
+        )
+        logger.info(
+            f"In-process index loaded {len(index)} vectors "
+            f"({index.mode}, {index.memory_bytes() / 2**20:.1f} MiB) in {time.perf_counter() - started:.2f}s"
+        )
+        return index
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        return self._full_dim
+
+    @property
+    def uses_hnsw(self) -> bool:
+        return self._hnsw is not None
+
+    @property
+    def mode(self) -> str:
+        if not self.compact:
+            return "hnsw" if self.uses_hnsw else "exact"
+        mode = self.storage
+        if self._pca_components is not None:
+            mode += f"+pca{self._pca_components.shape[0]}"
+        return mode + ("+rescore" if self.matrix is not None else "")
+
+    def memory_bytes(self) -> int:
+        """Vector bytes held in this process (memory-mapped vectors are not counted)"""
+        if not self.compact:
+            return self.matrix.nbytes
+        extra = [self._pca_mean, self._pca_components, self._int8_scale]
+        return self._codes.nbytes + sum(array.nbytes for array in extra if array is not None)
+
+    def _compact_scores(self, queries: np.ndarray) -> np.ndarray:
+        """Approximate inner products of every query with every stored vector"""
+        if self._pca_components is not None:
+            # The mean term is the same for every row of a query, so ranking is unchanged
+            queries = queries @ self._pca_components.T
+        if self._int8_scale is not None:
+            queries = queries * self._int8_scale
+        scores = np.empty((len(queries), len(self.ids)), dtype=np.float32)
+        for start in range(0, len(self.ids), _SCORE_BLOCK_ROWS):
+            block = self._codes[start:start + _SCORE_BLOCK_ROWS].astype(np.float32)
+            scores[:, start:start + len(block)] = queries @ block.T
+        return scores
+
+    def search(self, vector, k: int = 3) -> list[tuple[Document, float]]:
+        return self.search_many([vector], k=k)[0]
+
+    def search_many(self, vectors, k: int = 3) -> list[list[tuple[Document, float]]]:
+        """Top-k documents for each query vector"""
+        if not self.ids:
+            return [[] for _ in vectors]
+
+        queries = np.asarray(vectors, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        queries = queries / norms
+        k = min(k, len(self.ids))
+
+        if self._hnsw is not None:
+            labels, distances = self._hnsw.knn_query(queries, k=k)
+            # hnswlib's "ip" distance is 1 - inner product
+            return [
+                [(self.documents[int(i)], float(1.0 - d)) for i, d in zip(row_ids, row_dist)]
+                for row_ids, row_dist in zip(labels, distances)
+            ]
+
+        if self.compact:
+            return self._search_compact(queries, k)
+
+        scores = queries @ self.matrix.T
+        results = []
+        for row in scores:
+            top = self._top(row, k)
+            results.append([(self.documents[int(i)], float(row[i])) for i in top])
+        return results
+
+    @staticmethod
+    def _top(row: np.ndarray, k: int) -> np.ndarray:
+        top = np.argpartition(-row, k - 1)[:k] if k < len(row) else np.arange(len(row))
+        return top[np.argsort(-row[top])]
+
+    def _search_compact(self, queries: np.ndarray, k: int) -> list[list[tuple[Document, float]]]:
+        scores = self._compact_scores(queries)
+        if self.matrix is None:
+            return [[(self.documents[int(i)], float(row[i])) for i in self._top(row, k)] for row in scores]
+
+        shortlist = min(len(self.ids), k * self.rescore_factor)
+        results = []
+        for query, row in zip(queries, scores):
+            candidates = np.sort(self._top(row, shortlist))
+            # Sorted row order keeps memory-mapped reads sequential
+            exact = np.asarray(self.matrix[candidates]) @ query
+            order = np.argsort(-exact)[:k]
+            results.append([(self.documents[int(candidates[i])], float(exact[i])) for i in order])
+        return results
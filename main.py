@@ -2,14 +2,35 @@
 HRConnect API - Main Application
 """
 
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.api.routes import auth, chatbot
 from app.api.routes import emergency_leave, vacation_leave, sick_leave
+from app.core.providers import provider_clients
+from app.services.retriever import retriever_runtime
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build shared runtimes once per worker and release them on shutdown"""
+    try:
+        retriever_runtime.load()
+    except Exception as e:
+        # Keep serving; the runtime retries lazily on the first policy query
+        logger.error(f"Retriever runtime failed to start: {e}")
+    yield
+    retriever_runtime.close()
+    await provider_clients.aclose()
+
 
 app = FastAPI(
     title="HRConnect API",
     description="Human Resource Information System with Agentic RAG",
     version="1.0.0",
+    lifespan=lifespan,
     swagger_ui_parameters={
         "persistAuthorization": True  # Keep authorization after page refresh
     }
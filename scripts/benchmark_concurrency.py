@@ -0,0 +1,120 @@
+"""
+Benchmark: chat pipeline throughput vs. number of in-flight requests
+
+Runs the compiled hr_agent_graph with fake decomposer/handler latencies
+(no provider calls) inside one event loop, the way a single uvicorn worker
+does. "blocking" calls graph.invoke() from the coroutine, as chat_query
+used to; "async" awaits graph.ainvoke(). Throughput of the blocking path
+stays flat as concurrency grows, the async path scales with it.
+
+Usage:
+    python -m scripts.benchmark_concurrency --latency-ms 200 --requests 64
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+# Settings are read at import time; the fakes below never use them
+for name, value in {
+    "SQLALCHEMY_DATABASE_URI": "sqlite://",
+    "SECRET_KEY": "benchmark",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+    "GROQ_API_KEY": "benchmark",
+}.items():
+    os.environ.setdefault(name, value)
+
+from langchain_core.runnables import RunnableLambda
+
+from app.Agent import hr_agent_graph, AgentState
+from app.Agent import query_decomposer
+from app.Agent.handlers import handler_factory
+from app.Agent.handlers.base_handler import BaseQueryHandler
+from app.Agent.models import QueryDecomposition, SubQuery
+
+
+class FakeDecomposerLLM:
+    """Stands in for the chat model: one sub-query after a fixed delay"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def with_structured_output(self, schema):
+        def decompose(messages):
+            time.sleep(self.latency)
+            return self._result(messages)
+
+        async def adecompose(messages):
+            await asyncio.sleep(self.latency)
+            return self._result(messages)
+
+        return RunnableLambda(decompose, afunc=adecompose)
+
+    @staticmethod
+    def _result(messages) -> QueryDecomposition:
+        question = messages[-1]["content"]
+        return QueryDecomposition(sub_queries=[SubQuery(question=question, query_type="general")])
+
+
+class SleepyHandler(BaseQueryHandler):
+    """Handler with a fixed I/O latency in both sync and async form"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def can_handle(self, query_type: str) -> bool:
+        return True
+
+    def handle(self, question: str, user_id: int | None = None) -> str:
+        time.sleep(self.latency)
+        return question
+
+    async def ahandle(self, question: str, user_id: int | None = None) -> str:
+        await asyncio.sleep(self.latency)
+        return question
+
+
+async def run(mode: str, concurrency: int, total: int) -> float:
+    """Requests per second for `total` requests with `concurrency` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        state = AgentState(messages=[{"role": "user", "content": f"question {i}"}])
+        async with semaphore:
+            if mode == "blocking":
+                hr_agent_graph.invoke(state)
+            else:
+                await hr_agent_graph.ainvoke(state)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return total / (time.perf_counter() - started)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="fake latency per LLM/handler call")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    latency = args.latency_ms / 1000.0
+    query_decomposer.llm = FakeDecomposerLLM(latency)
+    # Every request must pay for decomposition: no fast path, no cached or shared results
+    query_decomposer.fast_router = None
+    query_decomposer.decomposition_cache = None
+    query_decomposer.decomposition_flights = None
+    handler_factory._handlers = [SleepyHandler(latency)]
+
+    print(f"{args.requests} requests, {args.latency_ms:.0f} ms per call (2 calls per request)")
+    print(f"{'in-flight':>10}{'blocking req/s':>16}{'async req/s':>14}")
+    for concurrency in args.concurrency:
+        blocking = await run("blocking", concurrency, args.requests)
+        concurrent = await run("async", concurrency, args.requests)
+        print(f"{concurrency:>10}{blocking:>16.2f}{concurrent:>14.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+"""
+Benchmark: compact vector storage modes of the in-process index
+
+For each storage mode (float32, float16, int8, each optionally after PCA,
+with and without full-precision re-scoring) this reports the vector memory
+held per worker, recall@k against exact float32 search and query latency.
+Queries are stored chunk embeddings with a little Gaussian noise, so no
+embedding API calls are needed. --synthetic benchmarks random clustered
+vectors instead of a Chroma collection.
+
+Usage:
+    python -m scripts.benchmark_vector_quantization --queries 500 --k 5
+    python -m scripts.benchmark_vector_quantization --synthetic 50000 --dim 1536 --pca-dim 256
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+
+from app.services.vector_index import InProcessVectorIndex
+from app.Chromadb.active_collection import active_collection_name
+
+
+def percentile_ms(samples: list[float], pct: float) -> float:
+    return float(np.percentile(np.asarray(samples) * 1000.0, pct))
+
+
+def recall_at_k(results: list[list[str]], truth: list[list[str]]) -> float:
+    hits = sum(len(set(r) & set(t)) for r, t in zip(results, truth))
+    total = sum(len(t) for t in truth)
+    return hits / total if total else 0.0
+
+
+def load_collection(persist_directory: str, collection: str) -> tuple[list[str], np.ndarray]:
+    from langchain_chroma import Chroma
+
+    name = active_collection_name(persist_directory, collection)
+    data = Chroma(persist_directory=persist_directory, collection_name=name)._collection.get(include=["embeddings"])
+    embeddings = data["embeddings"]
+    if embeddings is None or len(embeddings) == 0:
+        return [], np.zeros((0, 1), dtype=np.float32)
+    return data["ids"], np.asarray(embeddings, dtype=np.float32)
+
+
+def synthetic_vectors(count: int, dim: int, rng) -> tuple[list[str], np.ndarray]:
+    """Clustered vectors, closer to real embeddings than uniform noise"""
+    centers = rng.normal(0, 1, (max(1, count // 50), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), count)] + rng.normal(0, 0.5, (count, dim)).astype(np.float32)
+    return [f"chunk-{i}" for i in range(count)], vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--persist-directory", default="./chroma_db")
+    parser.add_argument("--collection", default="hr_documents")
+    parser.add_argument("--synthetic", type=int, default=0, help="benchmark N random vectors instead")
+    parser.add_argument("--dim", type=int, default=1536, help="dimensions of synthetic vectors")
+    parser.add_argument("--pca-dim", type=int, default=0, help="default: a quarter of the dimensions")
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--noise", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    if args.synthetic:
+        ids, embeddings = synthetic_vectors(args.synthetic, args.dim, rng)
+    else:
+        ids, embeddings = load_collection(args.persist_directory, args.collection)
+    if not ids:
+        print("No vectors - nothing to benchmark")
+        return
+
+    documents, metadatas = [""] * len(ids), [None] * len(ids)
+    exact = InProcessVectorIndex(ids, documents, metadatas, embeddings, hnsw_min_size=float("inf"))
+    picks = rng.integers(0, len(exact), size=args.queries)
+    queries = exact.matrix[picks] + rng.normal(0, args.noise, (args.queries, exact.dim)).astype(np.float32)
+    truth = [[d.id for d, _ in hits] for hits in exact.search_many(queries, k=args.k)]
+
+    pca_dim = args.pca_dim or max(1, exact.dim // 4)
+    modes = [("float32", None)]
+    for storage in ("float16", "int8"):
+        modes += [(storage, None), (storage, pca_dim)]
+
+    print(f"{len(ids)} vectors x {exact.dim} dims, {args.queries} queries, k={args.k}, rescore x{args.rescore_factor}")
+    print(f"{'mode':<28}{'memory MiB':>12}{'saved':>8}{'recall@k':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    baseline = exact.memory_bytes()
+    with tempfile.TemporaryDirectory() as tmp:
+        for storage, pca in modes:
+            for rescore in ((False,) if storage == "float32" and pca is None else (False, True)):
+                index = InProcessVectorIndex(
+                    ids, documents, metadatas, embeddings,
+                    hnsw_min_size=float("inf"),
+                    storage=storage,
+                    pca_dim=pca,
+                    rescore_factor=args.rescore_factor,
+                    full_precision_path=os.path.join(tmp, f"{storage}-{pca}.npy") if rescore else None
+                )
+                index.search(queries[0], k=args.k)  # warm-up
+                latencies, results = [], []
+                for query in queries:
+                    started = time.perf_counter()
+                    results.append([d.id for d, _ in index.search(query, k=args.k)])
+                    latencies.append(time.perf_counter() - started)
+                memory = index.memory_bytes()
+                print(
+                    f"{index.mode:<28}{memory / 2**20:>12.2f}{1 - memory / baseline:>8.0%}"
+                    f"{recall_at_k(results, truth):>10.3f}"
+                    f"{percentile_ms(latencies, 50):>10.3f}{percentile_ms(latencies, 99):>10.3f}"
+                )
+    print("Memory excludes the memory-mapped full-precision file used for re-scoring (shared page cache).")
+
+
+if __name__ == "__main__":
+    main()
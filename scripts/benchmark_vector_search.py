@@ -0,0 +1,80 @@
+"""
+Benchmark: Chroma similarity search vs the in-process vector index
+
+Queries are stored chunk embeddings with a little Gaussian noise, so no
+embedding API calls are needed. Ground truth is exact cosine search over
+the full float32 matrix.
+
+Usage:
+    python -m scripts.benchmark_vector_search --queries 500 --k 3
+"""
+
+import argparse
+import time
+import numpy as np
+from langchain_chroma import Chroma
+
+from app.services.vector_index import InProcessVectorIndex
+from app.Chromadb.active_collection import active_collection_name
+
+
+def percentile_ms(samples: list[float], pct: float) -> float:
+    return float(np.percentile(np.asarray(samples) * 1000.0, pct))
+
+
+def recall_at_k(results: list[list[str]], truth: list[list[str]]) -> float:
+    hits = sum(len(set(r) & set(t)) for r, t in zip(results, truth))
+    total = sum(len(t) for t in truth)
+    return hits / total if total else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--persist-directory", default="./chroma_db")
+    parser.add_argument("--collection", default="hr_documents")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--noise", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    collection_name = active_collection_name(args.persist_directory, args.collection)
+    vectorstore = Chroma(persist_directory=args.persist_directory, collection_name=collection_name)
+    collection = vectorstore._collection
+
+    memory_index = InProcessVectorIndex.from_collection(collection)
+    exact_index = InProcessVectorIndex.from_collection(collection, hnsw_min_size=float("inf"))
+    if not len(exact_index):
+        print(f"Collection '{collection_name}' is empty - nothing to benchmark")
+        return
+
+    rng = np.random.default_rng(args.seed)
+    picks = rng.integers(0, len(exact_index), size=args.queries)
+    queries = exact_index.matrix[picks] + rng.normal(0, args.noise, (args.queries, exact_index.dim)).astype(np.float32)
+    query_lists = [q.tolist() for q in queries]
+
+    truth = [[d.id for d, _ in hits] for hits in exact_index.search_many(queries, k=args.k)]
+
+    backends = {
+        "chroma": lambda q: [d.id for d in vectorstore.similarity_search_by_vector(q, k=args.k)],
+        "memory": lambda q: [d.id for d, _ in memory_index.search(q, k=args.k)],
+    }
+
+    print(f"{len(exact_index)} vectors x {exact_index.dim} dims, {args.queries} queries, k={args.k}")
+    print(f"memory backend: {'hnsw' if memory_index.uses_hnsw else 'exact'}")
+    print(f"{'backend':<10}{'recall@k':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, search in backends.items():
+        search(query_lists[0])  # warm-up
+        latencies, results = [], []
+        for q in query_lists:
+            started = time.perf_counter()
+            results.append(search(q))
+            latencies.append(time.perf_counter() - started)
+        print(
+            f"{name:<10}{recall_at_k(results, truth):>10.3f}"
+            f"{percentile_ms(latencies, 50):>10.3f}{percentile_ms(latencies, 99):>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
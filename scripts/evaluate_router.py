@@ -0,0 +1,139 @@
+"""
+Evaluate the fast-path router against a labelled question set
+
+Each line of the dataset is {"question": ..., "label": ...} with label
+"policy", "personal_data", "general", or "compound" for messages that must
+go to the LLM decomposer. For every margin the report shows how many
+messages skip the LLM, how many of those are routed correctly, how many
+compound messages leak through, and the routing latency.
+
+By default only the keyword rules run (no network). --embeddings adds the
+nearest-centroid classifier on the configured embedding backend, and --llm
+also times the LLM decomposer on the same questions for comparison.
+
+Usage:
+    python -m scripts.evaluate_router
+    python -m scripts.evaluate_router --embeddings --margins 0.04 0.08 0.12 --llm
+"""
+
+import argparse
+import json
+import os
+import time
+import numpy as np
+from langchain_core.messages import HumanMessage
+
+# Settings are read at import time; rules-only runs never use them
+for name, value in {
+    "SQLALCHEMY_DATABASE_URI": "sqlite://",
+    "SECRET_KEY": "evaluate",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+    "GROQ_API_KEY": "evaluate",
+}.items():
+    os.environ.setdefault(name, value)
+
+from app.Agent.fast_router import FastRouter
+from app.Agent.models import AgentState
+
+
+def load_dataset(path: str) -> list[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile_ms(samples: list[float], pct: float) -> float:
+    return float(np.percentile(np.asarray(samples) * 1000.0, pct)) if samples else 0.0
+
+
+def evaluate(router: FastRouter, dataset: list[dict], verbose: bool = False) -> dict:
+    routed = correct = leaked = 0
+    latencies = []
+    for item in dataset:
+        started = time.perf_counter()
+        decision = router.classify(item["question"])
+        latencies.append(time.perf_counter() - started)
+        if not decision.routed:
+            continue
+        routed += 1
+        if item["label"] == "compound":
+            leaked += 1
+        elif decision.query_type == item["label"]:
+            correct += 1
+        if verbose and decision.query_type != item["label"]:
+            print(f"  miss: [{item['label']} -> {decision.query_type} via {decision.method}] {item['question']}")
+    return {
+        "routed": routed,
+        "coverage": routed / len(dataset),
+        "accuracy": correct / routed if routed else 1.0,
+        "compound_leaked": leaked,
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+    }
+
+
+def evaluate_llm(dataset: list[dict]) -> dict:
+    """Accuracy and latency of the LLM decomposer on single questions"""
+    from app.Agent.query_decomposer import QueryDecomposer
+
+    decomposer = QueryDecomposer()
+    correct = singles = 0
+    latencies = []
+    for item in dataset:
+        state = AgentState(messages=[HumanMessage(content=item["question"])])
+        started = time.perf_counter()
+        sub_queries = decomposer.decompose(state)["sub_queries"]
+        latencies.append(time.perf_counter() - started)
+        if item["label"] == "compound":
+            continue
+        singles += 1
+        correct += len(sub_queries) == 1 and sub_queries[0].query_type == item["label"]
+    return {
+        "accuracy": correct / singles if singles else 1.0,
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default="./data/router_eval.jsonl")
+    parser.add_argument("--embeddings", action="store_true", help="enable the nearest-centroid classifier")
+    parser.add_argument("--margins", type=float, nargs="+", default=[0.08])
+    parser.add_argument("--llm", action="store_true", help="also time the LLM decomposer")
+    parser.add_argument("--verbose", action="store_true", help="print every misrouted question")
+    args = parser.parse_args()
+
+    dataset = load_dataset(args.dataset)
+    labels = {label: sum(item["label"] == label for item in dataset) for label in sorted({i["label"] for i in dataset})}
+    print(f"{len(dataset)} labelled messages: " + ", ".join(f"{n} {label}" for label, n in labels.items()))
+
+    embedding_factory = None
+    if args.embeddings:
+        from app.Chromadb.embedding_backends import get_embedding_function
+
+        embedding = get_embedding_function()
+        embedding_factory = lambda: embedding
+
+    print(f"{'margin':>8}{'routed':>8}{'coverage':>10}{'accuracy':>10}{'leaked':>8}{'p50 ms':>9}{'p95 ms':>9}")
+    for margin in args.margins:
+        router = FastRouter(embedding_factory=embedding_factory, min_margin=margin)
+        if embedding_factory is not None:
+            # Centroids are built once per router; keep that out of the latency figures
+            router.classify("warm up")
+        result = evaluate(router, dataset, args.verbose)
+        print(
+            f"{margin:>8.2f}{result['routed']:>8}{result['coverage']:>10.1%}{result['accuracy']:>10.1%}"
+            f"{result['compound_leaked']:>8}{result['p50_ms']:>9.3f}{result['p95_ms']:>9.3f}"
+        )
+
+    if args.llm:
+        result = evaluate_llm(dataset)
+        print(
+            f"LLM decomposer: accuracy {result['accuracy']:.1%} on single questions, "
+            f"p50 {result['p50_ms']:.0f} ms, p95 {result['p95_ms']:.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
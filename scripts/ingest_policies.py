@@ -0,0 +1,192 @@
+"""
+Policy ingestion CLI
+
+Commands:
+    rebuild   Re-embed every document into a fresh collection
+    sync      Apply only new, changed and deleted documents (incremental)
+    diff      Show what sync would do, without touching the index
+    watch     Poll the documents folder and sync whenever it changes
+    gc        Drop replaced collection versions past their grace period
+
+Every sync builds a new collection version and switches the active
+pointer once it is complete; the API picks it up on its next query, so
+any command can run next to a serving instance.
+
+Usage:
+    python -m scripts.ingest_policies sync
+    python -m scripts.ingest_policies diff --docs-folder ./data/hr_docs
+    python -m scripts.ingest_policies watch --interval 10
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+
+from app.core.config import settings
+from app.Chromadb.active_collection import sync_lock
+from app.Chromadb.embed_documents import plan_sync, sync_vector_store, collect_retired_collections
+
+logger = logging.getLogger("ingest_policies")
+
+
+def print_plan(plan) -> None:
+    if plan is None:
+        print("No supported documents found.")
+        return
+    summary = plan.summary()
+    print(f"Embedding model: {summary['embedding_model']}")
+    print(f"Active: {summary['active_collection']} -> next build: {summary['target_collection']}")
+    if summary["full_rebuild"]:
+        print("Full rebuild (no manifest yet, embedding model changed, or requested)")
+    for label in ("added", "changed", "removed"):
+        names = summary[label]
+        print(f"{label.capitalize():>9}: {len(names)}")
+        for name in names:
+            print(f"           {name}")
+    print(f"Unchanged: {summary['unchanged']}")
+
+
+def print_report(report: dict | None) -> None:
+    if report is None:
+        print("No supported documents found.")
+        return
+    print(
+        f"Files: {len(report['added'])} added, {len(report['changed'])} changed, "
+        f"{len(report['removed'])} removed, {report['unchanged']} unchanged"
+    )
+    if "index_version" not in report:
+        print(f"Index already up to date on '{report['active_collection']}' ({report['seconds']:.2f}s)")
+        return
+
+    print(
+        f"Chunks: {report['embedded_chunks']} embedded, {report['unchanged_chunks']} unchanged, "
+        f"{report['deleted_chunks']} deleted, {report['chunk_count']} in collection"
+    )
+    dedup = report.get("dedup")
+    if dedup and dedup["collapsed_chunks"]:
+        print(
+            f"Dedup: {dedup['collapsed_chunks']} near-duplicate chunks collapsed, "
+            f"~{dedup['embedding_tokens']} embedding tokens and ~{dedup['index_bytes'] / 1024:.0f} KiB saved"
+        )
+    print(f"{'stage':<10}{'in':>8}{'out':>8}{'busy s':>9}{'items/s':>10}{'wait in s':>11}{'wait out s':>12}")
+    for row in report["stages"]:
+        rate = f"{row['items_per_s']:.1f}" if row["items_per_s"] is not None else "-"
+        print(
+            f"{row['stage']:<10}{row['items_in']:>8}{row['items_out']:>8}{row['busy_s']:>9.2f}"
+            f"{rate:>10}{row['input_wait_s']:>11.2f}{row['output_wait_s']:>12.2f}"
+        )
+    embedding = report["embedding"]
+    print(
+        f"Embedding: {embedding['requests']} requests, {embedding['retries']} retries "
+        f"({embedding['throttled']} throttled), {embedding['resumed']} resumed from checkpoint"
+    )
+    if report.get("failed"):
+        print(f"Failed to load (kept their last indexed version): {', '.join(report['failed'])}")
+    print(f"Activated '{report['target_collection']}' (index version {report['index_version']}) in {report['seconds']:.2f}s")
+    if report["dropped_collections"]:
+        print(f"Dropped retired collections: {', '.join(report['dropped_collections'])}")
+
+
+def pending_files(plan) -> dict:
+    """Files a sync would load or delete, each with the content hash it was seen at (None if removed)"""
+    if plan is None:
+        return {}
+    states = plan.diff.file_states
+    return {
+        **{name: states[name]["hash"] for name in plan.diff.to_load},
+        **{name: None for name in plan.diff.removed},
+    }
+
+
+def watch(args, sync_kwargs: dict) -> None:
+    """
+    Poll the folder; sync once a change has stayed put for `settle` seconds
+
+    Files still pending after a sync (they failed to load, or produced no
+    chunks) are remembered by content hash and not retried until they
+    change, so one corrupt PDF does not build a new collection every poll.
+    """
+    print(f"Watching {args.docs_folder} every {args.interval:.0f}s (Ctrl+C to stop)")
+    stuck: dict = {}
+    while True:
+        try:
+            plan = plan_sync(args.docs_folder, args.persist_directory, args.collection)
+            pending = pending_files(plan)
+            if pending.items() - stuck.items():
+                # Let copies in progress finish before indexing half a file
+                time.sleep(args.settle)
+                settled = plan_sync(args.docs_folder, args.persist_directory, args.collection)
+                if pending_files(settled) == pending:
+                    print(time.strftime("[%H:%M:%S] ") + "Change detected, syncing")
+                    emit(sync_vector_store(**sync_kwargs), args.json)
+                    after = plan_sync(args.docs_folder, args.persist_directory, args.collection)
+                    # Still pending at the same content: this sync could not index them
+                    stuck = dict(pending_files(after).items() & pending.items())
+                    if stuck:
+                        print(f"Waiting for these files to change before retrying: {', '.join(sorted(stuck))}")
+                    continue
+            time.sleep(args.interval)
+        except KeyboardInterrupt:
+            print("Stopped watching")
+            return
+        except Exception as e:
+            # Keep watching; the next change (or poll) retries
+            logger.exception(f"Sync failed: {e}")
+            time.sleep(args.interval)
+
+
+def emit(report: dict | None, as_json: bool) -> None:
+    if as_json:
+        print(json.dumps(report, indent=2, default=str))
+    else:
+        print_report(report)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["rebuild", "sync", "diff", "watch", "gc"])
+    parser.add_argument("--docs-folder", default="./data/hr_docs")
+    parser.add_argument("--persist-directory", default=settings.CHROMA_PERSIST_DIRECTORY)
+    parser.add_argument("--collection", default=settings.CHROMA_COLLECTION_NAME)
+    parser.add_argument("--chunk-size", type=int, default=800)
+    parser.add_argument("--chunk-overlap", type=int, default=150)
+    parser.add_argument("--interval", type=float, default=5.0, help="watch: seconds between polls")
+    parser.add_argument("--settle", type=float, default=2.0, help="watch: seconds a change must stay put")
+    parser.add_argument("--grace", type=float, default=None, help="gc: seconds a replaced version is kept")
+    parser.add_argument("--json", action="store_true", help="print the run report as JSON")
+    args = parser.parse_args()
+
+    if args.command == "gc":
+        with sync_lock(args.persist_directory, args.collection):
+            dropped = collect_retired_collections(args.persist_directory, args.collection, args.grace)
+        print(f"Dropped {len(dropped)} retired collections" + (f": {', '.join(dropped)}" if dropped else ""))
+        return 0
+
+    if args.command == "diff":
+        plan = plan_sync(args.docs_folder, args.persist_directory, args.collection)
+        if args.json:
+            print(json.dumps(plan.summary() if plan else None, indent=2))
+        else:
+            print_plan(plan)
+        return 0
+
+    sync_kwargs = {
+        "docs_folder": args.docs_folder,
+        "persist_directory": args.persist_directory,
+        "collection_name": args.collection,
+        "chunk_size": args.chunk_size,
+        "chunk_overlap": args.chunk_overlap,
+    }
+    if args.command == "watch":
+        watch(args, sync_kwargs)
+        return 0
+
+    report = sync_vector_store(**sync_kwargs, full_rebuild=args.command == "rebuild")
+    emit(report, args.json)
+    return 0 if report is not None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
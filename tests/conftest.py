@@ -0,0 +1,18 @@
+"""
+Shared test setup
+
+Settings are read when app.core.config is first imported, so the required
+variables are set here, before any test module imports the app.
+"""
+
+import os
+
+for name, value in {
+    "SQLALCHEMY_DATABASE_URI": "sqlite://",
+    "SECRET_KEY": "test",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+    "GROQ_API_KEY": "test",
+    "ANONYMIZED_TELEMETRY": "False",
+}.items():
+    os.environ.setdefault(name, value)
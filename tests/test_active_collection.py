@@ -0,0 +1,74 @@
+"""
+Blue/green pointer: activation, retirement and the grace period
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from app.Chromadb import active_collection
+from app.Chromadb.active_collection import (
+    activate_collection,
+    active_collection_name,
+    active_pointer_stamp,
+    expired_collections,
+    forget_retired,
+    next_collection_number,
+    read_active_pointer,
+    versioned_collection_name,
+)
+
+
+def test_logical_name_serves_until_the_first_activation(tmp_path):
+    persist_directory = str(tmp_path)
+
+    assert read_active_pointer(persist_directory, "hr_documents") == {}
+    assert active_collection_name(persist_directory, "hr_documents") == "hr_documents"
+    assert active_pointer_stamp(persist_directory, "hr_documents") is None
+    assert next_collection_number({}) == 1
+
+
+def test_activation_switches_the_pointer_and_retires_the_previous_collection(tmp_path):
+    persist_directory = str(tmp_path)
+    v1 = versioned_collection_name("hr_documents", 1)
+    v2 = versioned_collection_name("hr_documents", 2)
+
+    activate_collection(persist_directory, "hr_documents", v1, 1, index_version="a")
+    pointer = activate_collection(persist_directory, "hr_documents", v2, 2, index_version="b")
+
+    assert read_active_pointer(persist_directory, "hr_documents") == pointer
+    assert pointer["collection"] == "hr_documents_v2" and pointer["index_version"] == "b"
+    assert active_collection_name(persist_directory, "hr_documents") == v2
+    assert next_collection_number(pointer) == 3
+    # The unversioned collection and v1 both wait out the grace period
+    assert expired_collections(persist_directory, "hr_documents", grace_seconds=0) == ["hr_documents", v1]
+    assert expired_collections(persist_directory, "hr_documents", grace_seconds=3600) == []
+
+
+def test_grace_period_runs_from_retirement(tmp_path, monkeypatch):
+    persist_directory = str(tmp_path)
+    activate_collection(persist_directory, "hr_documents", "hr_documents_v1", 1)
+    activate_collection(persist_directory, "hr_documents", "hr_documents_v2", 2)
+
+    later = datetime.now(timezone.utc) + timedelta(seconds=601)
+
+    class _Clock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return later
+
+    monkeypatch.setattr(active_collection, "datetime", _Clock)
+    assert expired_collections(persist_directory, "hr_documents", grace_seconds=600) == [
+        "hr_documents", "hr_documents_v1"
+    ]
+
+
+def test_reactivated_collection_is_never_expired(tmp_path):
+    persist_directory = str(tmp_path)
+    activate_collection(persist_directory, "hr_documents", "hr_documents_v1", 1)
+    activate_collection(persist_directory, "hr_documents", "hr_documents_v2", 2)
+    activate_collection(persist_directory, "hr_documents", "hr_documents_v1", 3)
+
+    assert expired_collections(persist_directory, "hr_documents", grace_seconds=0) == [
+        "hr_documents", "hr_documents_v2"
+    ]
+    forget_retired(persist_directory, "hr_documents", ["hr_documents"])
+    assert expired_collections(persist_directory, "hr_documents", grace_seconds=0) == ["hr_documents_v2"]
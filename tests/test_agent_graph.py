@@ -0,0 +1,221 @@
+"""
+The compiled agent graph with a scripted decomposer and fake handlers
+
+The decomposer's LLM returns a fixed decomposition and the handlers answer
+from the question text, so the graph runs without any provider.
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("pydantic_settings")
+pytest.importorskip("langgraph")
+
+from langchain_core.messages import HumanMessage  # noqa: E402
+from langchain_core.runnables import RunnableLambda  # noqa: E402
+
+from app.Agent import hr_agent_graph, query_decomposer, stream_agent_answer  # noqa: E402
+from app.Agent.fast_router import FastRouter  # noqa: E402
+from app.Agent.handlers import handler_factory  # noqa: E402
+from app.Agent.handlers.base_handler import BaseQueryHandler  # noqa: E402
+from app.Agent.handlers.policy_handler import PolicyQueryHandler  # noqa: E402
+from app.Agent.models import AgentState, QueryDecomposition, SubQuery, merge_answers  # noqa: E402
+from app.Agent.orchestrator import ordered_results, plan_tasks  # noqa: E402
+from app.Agent.query_decomposer import QueryDecomposer  # noqa: E402
+from app.core.cache import LRUCache  # noqa: E402
+
+
+class ScriptedLLM:
+    """Stands in for the chat model; its structured output is the given decomposition"""
+
+    def __init__(self, sub_queries: list[SubQuery]):
+        self.decomposition = QueryDecomposition(sub_queries=sub_queries, is_multiple=len(sub_queries) > 1)
+        self.calls = 0
+
+    def _decompose(self, messages):
+        self.calls += 1
+        return self.decomposition
+
+    def with_structured_output(self, schema):
+        return RunnableLambda(self._decompose)
+
+
+class FakePolicyHandler(PolicyQueryHandler):
+    def __init__(self):
+        self.batches: list[list[str]] = []
+        self.streamed: list[str] = []
+
+    async def ahandle_batch(self, questions: list[str]) -> list[str]:
+        self.batches.append(questions)
+        return [f"policy: {q}" for q in questions]
+
+    async def ahandle(self, question: str, user_id: int | None = None) -> str:
+        return f"policy: {question}"
+
+    async def astream(self, question: str, user_id: int | None = None):
+        self.streamed.append(question)
+        for word in f"policy: {question}".split(" "):
+            await asyncio.sleep(0)
+            yield word + " "
+
+
+class FakeGeneralHandler(BaseQueryHandler):
+    # Seconds ahandle waits, so a branch can finish after the others
+    delay = 0.0
+
+    async def ahandle(self, question: str, user_id: int | None = None) -> str:
+        await asyncio.sleep(self.delay)
+        return self.handle(question, user_id)
+
+    def can_handle(self, query_type: str) -> bool:
+        return query_type == "general"
+
+    def handle(self, question: str, user_id: int | None = None) -> str:
+        return f"general: {question}"
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    handlers = {"policy": FakePolicyHandler(), "general": FakeGeneralHandler()}
+    monkeypatch.setattr(handler_factory, "get_handler", lambda query_type: handlers[query_type])
+    monkeypatch.setattr(query_decomposer, "fast_router", None)
+    monkeypatch.setattr(query_decomposer, "decomposition_cache", None)
+
+    def script(*sub_queries: tuple[str, str]) -> ScriptedLLM:
+        llm = ScriptedLLM([SubQuery(question=q, query_type=t) for t, q in sub_queries])
+        monkeypatch.setattr(query_decomposer, "llm", llm)
+        return llm
+
+    return script, handlers
+
+
+def sub_queries(*pairs: tuple[str, str]) -> list[SubQuery]:
+    return [SubQuery(question=q, query_type=t) for t, q in pairs]
+
+
+def test_merge_answers_combines_branch_updates():
+    assert merge_answers(None, {2: "b"}) == {2: "b"}
+    assert merge_answers({0: "a"}, {2: "b"}) == {0: "a", 2: "b"}
+    assert merge_answers({0: "a"}, None) == {0: "a"}
+
+
+def test_plan_tasks_batches_policy_questions_and_drops_repeats(agent):
+    queries = sub_queries(
+        ("general", "Hi there"),
+        ("policy", "Leave policy?"),
+        ("policy", "Travel policy?"),
+        ("policy", "leave  POLICY?"),
+        ("general", "Who are you?"),
+    )
+
+    assert plan_tasks(queries) == [[1, 2], [0], [4]]
+    # A repeated question is answered once, in the place it was first asked
+    assert ordered_results(queries, {0: "hi", 1: "leave", 2: "travel", 4: "me"}) == ["hi", "leave", "travel", "me"]
+
+
+def test_branches_finishing_out_of_order_keep_the_question_order(agent):
+    script, handlers = agent
+    handlers["general"].delay = 0.05
+    script(("general", "Who are you?"), ("policy", "Leave policy?"), ("policy", "Travel policy?"))
+
+    result = asyncio.run(hr_agent_graph.ainvoke({"messages": [{"role": "user", "content": "..."}], "user_id": 7}))
+
+    assert handlers["policy"].batches == [["Leave policy?", "Travel policy?"]]
+    assert result["answers"] == {0: "general: Who are you?", 1: "policy: Leave policy?", 2: "policy: Travel policy?"}
+    assert result["query_results"] == ["general: Who are you?", "policy: Leave policy?", "policy: Travel policy?"]
+    assert result["query_type"] == "compound"
+
+
+def test_routed_message_skips_the_decomposition_llm(agent, monkeypatch):
+    script, handlers = agent
+    llm = script(("policy", "unused"))
+    monkeypatch.setattr(query_decomposer, "fast_router", FastRouter(embedding_factory=None))
+
+    routed = asyncio.run(hr_agent_graph.ainvoke({"messages": [{"role": "user", "content": "What is the dress code?"}]}))
+    compound = asyncio.run(hr_agent_graph.ainvoke({"messages": [{"role": "user", "content": "Hi? Dress code?"}]}))
+
+    assert routed["query_results"] == ["policy: What is the dress code?"]
+    assert compound["query_results"] == ["policy: unused"]
+    assert llm.calls == 1
+
+
+def message(content: str) -> AgentState:
+    return AgentState(messages=[HumanMessage(content=content)])
+
+
+def test_decomposition_is_cached_by_normalized_message():
+    llm = ScriptedLLM([SubQuery(question="What is the leave policy?", query_type="policy")])
+    decomposer = QueryDecomposer(llm, cache=LRUCache(maxsize=8))
+
+    first = decomposer.decompose(message("What is the leave policy?"))
+    second = asyncio.run(decomposer.adecompose(message("  what is the LEAVE policy ")))
+
+    assert llm.calls == 1
+    assert second["sub_queries"] == first["sub_queries"]
+    decomposer.decompose(message("What is the travel policy?"))
+    assert llm.calls == 2
+
+
+def test_cached_decomposition_is_not_shared_between_requests():
+    llm = ScriptedLLM([SubQuery(question="What is the leave policy?", query_type="policy")])
+    decomposer = QueryDecomposer(llm, cache=LRUCache(maxsize=8))
+
+    decomposer.decompose(message("What is the leave policy?"))["sub_queries"][0].question = "changed"
+    again = decomposer.decompose(message("What is the leave policy?"))
+
+    assert again["sub_queries"][0].question == "What is the leave policy?"
+
+
+def test_decomposition_cache_is_keyed_by_model():
+    cache = LRUCache(maxsize=8)
+    first, second = ScriptedLLM([SubQuery(question="Hi", query_type="general")]), ScriptedLLM([])
+    first.model_name, second.model_name = "model-a", "model-b"
+
+    QueryDecomposer(first, cache=cache).decompose(message("Hi"))
+    QueryDecomposer(second, cache=cache).decompose(message("Hi"))
+
+    assert (first.calls, second.calls) == (1, 1)
+
+
+async def collect(question: str) -> list[dict]:
+    return [event async for event in stream_agent_answer(question, user_id=7)]
+
+
+def test_streamed_request_runs_the_graph_end_to_end(agent):
+    script, handlers = agent
+    script(
+        ("policy", "What is the leave policy?"),
+        ("general", "Who are you?"),
+        ("policy", "what is the leave  policy?")
+    )
+
+    events = asyncio.run(collect("What is the leave policy? Who are you? what is the leave policy?"))
+
+    kinds = [event["event"] for event in events]
+    assert kinds[0] == "decomposed" and kinds[-1] == "done"
+    assert len(events[0]["data"]["sub_queries"]) == 3
+
+    tokens = {}
+    for event in events:
+        if event["event"] == "token":
+            tokens.setdefault(event["data"]["index"], []).append(event["data"]["text"])
+    assert "".join(tokens[0]) == "policy: What is the leave policy? "
+    assert "".join(tokens[1]) == "general: Who are you?"
+    # The repeated question is streamed once and reported for both indexes
+    assert 2 not in tokens
+    assert handlers["policy"].streamed == ["What is the leave policy?"]
+    done = {event["data"]["index"]: event["data"]["answer"] for event in events if event["event"] == "sub_query_done"}
+    assert done[2] == done[0] == "policy: What is the leave policy? "
+
+    stages = [event["data"]["stage"] for event in events if event["event"] == "progress" and event["data"]["index"] == 0]
+    assert stages == ["retrieving", "answering"]
+
+    final = events[-1]["data"]
+    assert final["query_type"] == "compound"
+    assert final["is_compound"] is True
+    assert final["num_questions"] == 3
+    assert final["answer"] == (
+        "Here are the answers to your questions:\n\n"
+        "policy: What is the leave policy? \n\n---\n\ngeneral: Who are you?"
+    )
@@ -0,0 +1,157 @@
+"""
+Batched policy retrieval: one embeddings request and one multi-query search per batch
+
+The runtime is given a hand-built snapshot (keyword embeddings, an
+in-process vector index and a chain that echoes its context), so no
+provider or Chroma collection is involved.
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("pydantic_settings")
+pytest.importorskip("langchain_chroma")
+
+from langchain_core.embeddings import Embeddings  # noqa: E402
+from langchain_core.runnables import RunnableLambda  # noqa: E402
+
+from app.Chromadb.lexical_index import BM25Index  # noqa: E402
+from app.services.answer_cache import SemanticAnswerCache  # noqa: E402
+from app.services.embedding_cache import CachedQueryEmbeddings, QueryEmbeddingCache  # noqa: E402
+from app.services.retriever import RetrieverRuntime, _RetrieverState  # noqa: E402
+from app.services.vector_index import InProcessVectorIndex  # noqa: E402
+
+VOCABULARY = ["leave", "travel", "expenses"]
+
+POLICIES = {
+    "leave": "Annual leave is 25 days per year.",
+    "travel": "Book travel through the company portal.",
+    "expenses": "Submit expenses within 30 days.",
+}
+
+
+class KeywordEmbeddings(Embeddings):
+    """One dimension per vocabulary word; records every provider request"""
+
+    def __init__(self):
+        self.requests: list[list[str]] = []
+
+    @staticmethod
+    def vector(text: str) -> list[float]:
+        return [float(text.lower().count(word)) for word in VOCABULARY] + [0.01]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.requests.append(list(texts))
+        return [self.vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embed_documents(texts)
+
+
+class CountingIndex(InProcessVectorIndex):
+    def search_many(self, vectors, k: int = 3):
+        self.searches.append(len(vectors))
+        return super().search_many(vectors, k=k)
+
+
+@pytest.fixture
+def runtime(monkeypatch):
+    provider = KeywordEmbeddings()
+    index = CountingIndex(
+        list(POLICIES), list(POLICIES.values()), [{"source": f"{name}.pdf"} for name in POLICIES],
+        [KeywordEmbeddings.vector(text) for text in POLICIES.values()]
+    )
+    index.searches = []
+
+    lexical = BM25Index()
+    for name, text in POLICIES.items():
+        lexical.add(name, text, {"source": f"{name}.pdf"})
+    generated = []
+
+    def answer(inputs: dict) -> str:
+        generated.append(inputs["question"])
+        return f"{inputs['question']} -> {inputs['context'].splitlines()[0]}"
+
+    runtime = RetrieverRuntime(search_backend="memory")
+    runtime.answer_cache = SemanticAnswerCache(threshold=0.95)
+    runtime._state = _RetrieverState(
+        embedding=CachedQueryEmbeddings(provider, QueryEmbeddingCache("keywords")),
+        vectorstore=None,
+        llm=None,
+        chain=RunnableLambda(answer),
+        index_version="v1",
+        index_stamp=("test",),
+        collection="hr_documents",
+        memory_index=index,
+        lexical_index=lexical
+    )
+    runtime.generated = generated
+    monkeypatch.setattr(runtime, "_index_stamp", lambda: ("test",))
+    return runtime, provider, index
+
+
+def test_batch_embeds_and_searches_once_and_answers_in_order(runtime):
+    runtime, provider, index = runtime
+
+    results = runtime.query_batch(["How much leave?", "Travel booking?", "how much leave"])
+
+    assert provider.requests == [["How much leave?", "Travel booking?", "how much leave"]]
+    assert index.searches == [3]
+    assert [result["answer"] for result in results] == [
+        f"How much leave? -> {POLICIES['leave']}",
+        f"Travel booking? -> {POLICIES['travel']}",
+        f"how much leave -> {POLICIES['leave']}",
+    ]
+    assert not any(result["cached"] for result in results)
+
+
+def test_repeat_question_in_a_batch_is_answered_once(runtime):
+    runtime, provider, index = runtime
+
+    results = runtime.query_batch(["Travel booking?", "Travel booking?"])
+
+    assert provider.requests == [["Travel booking?"]]
+    assert index.searches == [1]
+    assert results[0] == results[1]
+
+
+def test_later_batch_reuses_cached_vectors_and_answers(runtime):
+    runtime, provider, index = runtime
+    runtime.query_batch(["How much leave?"])
+
+    results = asyncio.run(runtime.aquery_batch(["How much leave?", "Expenses deadline?"]))
+
+    assert provider.requests == [["How much leave?"], ["Expenses deadline?"]]
+    assert index.searches == [1, 1]
+    assert results[0] == {"answer": f"How much leave? -> {POLICIES['leave']}", "cached": True}
+    assert results[1] == {"answer": f"Expenses deadline? -> {POLICIES['expenses']}", "cached": False}
+
+
+def test_repeated_decisive_keyword_question_is_answered_from_the_cache(runtime):
+    runtime, provider, _ = runtime
+    runtime.top_k = 1
+
+    results = [runtime.query("Annual leave days") for _ in range(2)]
+    results.append(asyncio.run(runtime.aquery("annual leave days?")))
+
+    # BM25 alone is decisive, so nothing is embedded; the repeats reuse the answer
+    assert provider.requests == []
+    assert runtime.generated == ["Annual leave days"]
+    assert [result["cached"] for result in results] == [False, True, True]
+    assert runtime.answer_cache.stats()["size"] == 1
+
+
+def test_hybrid_context_drops_candidates_neither_list_rates_close_to_its_best(runtime):
+    runtime, provider, _ = runtime
+    runtime._state.chain = RunnableLambda(lambda inputs: inputs["context"])
+
+    context = runtime.query("How much leave?")["answer"]
+
+    # Dense search and BM25 both ran and were fused
+    assert provider.requests == [["How much leave?"]]
+    assert POLICIES["leave"] in context
+    assert POLICIES["travel"] not in context and POLICIES["expenses"] not in context
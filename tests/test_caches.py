@@ -0,0 +1,188 @@
+"""
+In-process caches: the LRU, the query embedding cache and the semantic answer cache
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.embeddings import Embeddings  # noqa: E402
+
+from app.core.cache import LRUCache  # noqa: E402
+from app.services.answer_cache import SemanticAnswerCache  # noqa: E402
+from app.services.embedding_cache import (  # noqa: E402
+    CachedQueryEmbeddings,
+    QueryEmbeddingCache,
+    normalize_query,
+)
+
+
+class CountingEmbeddings(Embeddings):
+    """Deterministic embeddings that record every provider call"""
+
+    def __init__(self):
+        self.calls: list[list[str]] = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls.append(list(texts))
+        return [[float(len(text)), 1.0, 0.5] for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+def test_lru_evicts_the_least_recently_used_entry():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats() == {"size": 2, "maxsize": 2, "hits": 3, "misses": 1, "hit_rate": 0.75}
+
+
+def test_lru_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.core.cache.time.monotonic", lambda: now[0])
+    cache = LRUCache(maxsize=4, ttl=10)
+    cache.set("a", 1)
+
+    now[0] += 9
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_normalize_query_ignores_case_spacing_and_trailing_punctuation():
+    assert normalize_query("  What is the  LEAVE policy?? ") == "what is the leave policy"
+    assert normalize_query("what is the leave policy") == "what is the leave policy"
+
+
+def test_repeat_query_is_served_without_a_provider_call():
+    provider = CountingEmbeddings()
+    embeddings = CachedQueryEmbeddings(provider, QueryEmbeddingCache("model-a"))
+
+    first = embeddings.embed_query("How many sick days do I get?")
+    second = embeddings.embed_query("how many sick days do i get")
+
+    assert second == first
+    assert provider.calls == [["How many sick days do I get?"]]
+    assert embeddings.cache.stats()["memory_hits"] == 1
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    path = str(tmp_path / "cache" / "query_embeddings.sqlite3")
+    cache = QueryEmbeddingCache("model-a", path=path)
+    cache.set("What is the travel policy?", [0.25, -1.5, 3.0])
+    cache.close()
+
+    reopened = QueryEmbeddingCache("model-a", path=path)
+    other_model = QueryEmbeddingCache("model-b", path=path)
+
+    assert reopened.get("what is the travel policy") == [0.25, -1.5, 3.0]
+    assert reopened.stats()["disk_hits"] == 1
+    assert other_model.get("What is the travel policy?") is None
+    reopened.close()
+    other_model.close()
+
+
+def test_async_disk_reads_and_writes_run_off_the_event_loop(tmp_path):
+    path = str(tmp_path / "query_embeddings.sqlite3")
+    provider = CountingEmbeddings()
+    disk_threads = []
+
+    def track(cache):
+        for name in ("_disk_get", "_disk_set"):
+            method = getattr(cache, name)
+
+            def tracked(*args, _method=method, _name=name):
+                disk_threads.append((_name, threading.get_ident()))
+                return _method(*args)
+            setattr(cache, name, tracked)
+        return cache
+
+    async def scenario():
+        loop_thread = threading.get_ident()
+        first = CachedQueryEmbeddings(provider, track(QueryEmbeddingCache("model-a", path=path)))
+        vector = await first.aembed_query("What is the travel policy?")
+        first.cache.close()
+
+        restarted = CachedQueryEmbeddings(provider, track(QueryEmbeddingCache("model-a", path=path)))
+        from_disk = await restarted.aembed_query("what is the travel policy")
+        calls = len(disk_threads)
+        from_memory = await restarted.alookup("What is the travel policy")
+        restarted.cache.close()
+        return loop_thread, vector, from_disk, from_memory, calls
+
+    loop_thread, vector, from_disk, from_memory, calls = asyncio.run(scenario())
+
+    assert from_disk == vector and from_memory == vector
+    assert provider.calls == [["What is the travel policy?"]]
+    # Miss and write on the first cache, then one read on the restarted one
+    assert [name for name, _ in disk_threads] == ["_disk_get", "_disk_set", "_disk_get"]
+    assert all(thread != loop_thread for _, thread in disk_threads)
+    # The memory hit never reached the disk tier
+    assert len(disk_threads) == calls
+
+
+def test_batched_queries_are_embedded_in_one_request():
+    provider = CountingEmbeddings()
+    embeddings = CachedQueryEmbeddings(provider, QueryEmbeddingCache("model-a"))
+
+    vectors = embeddings.embed_and_store_many(["leave policy", "travel policy"])
+
+    assert provider.calls == [["leave policy", "travel policy"]]
+    assert embeddings.lookup("Leave policy?") == vectors[0]
+    assert embeddings.lookup("travel policy") == vectors[1]
+
+
+def test_similar_question_gets_the_cached_answer():
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.add("How many days of annual leave?", [1.0, 0.0, 0.1], "25 days.", "v1")
+
+    assert cache.lookup([0.99, 0.02, 0.1], "v1") == "25 days."
+    assert cache.lookup([0.0, 1.0, 0.0], "v1") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_answers_from_an_older_index_version_are_not_served():
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.add("How many days of annual leave?", [1.0, 0.0], "25 days.", "v1")
+    cache.add("How many days of annual leave?", [1.0, 0.0], "28 days.", "v2")
+
+    assert cache.lookup([1.0, 0.0], "v2") == "28 days."
+    assert cache.invalidate(keep_version="v2") == 1
+    assert cache.lookup([1.0, 0.0], "v1") is None
+    assert cache.stats()["size"] == 1
+
+
+def test_answer_cache_drops_the_oldest_entry_when_full():
+    cache = SemanticAnswerCache(threshold=0.99, max_entries=2)
+    cache.add("leave", [1.0, 0.0, 0.0], "leave answer", "v1")
+    cache.add("travel", [0.0, 1.0, 0.0], "travel answer", "v1")
+    cache.add("expenses", [0.0, 0.0, 1.0], "expenses answer", "v1")
+
+    assert cache.lookup([1.0, 0.0, 0.0], "v1") is None
+    assert cache.lookup([0.0, 1.0, 0.0], "v1") == "travel answer"
+    assert cache.lookup([0.0, 0.0, 1.0], "v1") == "expenses answer"
+
+
+def test_answer_without_a_vector_is_served_on_an_exact_repeat():
+    cache = SemanticAnswerCache(threshold=0.95, max_entries=2)
+    cache.add("NPAX emergency leave?", None, "3 days.", "v1")
+
+    assert cache.lookup(None, "v1", question="npax  emergency LEAVE") == "3 days."
+    assert cache.lookup(None, "v2", question="NPAX emergency leave?") is None
+    assert cache.lookup(None, "v1", question="NPAX parental leave?") is None
+
+    cache.add("leave", [1.0, 0.0], "leave answer", "v1")
+    cache.add("travel", [0.0, 1.0], "travel answer", "v1")
+    assert cache.lookup(None, "v1", question="NPAX emergency leave?") is None
+    assert cache.lookup([1.0, 0.0], "v1") == "leave answer"
@@ -0,0 +1,79 @@
+"""
+MinHash/LSH near-duplicate detection
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app.Chromadb.dedup import MinHashLSH, _lsh_params, join_sources  # noqa: E402
+
+
+def clause(edits: dict[int, str] | None = None, prefix: str = "clause") -> str:
+    words = [f"{prefix}{i}" for i in range(150)]
+    for index, word in (edits or {}).items():
+        words[index] = word
+    return " ".join(words)
+
+
+@pytest.fixture
+def lsh():
+    index = MinHashLSH(threshold=0.9, num_perm=128)
+    index.add("original", index.signature(clause()))
+    index.add("other", index.signature(clause(prefix="travel")))
+    return index
+
+
+def test_banding_crosses_half_near_the_threshold():
+    bands, rows = _lsh_params(0.9, 128)
+
+    assert bands * rows == 128
+    assert (1 / bands) ** (1 / rows) == pytest.approx(0.9, abs=0.05)
+
+
+def test_signature_is_stable_across_instances():
+    text = clause()
+
+    assert np.array_equal(MinHashLSH().signature(text), MinHashLSH().signature(text))
+
+
+def test_one_word_edit_is_a_near_duplicate(lsh):
+    # 5 of 146 shingles change: true Jaccard is about 0.93
+    chunk_id, score = lsh.query(lsh.signature(clause({75: "amended"})))
+
+    assert chunk_id == "original"
+    assert score >= 0.9
+
+
+def test_rewritten_text_is_not_a_duplicate(lsh):
+    edits = {i: f"changed{i}" for i in range(0, 150, 10)}
+
+    chunk_id, score = lsh.query(lsh.signature(clause(edits)))
+
+    assert chunk_id is None
+    assert score < 0.9
+
+
+def test_removed_chunk_is_no_longer_matched(lsh):
+    lsh.remove("original")
+
+    assert lsh.query(lsh.signature(clause()))[0] is None
+    assert len(lsh) == 1
+    assert not any("original" in ids for bucket in lsh._buckets for ids in bucket.values())
+
+
+def test_index_round_trips_and_ignores_other_parameters(tmp_path, lsh):
+    path = str(tmp_path / "hr_documents.minhash.npz")
+    lsh.save(path)
+
+    loaded = MinHashLSH.load(path, threshold=0.9, num_perm=128)
+    other = MinHashLSH.load(path, threshold=0.9, num_perm=64)
+    missing = MinHashLSH.load(str(tmp_path / "none.npz"), threshold=0.9, num_perm=128)
+
+    assert len(loaded) == 2
+    assert loaded.query(loaded.signature(clause({75: "amended"})))[0] == "original"
+    assert len(other) == 0 and len(missing) == 0
+
+
+def test_join_sources_is_sorted_and_unique():
+    assert join_sources(["b.txt", "a.txt", "b.txt"]) == "a.txt|b.txt"
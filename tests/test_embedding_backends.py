@@ -0,0 +1,49 @@
+"""
+Embedding backends: shared local models and the model check on load
+"""
+
+import pytest
+
+pytest.importorskip("pydantic_settings")
+pytest.importorskip("langchain_chroma")
+
+from app.Chromadb.embedding_backends import (  # noqa: E402
+    EmbeddingModelMismatch,
+    check_embedding_model,
+    get_embedding_function,
+)
+from app.Chromadb.index_metadata import write_index_metadata  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.services.retriever import RetrieverRuntime  # noqa: E402
+
+
+@pytest.fixture
+def local_backend(monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_BACKEND", "local")
+    monkeypatch.setattr(settings, "LOCAL_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+    monkeypatch.setattr(settings, "LOCAL_EMBEDDING_BATCH_SIZE", 64)
+    monkeypatch.setattr(settings, "LOCAL_EMBEDDING_THREADS", 2)
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_ENABLED", False)
+
+
+def test_local_model_is_built_once_per_configuration(local_backend, monkeypatch):
+    first = get_embedding_function()
+
+    assert get_embedding_function() is first
+    monkeypatch.setattr(settings, "LOCAL_EMBEDDING_BATCH_SIZE", 16)
+    other = get_embedding_function()
+    assert other is not first and other.batch_size == 16
+
+
+def test_index_built_with_another_model_is_refused(tmp_path, local_backend):
+    write_index_metadata(str(tmp_path), "hr_documents", embedding_model="azure:text-embedding-3-small")
+    runtime = RetrieverRuntime(persist_directory=str(tmp_path), collection_name="hr_documents")
+
+    with pytest.raises(EmbeddingModelMismatch, match="azure:text-embedding-3-small"):
+        runtime.load()
+    assert not runtime.is_loaded
+
+
+def test_unrecorded_or_matching_model_passes():
+    check_embedding_model(None, "local:all-MiniLM-L6-v2", "hr_documents")
+    check_embedding_model("local:all-MiniLM-L6-v2", "local:all-MiniLM-L6-v2", "hr_documents")
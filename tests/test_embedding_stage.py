@@ -0,0 +1,119 @@
+"""
+Ingestion embedding stage: throttling backoff, retries and checkpoint resume
+"""
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.documents import Document  # noqa: E402
+from langchain_core.embeddings import Embeddings  # noqa: E402
+
+from app.Chromadb.embedding_stage import EmbeddingCheckpoint, EmbeddingStage  # noqa: E402
+
+
+class _Response:
+    def __init__(self, status_code: int, headers: dict | None = None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class ProviderError(Exception):
+    """Shaped like the OpenAI SDK's APIStatusError"""
+
+    def __init__(self, status_code: int, headers: dict | None = None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = _Response(status_code, headers)
+
+
+class ScriptedEmbeddings(Embeddings):
+    """Raises the queued errors first, then fails on any text in fail_on"""
+
+    def __init__(self, errors: list[Exception] | None = None, fail_on: set[str] | None = None):
+        self.errors = list(errors or [])
+        self.fail_on = fail_on or set()
+        self.requests: list[list[str]] = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.requests.append(list(texts))
+        if self.errors:
+            raise self.errors.pop(0)
+        if self.fail_on.intersection(texts):
+            raise ProviderError(400)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+def chunks(count: int) -> list[Document]:
+    return [Document(id=f"c{i}", page_content=f"chunk {i}") for i in range(count)]
+
+
+def embedded(stage: EmbeddingStage, docs: list[Document]) -> dict[str, list[float]]:
+    return {doc.id: vector for batch, vectors in stage.run(docs) for doc, vector in zip(batch, vectors)}
+
+
+def test_throttled_batch_waits_for_retry_after_and_is_retried():
+    provider = ScriptedEmbeddings(errors=[ProviderError(429, {"retry-after-ms": "20"})])
+    stage = EmbeddingStage(provider, batch_size=2, max_concurrency=2)
+
+    vectors = embedded(stage, chunks(2))
+
+    assert vectors == {"c0": [7.0, 1.0], "c1": [7.0, 1.0]}
+    assert len(provider.requests) == 2
+    assert stage.stats()["throttled"] == 1
+    assert stage.stats()["retries"] == 1
+    assert stage.stats()["requests"] == 1
+    # Halved on the 429, then a success adds capacity back
+    assert stage.stats()["concurrency_limit"] == 2.0
+
+
+def test_retry_after_header_overrides_the_exponential_backoff():
+    stage = EmbeddingStage(ScriptedEmbeddings(), max_backoff=60.0)
+
+    assert stage._backoff(ProviderError(429, {"retry-after": "3"}), attempt=5) == 3.0
+    assert stage._backoff(ProviderError(503, {"retry-after-ms": "250"}), attempt=0) == 0.25
+    assert stage._backoff(ProviderError(429, {"retry-after": "600"}), attempt=0) == 60.0
+
+
+def test_non_transient_error_is_raised_without_retrying():
+    provider = ScriptedEmbeddings(errors=[ProviderError(400)])
+    stage = EmbeddingStage(provider, batch_size=2, max_concurrency=1)
+
+    with pytest.raises(ProviderError):
+        embedded(stage, chunks(2))
+    assert len(provider.requests) == 1
+    assert stage.stats()["retries"] == 0
+
+
+def test_interrupted_run_resumes_from_the_checkpoint(tmp_path):
+    path = str(tmp_path / "hr_documents_v2.embed_checkpoint.sqlite3")
+    docs = chunks(6)
+
+    failing = ScriptedEmbeddings(fail_on={"chunk 4"})
+    with pytest.raises(ProviderError):
+        embedded(EmbeddingStage(failing, batch_size=2, max_concurrency=1, checkpoint=EmbeddingCheckpoint(path, "m")), docs)
+
+    provider = ScriptedEmbeddings()
+    stage = EmbeddingStage(provider, batch_size=2, max_concurrency=1, checkpoint=EmbeddingCheckpoint(path, "m"))
+    vectors = embedded(stage, docs)
+
+    assert provider.requests == [["chunk 4", "chunk 5"]]
+    assert sorted(vectors) == [doc.id for doc in docs]
+    assert stage.stats()["resumed"] == 4
+    assert stage.stats()["embedded"] == 2
+
+
+def test_checkpoint_from_another_model_is_cleared(tmp_path):
+    path = str(tmp_path / "checkpoint.sqlite3")
+    checkpoint = EmbeddingCheckpoint(path, "model-a")
+    checkpoint.put_many(["c0", "c1"], [[0.5, 1.0], [1.5, 2.0]])
+    assert checkpoint.get_many(["c0", "c2"]) == {"c0": [0.5, 1.0]}
+    checkpoint.close()
+
+    reopened = EmbeddingCheckpoint(path, "model-b")
+
+    assert len(reopened) == 0
+    reopened.discard()
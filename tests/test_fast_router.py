@@ -0,0 +1,139 @@
+"""
+FastRouter: keyword rules, the centroid classifier and the LLM fallback
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("pydantic_settings")
+pytest.importorskip("langgraph")
+
+from langchain_core.embeddings import Embeddings  # noqa: E402
+
+from app.Agent.fast_router import FastRouter, looks_compound  # noqa: E402
+
+VOCABULARY = ["remote", "overtime", "balance", "taken", "hello", "contact"]
+
+EXAMPLES = {
+    "policy": ["remote work rules", "overtime pay rules", "remote overtime"],
+    "personal_data": ["my balance", "days taken", "balance taken"],
+    "general": ["hello", "contact someone", "hello contact"],
+}
+
+
+class KeywordEmbeddings(Embeddings):
+    """One dimension per vocabulary word, plus a small constant"""
+
+    def __init__(self):
+        self.queries = 0
+        self.document_requests = 0
+
+    @staticmethod
+    def vector(text: str) -> list[float]:
+        return [float(text.lower().count(word)) for word in VOCABULARY] + [0.1]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.document_requests += 1
+        return [self.vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        self.queries += 1
+        return self.vector(text)
+
+
+@pytest.fixture
+def embedding():
+    return KeywordEmbeddings()
+
+
+@pytest.fixture
+def router(embedding):
+    return FastRouter(embedding_factory=lambda: embedding, min_margin=0.2, examples=EXAMPLES)
+
+
+@pytest.mark.parametrize("message, query_type", [
+    ("Hello!", "general"),
+    ("What can you do?", "general"),
+    ("How many vacation days do I have left?", "personal_data"),
+    ("Show me my requests", "personal_data"),
+    ("What is the dress code?", "policy"),
+    ("How do I apply for parental leave?", "policy"),
+])
+def test_keyword_rules_route_without_an_embedding(router, embedding, message, query_type):
+    decision = router.classify(message)
+
+    assert (decision.query_type, decision.method) == (query_type, "rule")
+    assert embedding.queries == 0
+
+
+@pytest.mark.parametrize("message", [
+    "What is the leave policy? How many days do I have left?",
+    "Tell me the travel policy and how do I claim expenses",
+    "Overtime rules; remote rules",
+])
+def test_compound_messages_go_to_the_llm(router, message):
+    assert looks_compound(router.normalize(message))
+    assert router.route(message) is None
+    assert router.classify(message).method == "compound"
+
+
+def test_rules_of_several_types_go_to_the_llm(router, embedding):
+    decision = router.classify("Show my leave policy")
+
+    assert (decision.query_type, decision.method) == (None, "uncertain")
+    assert embedding.queries == 0
+
+
+def test_nearest_centroid_routes_a_clear_message(router):
+    sub_queries = router.route("  Remote work on Fridays  ")
+
+    assert [(sq.question, sq.query_type) for sq in sub_queries] == [("Remote work on Fridays", "policy")]
+    assert router.classify("who do I contact").query_type == "general"
+
+
+def test_message_between_centroids_goes_to_the_llm(router):
+    decision = router.classify("overtime balance")
+
+    assert (decision.query_type, decision.method) == (None, "uncertain")
+    assert decision.confidence < 0.2
+
+
+def test_embedding_failure_falls_back_to_the_llm():
+    def broken():
+        raise ConnectionError("embedding provider down")
+
+    router = FastRouter(embedding_factory=broken, examples=EXAMPLES)
+
+    assert router.route("remote work") is None
+    assert asyncio.run(router.aroute("remote work")) is None
+    assert router.stats()["uncertain"] == 2
+
+
+def test_without_embeddings_only_the_rules_route():
+    router = FastRouter(embedding_factory=None, examples=EXAMPLES)
+
+    assert router.route("remote work") is None
+    assert router.route("hello")[0].query_type == "general"
+    assert router.stats()["fast_path_rate"] == 0.5
+
+
+def test_async_route_matches_the_sync_route(router):
+    messages = ["Remote work on Fridays", "hello", "overtime balance", "my balance taken"]
+
+    assert asyncio.run(_aroute_all(router, messages)) == [router.route(message) for message in messages]
+
+
+async def _aroute_all(router, messages):
+    return [await router.aroute(message) for message in messages]
+
+
+def test_concurrent_first_messages_build_the_centroids_once(router, embedding):
+    async def scenario():
+        return await asyncio.gather(*(router.aclassify("Remote work on Fridays") for _ in range(5)))
+
+    decisions = asyncio.run(scenario())
+
+    assert {decision.query_type for decision in decisions} == {"policy"}
+    # One embeddings request per query type, not per concurrent message
+    assert embedding.document_requests == len(EXAMPLES)
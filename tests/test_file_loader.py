@@ -0,0 +1,155 @@
+"""
+Document loading: one bad file never stops the others
+"""
+
+import multiprocessing
+import os
+import time
+
+import pytest
+
+pytest.importorskip("PyPDF2")
+pytest.importorskip("docx2txt")
+
+from app.Chromadb import file_loader  # noqa: E402
+from app.Chromadb.file_loader import iter_hr_documents, iter_split_documents  # noqa: E402
+
+
+@pytest.fixture
+def folder(tmp_path):
+    (tmp_path / "a_leave.txt").write_text("Annual leave is 25 days.\n\nCarry-over is capped at 5 days.")
+    (tmp_path / "b_broken.pdf").write_bytes(b"not a pdf at all")
+    (tmp_path / "c_travel.txt").write_text("Economy class for flights under six hours.")
+    return tmp_path
+
+
+def load(folder, filenames, **kwargs):
+    errors = []
+    docs = list(iter_hr_documents(
+        str(folder), filenames, on_error=lambda filename, error: errors.append(filename), **kwargs
+    ))
+    return [doc.metadata["source"] for doc in docs], errors
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_unreadable_file_is_skipped_and_the_rest_load_in_order(folder, max_workers):
+    sources, _ = load(folder, ["a_leave.txt", "b_broken.pdf", "c_travel.txt"], max_workers=max_workers)
+
+    assert sources == ["a_leave.txt", "c_travel.txt"]
+
+
+def test_file_deleted_after_listing_fails_alone(folder):
+    sources, errors = load(folder, ["a_leave.txt", "gone.txt", "c_travel.txt"], max_workers=1, stream_min_bytes=1024)
+
+    assert sources == ["a_leave.txt", "c_travel.txt"]
+    assert errors == ["gone.txt"]
+
+
+@pytest.fixture
+def misbehaving(monkeypatch):
+    """Workers inherit the patched loader, so this needs forked workers"""
+    if multiprocessing.get_start_method() != "fork":
+        pytest.skip("needs the fork start method")
+    original = file_loader.load_file
+
+    def install(name: str, behaviour):
+        def load_file(path):
+            if os.path.basename(path) == name:
+                behaviour()
+            return original(path)
+        monkeypatch.setattr(file_loader, "load_file", load_file)
+
+    return install
+
+
+def test_file_that_hangs_times_out_alone(folder, misbehaving):
+    misbehaving("a_leave.txt", lambda: time.sleep(30))
+
+    started = time.monotonic()
+    sources, errors = load(folder, ["a_leave.txt", "c_travel.txt"], max_workers=2, timeout=1.0)
+
+    assert sources == ["c_travel.txt"]
+    assert errors == ["a_leave.txt"]
+    assert time.monotonic() - started < 15
+
+
+def test_file_that_kills_its_worker_fails_alone(folder, misbehaving):
+    misbehaving("c_travel.txt", lambda: os._exit(1))
+
+    sources, errors = load(folder, ["a_leave.txt", "c_travel.txt"], max_workers=2, timeout=30.0)
+
+    assert sources == ["a_leave.txt"]
+    assert errors == ["c_travel.txt"]
+
+
+def test_streamed_parts_keep_file_offsets(folder):
+    text = "".join(f"Paragraph {i} of the handbook.\n\n" for i in range(40))
+    (folder / "handbook.txt").write_text(text)
+
+    parts = list(iter_hr_documents(str(folder), ["handbook.txt"], stream_min_bytes=1, part_chars=200))
+    chunks = [chunk for chunk_list in iter_split_documents(parts, chunk_size=100, chunk_overlap=0) for chunk in chunk_list]
+
+    assert len(parts) > 1
+    for chunk in chunks:
+        start = chunk.metadata["start_index"]
+        assert text[start:start + len(chunk.page_content)] == chunk.page_content
+
+
+def pdf_bytes(pages: list[str]) -> bytes:
+    """A minimal PDF with one line of Helvetica text per page"""
+    count = len(pages)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % (4 + 2 * i) for i in range(count))
+        + b"] /Count %d >>" % count,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, text in enumerate(pages):
+        stream = b"BT /F1 12 Tf 72 720 Td (" + text.encode() + b") Tj ET"
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (5 + 2 * i)
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def test_pdf_is_streamed_from_an_open_handle(tmp_path, monkeypatch):
+    pages = [f"Section {i} of the leave policy." for i in range(6)]
+    path = tmp_path / "handbook.pdf"
+    path.write_bytes(pdf_bytes(pages))
+    handles = []
+
+    def reader(stream):
+        handles.append(stream)
+        return original(stream)
+
+    original = file_loader.PdfReader
+    monkeypatch.setattr(file_loader, "PdfReader", reader)
+
+    parts = file_loader.iter_file_parts(str(path), part_chars=70)
+    first = next(parts)
+    # The reader got the file handle, not the path, and it stays open between parts
+    assert not isinstance(handles[0], (str, os.PathLike))
+    assert not handles[0].closed
+    rest = list(parts)
+
+    assert handles[0].closed
+    assert len(rest) >= 2
+    assert first.metadata["page_count"] == 6
+    text = "\n\n".join(pages)
+    assert file_loader.load_pdf(str(path))[0] == text
+    for doc in [first, *rest]:
+        offset = doc.metadata["part_offset"]
+        assert text[offset:offset + len(doc.page_content)] == doc.page_content
+    assert handles[1].closed
@@ -0,0 +1,122 @@
+"""
+Hybrid retrieval: BM25, reciprocal rank fusion and context packing
+"""
+
+import pytest
+
+pytest.importorskip("pydantic_settings")
+pytest.importorskip("langchain_chroma")
+
+from langchain_core.documents import Document  # noqa: E402
+
+from app.Chromadb.lexical_index import BM25Index, tokenize  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.services.context_packer import pack_context  # noqa: E402
+from app.services.retriever import RetrieverRuntime, reciprocal_rank_fusion  # noqa: E402
+
+
+def chunk(name: str, text: str | None = None) -> Document:
+    return Document(
+        id=name,
+        page_content=text or f"Section {name}: {name} rules apply to every employee in the {name} programme.",
+        metadata={"source": f"{name}.pdf"}
+    )
+
+
+@pytest.fixture
+def bm25():
+    index = BM25Index()
+    index.add_documents([
+        chunk("leave", "Annual leave is 25 days. Unused leave carries over up to 5 days."),
+        chunk("npax", "NPAX emergency leave covers up to 3 days for a family emergency."),
+        chunk("travel", "Economy class applies to flights under six hours."),
+        chunk("expenses", "Claim travel expenses within 30 days of the trip."),
+    ])
+    return index
+
+
+def test_tokenize_drops_stopwords_and_punctuation():
+    assert tokenize("What is the NPAX emergency-leave policy?") == ["npax", "emergency", "leave", "policy"]
+
+
+def test_bm25_ranks_exact_term_matches_first(bm25):
+    hits = bm25.search("NPAX emergency leave", k=3)
+
+    assert [doc_id for doc_id, _ in hits] == ["npax", "leave"]
+    assert hits[0][1] > hits[1][1] > 0
+    assert bm25.search("parental", k=3) == []
+
+
+def test_bm25_round_trips_through_its_file(tmp_path, bm25):
+    path = str(tmp_path / "hr_documents.bm25.json")
+    bm25.save(path)
+
+    loaded = BM25Index.load(path)
+    doc, score = loaded.search_documents("travel expenses", k=1)[0]
+
+    assert len(loaded) == 4
+    assert doc.id == "expenses" and doc.metadata == {"source": "expenses.pdf"}
+    assert score == pytest.approx(bm25.search("travel expenses", k=1)[0][1])
+
+
+def test_bm25_is_decisive_only_for_a_clear_complete_match(bm25):
+    clear = bm25.search("NPAX emergency", k=2)
+    partial = bm25.search("NPAX parental leave", k=2)
+    close = bm25.search("days", k=2)
+
+    assert bm25.is_decisive("NPAX emergency", clear, k=1, ratio=2.0)
+    # "parental" is in no chunk, so the best hit cannot cover the question
+    assert not bm25.is_decisive("NPAX parental leave", partial, k=1, ratio=2.0)
+    # Three chunks mention days with similar scores
+    assert not bm25.is_decisive("days", close, k=1, ratio=2.0)
+
+
+def test_rrf_ranks_documents_found_by_both_lists_first():
+    a, b, c, d = chunk("a"), chunk("b"), chunk("c"), chunk("d")
+
+    fused = reciprocal_rank_fusion([[a, b, c], [d, c]], k=60)
+
+    assert [doc.id for doc, _ in fused] == ["c", "a", "d", "b"]
+    assert fused[0][1] == pytest.approx(1 / 63 + 1 / 62)
+
+
+def test_hybrid_context_keeps_documents_either_list_rates_highly(monkeypatch):
+    monkeypatch.setattr(settings, "CONTEXT_MAX_K", 4)
+    monkeypatch.setattr(settings, "CONTEXT_RELATIVE_CUTOFF", 0.8)
+    dense = [(chunk("leave"), 0.82), (chunk("sick"), 0.80), (chunk("travel"), 0.61)]
+    lexical = [(chunk("npax"), 12.0), (chunk("leave"), 7.5)]
+
+    candidates = RetrieverRuntime._fuse(dense, lexical)
+    context = RetrieverRuntime._chain_input("What is NPAX leave?", candidates)["context"]
+
+    # RRF order, scored by the best per-list relevance: "npax" tops BM25
+    # and "sick" is close to the dense best, "travel" is not
+    assert [doc.id for doc, _ in candidates] == ["leave", "npax", "sick", "travel"]
+    assert [score for _, score in candidates] == pytest.approx([1.0, 1.0, 0.80 / 0.82, 0.61 / 0.82])
+    for name in ("leave", "npax", "sick"):
+        assert f"Section {name}:" in context
+    assert "Section travel:" not in context
+
+
+def test_dense_only_context_applies_the_relative_cutoff(monkeypatch):
+    monkeypatch.setattr(settings, "CONTEXT_RELATIVE_CUTOFF", 0.8)
+    dense = [(chunk("leave"), 0.82), (chunk("sick"), 0.80), (chunk("travel"), 0.40)]
+
+    candidates = RetrieverRuntime._fuse(dense, [])
+    context = RetrieverRuntime._chain_input("How much leave do I get?", candidates)["context"]
+
+    assert candidates == dense
+    assert "Section sick:" in context
+    assert "Section travel:" not in context
+
+
+def test_pack_context_merges_adjacent_chunks_and_respects_the_budget():
+    text = "".join(f"Rule {i} of the leave policy applies from day one. " for i in range(60))
+    first = Document(id="1", page_content=text[:400], metadata={"source": "leave.pdf", "start_index": 0})
+    second = Document(id="2", page_content=text[300:700], metadata={"source": "leave.pdf", "start_index": 300})
+
+    merged = pack_context([(first, 0.9), (second, 0.85)], token_budget=1000, relative_cutoff=None)
+    trimmed = pack_context([(first, 0.9), (second, 0.85)], token_budget=40, relative_cutoff=None)
+
+    assert merged == text[:700].strip()
+    assert len(trimmed) < len(merged) and merged.startswith(trimmed)
@@ -0,0 +1,297 @@
+"""
+Incremental sync against a real local Chroma store
+
+Documents are small text files in a temporary folder, and a hashing
+bag-of-words embedding stands in for the provider, so a sync makes no
+network calls.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("pydantic_settings")
+pytest.importorskip("langchain_chroma")
+
+from langchain_chroma import Chroma  # noqa: E402
+from langchain_core.embeddings import Embeddings  # noqa: E402
+
+from app.Chromadb import embed_documents, file_loader  # noqa: E402
+from app.Chromadb.active_collection import active_collection_name, read_active_pointer, sync_lock  # noqa: E402
+from app.Chromadb.manifest import diff_folder, file_hash, read_manifest  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from scripts import ingest_policies  # noqa: E402
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic bag-of-words vectors"""
+
+    dimensions = 32
+
+    def __init__(self):
+        self.calls = 0
+        self.texts = 0
+
+    def _vector(self, text: str) -> list[float]:
+        vector = [0.0] * self.dimensions
+        for word in re.findall(r"\w+", text.lower()):
+            vector[hashlib.blake2b(word.encode("utf-8"), digest_size=2).digest()[0] % self.dimensions] += 1.0
+        return vector
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls += 1
+        self.texts += len(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._vector(text)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    embedding = HashingEmbeddings()
+    monkeypatch.setattr(embed_documents, "get_azure_embedding", lambda backend=None: embedding)
+    monkeypatch.setattr(embed_documents, "embedding_model_id", lambda backend=None: "test:hashing")
+    monkeypatch.setattr(settings, "LOADER_MAX_WORKERS", 1)
+    monkeypatch.setattr(settings, "INGEST_EMBED_CONCURRENCY", 1)
+    monkeypatch.setattr(settings, "INDEX_RETIRED_GRACE_SECONDS", 0)
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    return docs, str(tmp_path / "chroma"), embedding
+
+
+def sync(store, **kwargs):
+    docs, persist_directory, _ = store
+    return embed_documents.sync_vector_store(
+        str(docs), persist_directory, "hr_documents", chunk_size=2000, chunk_overlap=0, **kwargs
+    )
+
+
+def stored_texts(store, filename: str) -> list[str]:
+    _, persist_directory, _ = store
+    name = active_collection_name(persist_directory, "hr_documents")
+    stored = Chroma(persist_directory=persist_directory, collection_name=name)._collection.get(
+        where={"source": filename}, include=["documents"]
+    )
+    return stored["documents"]
+
+
+def policy_text(prefix: str = "clause", length: int = 150, edits: dict[int, str] | None = None) -> str:
+    words = [f"{prefix}{i}" for i in range(length)]
+    for index, word in (edits or {}).items():
+        words[index] = word
+    return " ".join(words)
+
+
+def test_diff_folder_hashes_only_files_whose_stat_changed(tmp_path):
+    for name in ("kept.txt", "touched.txt", "edited.txt", "new.txt"):
+        (tmp_path / name).write_text(f"{name} original")
+    entries = {}
+    for name in ("kept.txt", "touched.txt", "edited.txt", "deleted.txt"):
+        path = tmp_path / (name if name != "deleted.txt" else "kept.txt")
+        stat = os.stat(path)
+        entries[name] = {"hash": file_hash(str(path)), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    entries["deleted.txt"]["hash"] = "gone"
+
+    stat = os.stat(tmp_path / "touched.txt")
+    os.utime(tmp_path / "touched.txt", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    (tmp_path / "edited.txt").write_text("edited.txt amended")
+
+    diff = diff_folder({"files": entries}, str(tmp_path), ["edited.txt", "kept.txt", "new.txt", "touched.txt"])
+
+    assert diff.unchanged == ["kept.txt", "touched.txt"]
+    assert diff.changed == ["edited.txt"]
+    assert diff.added == ["new.txt"]
+    assert diff.removed == ["deleted.txt"]
+    assert diff.to_load == ["edited.txt", "new.txt"]
+    assert diff.file_states["touched.txt"]["mtime_ns"] == stat.st_mtime_ns + 10**9
+
+
+def test_sync_embeds_only_new_chunks_and_deletes_removed_files(store):
+    docs, _, embedding = store
+    (docs / "leave.txt").write_text(policy_text("leave"))
+    (docs / "travel.txt").write_text(policy_text("travel"))
+    first = sync(store)
+    assert first["added"] == ["leave.txt", "travel.txt"]
+    assert first["embedded_chunks"] == 2
+
+    unchanged = sync(store)
+    assert unchanged["unchanged"] == 2 and "embedded_chunks" not in unchanged
+    assert embedding.texts == 2
+
+    (docs / "travel.txt").unlink()
+    (docs / "expenses.txt").write_text(policy_text("expenses"))
+    report = sync(store)
+
+    assert report["added"] == ["expenses.txt"]
+    assert report["removed"] == ["travel.txt"]
+    assert report["embedded_chunks"] == 1
+    assert report["deleted_chunks"] == 1
+    assert report["chunk_count"] == 2
+    assert embedding.texts == 3
+    assert stored_texts(store, "travel.txt") == []
+    assert stored_texts(store, "leave.txt") == [policy_text("leave")]
+
+
+def test_one_word_edit_reaches_the_index(store):
+    docs, _, _ = store
+    (docs / "leave.txt").write_text(policy_text())
+    sync(store)
+
+    # Near-identical to the old chunk, which must not absorb the new version
+    (docs / "leave.txt").write_text(policy_text(edits={75: "amended"}))
+    report = sync(store)
+
+    assert report["changed"] == ["leave.txt"]
+    assert report["embedded_chunks"] == 1
+    assert report["dedup"]["collapsed_chunks"] == 0
+    texts = stored_texts(store, "leave.txt")
+    assert len(texts) == 1
+    assert "amended" in texts[0] and "clause75" not in texts[0]
+
+
+def test_near_duplicate_chunks_across_files_are_stored_once(store):
+    docs, persist_directory, embedding = store
+    (docs / "leave.txt").write_text(policy_text())
+    (docs / "leave_copy.txt").write_text(policy_text(edits={75: "amended"}))
+
+    report = sync(store)
+
+    assert report["embedded_chunks"] == 1
+    assert report["dedup"]["collapsed_chunks"] == 1
+    assert report["chunk_count"] == 1
+    assert embedding.texts == 1
+    name = active_collection_name(persist_directory, "hr_documents")
+    stored = Chroma(persist_directory=persist_directory, collection_name=name)._collection.get(include=["metadatas"])
+    assert stored["metadatas"][0]["source"] == "leave.txt"
+    assert stored["metadatas"][0]["sources"] == "leave.txt|leave_copy.txt"
+
+    # The shared chunk outlives the file it was first seen in
+    (docs / "leave.txt").unlink()
+    sync(store)
+
+    stored = Chroma(
+        persist_directory=persist_directory, collection_name=active_collection_name(persist_directory, "hr_documents")
+    )._collection.get(include=["documents", "metadatas"])
+    assert stored["documents"] == [policy_text()]
+    assert stored["metadatas"][0]["source"] == "leave_copy.txt"
+    assert stored["metadatas"][0]["sources"] == "leave_copy.txt"
+
+
+def test_changed_file_that_fails_to_load_keeps_its_last_version(store, monkeypatch):
+    docs, persist_directory, _ = store
+    (docs / "leave.txt").write_text(policy_text("leave"))
+    (docs / "travel.txt").write_text(policy_text("travel"))
+    sync(store)
+
+    original_load_file = file_loader.load_file
+
+    def load_file(path):
+        if path.endswith("travel.txt"):
+            raise OSError("file is locked")
+        return original_load_file(path)
+
+    (docs / "travel.txt").write_text(policy_text("trip"))
+    monkeypatch.setattr(file_loader, "load_file", load_file)
+    sync(store)
+
+    assert stored_texts(store, "travel.txt") == [policy_text("travel")]
+    name = active_collection_name(persist_directory, "hr_documents")
+    assert read_manifest(persist_directory, name)["files"]["travel.txt"]["hash"] != file_hash(str(docs / "travel.txt"))
+
+    # The next run retries the file
+    monkeypatch.setattr(file_loader, "load_file", original_load_file)
+    report = sync(store)
+    assert report["changed"] == ["travel.txt"]
+    assert stored_texts(store, "travel.txt") == [policy_text("trip")]
+
+
+def test_readers_see_the_previous_version_until_activation(store, monkeypatch):
+    docs, persist_directory, _ = store
+    (docs / "leave.txt").write_text(policy_text("leave"))
+    sync(store)
+    monkeypatch.setattr(settings, "INDEX_RETIRED_GRACE_SECONDS", 3600)
+
+    seen_before_switch = []
+    original_activate = embed_documents.activate_collection
+
+    def activate(*args, **kwargs):
+        seen_before_switch.append(
+            (active_collection_name(persist_directory, "hr_documents"), stored_texts(store, "leave.txt"))
+        )
+        return original_activate(*args, **kwargs)
+
+    monkeypatch.setattr(embed_documents, "activate_collection", activate)
+    (docs / "leave.txt").write_text(policy_text("holiday"))
+    report = sync(store)
+
+    assert seen_before_switch == [("hr_documents_v1", [policy_text("leave")])]
+    assert report["target_collection"] == "hr_documents_v2"
+    assert report["dropped_collections"] == []
+    assert stored_texts(store, "leave.txt") == [policy_text("holiday")]
+    # The retired version stays queryable through its grace period
+    old = Chroma(persist_directory=persist_directory, collection_name="hr_documents_v1")._collection
+    assert old.get(include=["documents"])["documents"] == [policy_text("leave")]
+
+
+def test_retired_version_is_dropped_after_the_grace_period(store):
+    docs, persist_directory, _ = store
+    (docs / "leave.txt").write_text(policy_text("leave"))
+    sync(store)
+    (docs / "leave.txt").write_text(policy_text("holiday"))
+    report = sync(store)
+
+    assert report["dropped_collections"] == ["hr_documents_v1"]
+    assert not os.path.exists(os.path.join(persist_directory, "hr_documents_v1.manifest.json"))
+    assert read_manifest(persist_directory, "hr_documents_v2")["files"]["leave.txt"]
+
+
+def test_sync_waits_for_the_collection_lock(store):
+    docs, persist_directory, _ = store
+    (docs / "leave.txt").write_text(policy_text())
+    reports = []
+
+    with sync_lock(persist_directory, "hr_documents"):
+        worker = threading.Thread(target=lambda: reports.append(sync(store)))
+        worker.start()
+        worker.join(timeout=1.0)
+        assert worker.is_alive()
+        assert read_active_pointer(persist_directory, "hr_documents") == {}
+    worker.join(timeout=30)
+
+    assert reports[0]["target_collection"] == "hr_documents_v1"
+    assert read_active_pointer(persist_directory, "hr_documents")["collection"] == "hr_documents_v1"
+
+
+def test_watch_does_not_rebuild_for_a_file_that_keeps_failing(store, monkeypatch):
+    docs, persist_directory, _ = store
+    (docs / "leave.txt").write_text(policy_text("leave"))
+    (docs / "bad.pdf").write_bytes(b"not a pdf at all")
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if sleeps.count(1.0) == 3:
+            # The broken file changes, but is still broken
+            (docs / "bad.pdf").write_bytes(b"still not a pdf")
+        if sleeps.count(1.0) == 6 or len(sleeps) > 50:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(ingest_policies, "time", SimpleNamespace(sleep=sleep, strftime=lambda fmt: ""))
+    args = SimpleNamespace(
+        docs_folder=str(docs), persist_directory=persist_directory, collection="hr_documents",
+        interval=1.0, settle=0.0, json=True
+    )
+    ingest_policies.watch(args, {
+        "docs_folder": str(docs), "persist_directory": persist_directory, "collection_name": "hr_documents",
+        "chunk_size": 2000, "chunk_overlap": 0,
+    })
+
+    # One build for the first poll, one for the changed broken file, none for the other polls
+    assert read_active_pointer(persist_directory, "hr_documents")["collection"] == "hr_documents_v2"
+    assert sleeps.count(0.0) == 2
+    assert stored_texts(store, "leave.txt") == [policy_text("leave")]
@@ -0,0 +1,301 @@
+"""
+LLMRouter against local fake OpenAI-compatible providers
+
+Each fake provider is an http.server on 127.0.0.1 answering
+/v1/chat/completions after a configurable delay, or with an HTTP error.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("pydantic_settings")
+langchain_openai = pytest.importorskip("langchain_openai")
+
+from app.core.llm_router import CircuitBreaker, LatencyWindow, LLMRouter, ProviderRoute  # noqa: E402
+
+
+class FakeProvider(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, name: str):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.name = name
+        self.delay = 0.0
+        self.status = 200
+        self.requests = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _stream(self, text: str):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for word in text.split(" "):
+            chunk = {
+                "id": "chatcmpl-test",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": "fake",
+                "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def do_POST(self):
+        server: FakeProvider = self.server
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        server.requests += 1
+        time.sleep(server.delay)
+        if server.status == 200 and request.get("stream"):
+            return self._stream(f"answer from {server.name}")
+        if server.status != 200:
+            body = {"error": {"message": "provider unavailable", "type": "server_error"}}
+        else:
+            body = {
+                "id": "chatcmpl-test",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": "fake",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": f"answer from {server.name}"},
+                    "finish_reason": "stop"
+                }],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 3, "total_tokens": 4}
+            }
+        payload = json.dumps(body).encode("utf-8")
+        try:
+            self.send_response(server.status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up on a hedged call
+
+
+@pytest.fixture
+def providers():
+    servers = [FakeProvider("primary"), FakeProvider("secondary")]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield servers
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_router(servers, clock=None, **kwargs) -> LLMRouter:
+    routes = [
+        ProviderRoute(
+            server.name,
+            langchain_openai.ChatOpenAI(model="fake", base_url=server.url, api_key="test", max_retries=0, timeout=10),
+            CircuitBreaker(server.name, failure_threshold=3, cooldown_seconds=30.0, clock=clock or time.monotonic),
+            LatencyWindow()
+        )
+        for server in servers
+    ]
+    kwargs.setdefault("hedge_min_seconds", 5.0)
+    return LLMRouter(routes, **kwargs)
+
+
+def test_healthy_primary_answers_without_hedging(providers):
+    primary, secondary = providers
+    router = make_router(providers)
+
+    for _ in range(3):
+        assert router.invoke("hi").content == "answer from primary"
+
+    assert (primary.requests, secondary.requests) == (3, 0)
+    stats = router.stats()
+    assert stats["hedged"] == 0
+    assert stats["providers"]["primary"]["samples"] == 3
+    assert stats["providers"]["primary"]["p95_ms"] >= stats["providers"]["primary"]["p50_ms"] > 0
+
+
+def test_slow_primary_is_hedged_to_secondary(providers):
+    primary, secondary = providers
+    primary.delay = 1.5
+    router = make_router(providers, hedge_after_seconds=0.1)
+
+    started = time.perf_counter()
+    result = router.invoke("hi")
+
+    assert result.content == "answer from secondary"
+    assert time.perf_counter() - started < 1.0
+    assert router.stats()["hedged"] == 1
+    assert router.stats()["hedge_wins"] == 1
+
+
+def test_hedged_loser_finishing_late_is_not_recorded(providers):
+    primary, secondary = providers
+    primary.delay = 0.5
+    router = make_router(providers, hedge_after_seconds=0.1)
+    loser = router.routes[0].breaker
+    finished = threading.Event()
+    release = loser.record_cancelled
+
+    def record_cancelled(token):
+        release(token)
+        finished.set()
+
+    loser.record_cancelled = record_cancelled
+
+    assert router.invoke("hi").content == "answer from secondary"
+    assert finished.wait(5), "the slow call never finished"
+
+    assert len(router.routes[0].latency) == 0
+    assert loser.stats()["calls"] == 0
+    assert router.routes[1].breaker.stats()["calls"] == 1
+
+
+def test_hedge_delay_follows_rolling_p95(providers):
+    router = make_router(providers, hedge_min_seconds=0.05, min_samples=5)
+    route = router.routes[0]
+    assert router.hedge_delay(route) == 0.05
+
+    for seconds in (0.1, 0.1, 0.2, 0.2, 0.8):
+        route.latency.add(seconds)
+    assert router.hedge_delay(route) == pytest.approx(0.8)
+
+
+def test_async_hedge_cancels_the_slow_call(providers):
+    primary, secondary = providers
+    primary.delay = 1.5
+    router = make_router(providers, hedge_after_seconds=0.1)
+
+    async def run():
+        started = time.perf_counter()
+        result = await router.ainvoke("hi")
+        return result, time.perf_counter() - started
+
+    result, elapsed = asyncio.run(run())
+
+    assert result.content == "answer from secondary"
+    assert elapsed < 1.0
+    # The cancelled call is neither a failure nor a latency sample
+    assert router.routes[0].breaker.stats()["errors"] == 0
+    assert len(router.routes[0].latency) == 0
+
+
+def test_failures_fail_over_and_open_the_breaker(providers):
+    primary, secondary = providers
+    primary.status = 500
+    clock = FakeClock()
+    router = make_router(providers, clock=clock)
+
+    for _ in range(5):
+        assert router.invoke("hi").content == "answer from secondary"
+
+    # Three failures open the breaker; later calls skip the primary
+    assert primary.requests == 3
+    assert router.routes[0].breaker.state == "open"
+    assert router.stats()["failovers"] == 3
+
+    # After the cooldown one trial call goes to the recovered primary
+    primary.status = 200
+    clock.now += 31
+    assert router.invoke("hi").content == "answer from primary"
+    assert router.routes[0].breaker.state == "closed"
+
+
+def test_failed_trial_keeps_the_breaker_open(providers):
+    primary, secondary = providers
+    primary.status = 500
+    clock = FakeClock()
+    router = make_router(providers, clock=clock)
+    for _ in range(3):
+        router.invoke("hi")
+
+    clock.now += 31
+    assert router.invoke("hi").content == "answer from secondary"
+    assert primary.requests == 4
+    assert router.routes[0].breaker.state == "open"
+
+
+def test_all_providers_failing_raises(providers):
+    for server in providers:
+        server.status = 500
+    router = make_router(providers)
+
+    with pytest.raises(Exception):
+        router.invoke("hi")
+    assert [server.requests for server in providers] == [1, 1]
+
+
+def test_stream_fails_over_before_the_first_chunk(providers):
+    primary, secondary = providers
+    primary.status = 503
+    router = make_router(providers)
+
+    chunks = list(router.stream("hi"))
+
+    assert "".join(chunk.content for chunk in chunks).strip() == "answer from secondary"
+    assert router.routes[0].breaker.stats()["errors"] == 1
+
+
+def test_error_rate_opens_the_breaker():
+    breaker = CircuitBreaker("provider", failure_threshold=100, error_rate=0.5, min_calls=4)
+    for failed in (False, True, False, True):
+        breaker.record_failure() if failed else breaker.record_success()
+
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_only_the_trial_call_releases_the_trial():
+    clock = FakeClock()
+    breaker = CircuitBreaker("provider", failure_threshold=1, cooldown_seconds=30.0, clock=clock)
+    earlier = breaker.allow()
+    breaker.record_failure(breaker.allow())
+    clock.now += 31
+
+    trial = breaker.allow()
+    assert trial is not None
+    assert breaker.allow() is None
+
+    # A call let through before the breaker opened, and the all-open fallback
+    breaker.record_cancelled(earlier)
+    breaker.record_cancelled(None)
+    breaker.record_failure(earlier)
+    assert breaker.state == "half_open"
+    assert breaker.allow() is None
+
+    breaker.record_cancelled(trial)
+    assert breaker.allow() is not None
+
+
+def test_only_the_trial_call_closes_the_breaker():
+    clock = FakeClock()
+    breaker = CircuitBreaker("provider", failure_threshold=1, cooldown_seconds=30.0, clock=clock)
+    earlier = breaker.allow()
+    breaker.record_failure(breaker.allow())
+    clock.now += 31
+    trial = breaker.allow()
+
+    # A late success of a call let through before the breaker opened
+    breaker.record_success(earlier)
+    assert breaker.state == "half_open"
+
+    breaker.record_success(trial)
+    assert breaker.state == "closed"
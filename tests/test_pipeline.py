@@ -0,0 +1,86 @@
+"""
+StreamingPipeline: ordered threaded stages, per-stage stats, errors and early stop
+"""
+
+import threading
+import time
+
+import pytest
+
+from app.Chromadb.pipeline import StreamingPipeline
+
+
+def double(items):
+    for item in items:
+        yield item * 2
+
+
+def pairs(items):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == 2:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def test_stages_run_in_order_and_report_their_counts():
+    pipeline = StreamingPipeline(range(5), queue_size=2)
+    pipeline.stage("double", double).stage("pairs", pairs)
+
+    assert list(pipeline.run()) == [[0, 2], [4, 6], [8]]
+    report = {row["stage"]: row for row in pipeline.report()}
+    assert (report["double"]["items_in"], report["double"]["items_out"]) == (5, 5)
+    assert (report["pairs"]["items_in"], report["pairs"]["items_out"]) == (5, 3)
+
+
+def test_slow_stage_shows_as_busy_and_its_consumer_as_waiting():
+    def slow(items):
+        for item in items:
+            time.sleep(0.02)
+            yield item
+
+    pipeline = StreamingPipeline(range(10), queue_size=2)
+    pipeline.stage("slow", slow).stage("fast", double)
+    list(pipeline.run())
+
+    slow_row, fast_row = pipeline.report()
+    assert slow_row["busy_s"] >= 0.15
+    assert fast_row["input_wait_s"] >= 0.15
+    assert fast_row["busy_s"] < slow_row["busy_s"]
+
+
+def test_stage_error_reaches_the_consumer():
+    def explode(items):
+        for item in items:
+            if item == 3:
+                raise ValueError("bad chunk 3")
+            yield item
+
+    pipeline = StreamingPipeline(range(10)).stage("explode", explode).stage("double", double)
+
+    received = []
+    with pytest.raises(ValueError, match="bad chunk 3"):
+        for item in pipeline.run():
+            received.append(item)
+    assert received == [0, 2, 4]
+
+
+def test_consumer_stopping_early_stops_every_stage():
+    produced = []
+
+    def source():
+        for i in range(10_000):
+            produced.append(i)
+            yield i
+
+    pipeline = StreamingPipeline(source(), queue_size=2).stage("double", double).stage("pairs", pairs)
+    run = pipeline.run()
+    assert next(run) == [0, 2]
+    run.close()
+
+    assert not [t for t in threading.enumerate() if t.name.startswith("pipeline-")]
+    # Bounded queues keep the source only a few items ahead of the consumer
+    assert len(produced) < 20
@@ -0,0 +1,30 @@
+"""
+Shared provider clients: built once, on one pooled transport
+"""
+
+import threading
+
+import pytest
+
+pytest.importorskip("pydantic_settings")
+pytest.importorskip("langchain_groq")
+
+from app.core.providers import ProviderClients  # noqa: E402
+
+
+def test_chat_clients_are_built_once_on_the_shared_transport():
+    clients = ProviderClients()
+    built = []
+
+    def build():
+        # The first client also creates the transports
+        built.extend([clients.groq_chat(0.3), clients.groq_chat(0.3), clients.groq_chat(0.7)])
+
+    worker = threading.Thread(target=build, daemon=True)
+    worker.start()
+    worker.join(timeout=10)
+
+    assert not worker.is_alive(), "building a client deadlocked"
+    assert built[0] is built[1] and built[0] is not built[2]
+    assert clients.stats()["clients"] == ["groq_chat", "groq_chat"]
+    clients.close()
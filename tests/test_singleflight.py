@@ -0,0 +1,174 @@
+"""
+SingleFlight: one computation per key for concurrent callers, threads and coroutines
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.core.singleflight import SingleFlight
+
+
+def wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def test_concurrent_threads_share_one_call():
+    flight = SingleFlight("test-do")
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(flight.do, "leave", compute) for _ in range(4)]
+        wait_for(lambda: flight.stats()["followers"] == 3)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert results == ["answer"] * 4
+    assert len(calls) == 1
+    assert flight.stats() == {"leaders": 1, "followers": 3, "in_flight": 0, "coalesced_rate": 0.75}
+
+
+def test_failed_call_reaches_every_caller_and_is_not_kept():
+    flight = SingleFlight("test-do-error")
+    release = threading.Event()
+
+    def compute():
+        release.wait(5)
+        raise TimeoutError("provider timed out")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(flight.do, "leave", compute) for _ in range(2)]
+        wait_for(lambda: flight.stats()["followers"] == 1)
+        release.set()
+        for future in futures:
+            with pytest.raises(TimeoutError):
+                future.result()
+
+    assert flight.do("leave", lambda: "retried") == "retried"
+
+
+def test_do_many_computes_only_keys_not_in_flight():
+    flight = SingleFlight("test-do-many")
+    release = threading.Event()
+    batches = []
+
+    def compute(keys):
+        batches.append(keys)
+        release.wait(5)
+        return [f"answer {key}" for key in keys]
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        first = pool.submit(flight.do_many, ["a", "b"], compute)
+        wait_for(lambda: flight.stats()["in_flight"] == 2)
+        second = pool.submit(flight.do_many, ["b", "c", "b"], compute)
+        wait_for(lambda: flight.stats()["followers"] == 1)
+        release.set()
+
+        assert first.result() == ["answer a", "answer b"]
+        assert second.result() == ["answer b", "answer c", "answer b"]
+    assert batches == [["a", "b"], ["c"]]
+
+
+@pytest.mark.parametrize("compute, error", [
+    (lambda keys: [f"answer {key}" for key in keys[1:]], RuntimeError),
+    (lambda keys: 1 / 0, ZeroDivisionError),
+])
+def test_do_many_failure_fails_every_claimed_key_and_its_followers(compute, error):
+    flight = SingleFlight("test-do-many-error")
+    release = threading.Event()
+
+    def slow(keys):
+        release.wait(5)
+        return compute(keys)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do_many, ["a", "b"], slow)
+        wait_for(lambda: flight.stats()["in_flight"] == 2)
+        follower = pool.submit(flight.do, "b", lambda: "never")
+        wait_for(lambda: flight.stats()["followers"] == 1)
+        release.set()
+
+        with pytest.raises(error):
+            leader.result()
+        with pytest.raises(error):
+            follower.result()
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_coroutines_share_one_call_and_survive_a_cancelled_caller():
+    flight = SingleFlight("test-ado")
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def scenario():
+        impatient = asyncio.ensure_future(flight.ado("leave", compute))
+        await asyncio.sleep(0)
+        patient = asyncio.ensure_future(flight.ado("leave", compute))
+        await asyncio.sleep(0.01)
+        impatient.cancel()
+        return await patient, await flight.ado_many(["leave", "travel"], _batch)
+
+    async def _batch(keys):
+        return [f"batch {key}" for key in keys]
+
+    assert asyncio.run(scenario()) == ("answer", ["batch leave", "batch travel"])
+    assert len(calls) == 1
+
+
+def test_late_stream_subscriber_gets_every_chunk():
+    flight = SingleFlight("test-astream")
+    calls = []
+
+    async def tokens():
+        calls.append(1)
+        for token in ("Annual ", "leave ", "is ", "25 ", "days."):
+            await asyncio.sleep(0.01)
+            yield token
+
+    async def read(delay: float) -> str:
+        await asyncio.sleep(delay)
+        return "".join([token async for token in flight.astream("leave", tokens)])
+
+    async def scenario():
+        return await asyncio.gather(read(0), read(0.025))
+
+    assert asyncio.run(scenario()) == ["Annual leave is 25 days."] * 2
+    assert len(calls) == 1
+    assert flight.stats()["followers"] == 1
+
+
+def test_stream_error_reaches_every_subscriber():
+    flight = SingleFlight("test-astream-error")
+
+    async def tokens():
+        yield "Annual "
+        await asyncio.sleep(0.02)
+        raise ConnectionError("stream dropped")
+
+    async def read() -> list[str]:
+        received = []
+        with pytest.raises(ConnectionError):
+            async for token in flight.astream("leave", tokens):
+                received.append(token)
+        return received
+
+    async def scenario():
+        return await asyncio.gather(read(), read())
+
+    assert asyncio.run(scenario()) == [["Annual "], ["Annual "]]
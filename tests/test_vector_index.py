@@ -0,0 +1,103 @@
+"""
+InProcessVectorIndex storage modes and the shared full-precision file
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("langchain_core")
+
+from app.services import vector_index  # noqa: E402
+from app.services.vector_index import InProcessVectorIndex, _fit_pca  # noqa: E402
+
+
+def make_index(embeddings, **kwargs) -> InProcessVectorIndex:
+    ids = [f"chunk{i}" for i in range(len(embeddings))]
+    return InProcessVectorIndex(ids, [f"text {i}" for i in ids], [{} for _ in ids], embeddings, **kwargs)
+
+
+@pytest.fixture
+def embeddings():
+    return np.random.RandomState(0).normal(size=(200, 32)).astype(np.float32)
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    paths = []
+    original = vector_index._write_npy
+
+    def write(path, matrix):
+        paths.append(path)
+        original(path, matrix)
+
+    monkeypatch.setattr(vector_index, "_write_npy", write)
+    return paths
+
+
+def test_full_precision_file_is_written_once_per_collection(tmp_path, embeddings, writes):
+    path = str(tmp_path / "hr_documents_v1.vectors.npy")
+
+    first = make_index(embeddings, storage="int8", full_precision_path=path)
+    second = make_index(embeddings, storage="int8", full_precision_path=path)
+
+    assert writes == [path]
+    assert isinstance(second.matrix, np.memmap)
+    assert first.search(embeddings[7], k=3)[0][0].id == "chunk7"
+    assert second.search(embeddings[7], k=3)[0][0].id == "chunk7"
+
+
+def test_stale_full_precision_file_is_replaced(tmp_path, embeddings, writes):
+    path = str(tmp_path / "hr_documents.vectors.npy")
+    make_index(embeddings, storage="float16", full_precision_path=path)
+
+    changed = embeddings.copy()
+    changed[3] = -changed[3]
+    index = make_index(changed, storage="float16", full_precision_path=path)
+
+    assert writes == [path, path]
+    assert index.search(changed[3], k=1)[0][1] == pytest.approx(1.0, abs=1e-5)
+
+
+@pytest.mark.parametrize("storage, pca_dim", [("float16", None), ("int8", None), ("float32", 16)])
+def test_rescored_compact_search_matches_exact_search(tmp_path, embeddings, storage, pca_dim):
+    exact = make_index(embeddings)
+    compact = make_index(
+        embeddings, storage=storage, pca_dim=pca_dim, rescore_factor=8,
+        full_precision_path=str(tmp_path / "vectors.npy")
+    )
+    query = embeddings[11] + 0.1 * embeddings[42]
+
+    expected = [(doc.id, score) for doc, score in exact.search(query, k=3)]
+    found = [(doc.id, score) for doc, score in compact.search(query, k=3)]
+
+    assert [doc_id for doc_id, _ in found] == [doc_id for doc_id, _ in expected]
+    assert [score for _, score in found] == pytest.approx([score for _, score in expected], abs=1e-5)
+    assert compact.memory_bytes() < exact.memory_bytes()
+
+
+def test_fit_pca_returns_the_mean_and_principal_axes_as_rows():
+    generator = np.random.RandomState(1)
+    # Variance mostly along the first two coordinates
+    matrix = (generator.normal(size=(500, 6)) * [10.0, 5.0, 0.1, 0.1, 0.1, 0.1]).astype(np.float32)
+
+    mean, components = _fit_pca(matrix, 2)
+
+    assert mean.shape == (6,)
+    assert components.shape == (2, 6)
+    assert np.abs(components[0]).argmax() == 0
+    assert np.abs(components[1]).argmax() == 1
+    np.testing.assert_allclose(components @ components.T, np.eye(2), atol=1e-5)
+
+
+def test_missing_hnswlib_falls_back_to_exact_search_and_warns_once(embeddings, monkeypatch, caplog):
+    monkeypatch.setattr(vector_index, "hnswlib", None)
+    monkeypatch.setattr(vector_index, "_hnsw_missing_logged", False)
+
+    with caplog.at_level("WARNING", logger=vector_index.__name__):
+        indexes = [make_index(embeddings, hnsw_min_size=100) for _ in range(2)]
+
+    assert not any(index.uses_hnsw for index in indexes)
+    assert [record.message for record in caplog.records if "hnswlib" in record.message] == [
+        "hnswlib is not installed; searching 200 vectors exactly. "
+        "Install it (see requirements.txt) to use HNSW above RETRIEVER_HNSW_MIN_SIZE"
+    ]